@@ -1,3 +1,8 @@
+import os
+import copy
+import hashlib
+import inspect
+import pickle
 import pandas as pd
 import numpy as np
 from abc import ABC, abstractmethod
@@ -14,9 +19,37 @@ class Order:
 
 
 class BaseStrategy(ABC):
+    # 會隨回測改變、需要寫入 checkpoint 嘅屬性名；子類按需要擴充
+    state_attrs = ()
+    # 唔影響回測結果、唔計入 params 嘅公開屬性 (例如快取)
+    non_param_attrs = ()
+
     def __init__(self, name: str):
         self.name = name
 
+    def params(self):
+        """決定回測結果嘅設定 (公開屬性，唔包 state_attrs)；checkpoint 用嚟判斷策略有冇改過"""
+        return {k: v for k, v in vars(self).items()
+                if not k.startswith("_") and k not in self.state_attrs and k not in self.non_param_attrs}
+
+    def get_state(self):
+        return {attr: copy.deepcopy(getattr(self, attr)) for attr in self.state_attrs}
+
+    def set_state(self, state):
+        for attr, value in state.items():
+            setattr(self, attr, copy.deepcopy(value))
+
+    def prepare(self, universe_prices):
+        """回測開始前以對齊後嘅全歷史價格調用一次，子類可喺度預計算指標"""
+        pass
+
+    def decision_dates(self, trading_days):
+        """
+        策略需要 on_bar 嘅日子；None 代表每日都要
+        其餘日子 backtester 只做向量化 mark-to-market 同常駐 stop 檢查
+        """
+        return None
+
     @abstractmethod
     def on_bar(self, date, universe_prices, current_portfolio_value) -> List[Order]:
         pass
@@ -35,18 +68,304 @@ class TransactionCostModel:
         return price * (1 + self.slippage) if qty > 0 else price * (1 - self.slippage)
 
 
+class PricePanel:
+    """
+    將對齊後嘅價格打包成 (field, date, ticker) 嘅 NumPy 陣列
+    columnar 引擎用整數索引取值，唔再經 pandas .loc
+    亦可以直接用每個 field 一個 (date, ticker) 陣列建立 (例如 memory-mapped 嘅 panel cache)，唔使合併複製
+    """
+    FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+    def __init__(self, dates, tickers, values=None, fields=FIELDS, arrays=None):
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self.fields = tuple(fields)
+        self.values = values
+        self.arrays = list(arrays) if arrays is not None else [values[k] for k in range(len(self.fields))]
+        self.ticker_idx = {t: j for j, t in enumerate(self.tickers)}
+        self.field_idx = {f: k for k, f in enumerate(self.fields)}
+        self.date_idx = {d: i for i, d in enumerate(self.dates)}
+
+    @classmethod
+    def from_prices(cls, prices_dict, trading_days, fields=FIELDS):
+        tickers = list(prices_dict.keys())
+        values = np.full((len(fields), len(trading_days), len(tickers)), np.nan)
+        for j, ticker in enumerate(tickers):
+            df = prices_dict[ticker].reindex(trading_days)
+            for k, field in enumerate(fields):
+                if field in df.columns:
+                    values[k, :, j] = df[field].to_numpy(dtype=float)
+        return cls(trading_days, tickers, values, fields)
+
+    def field(self, name):
+        return self.arrays[self.field_idx[name]]
+
+    def row_values(self, date, field):
+        return self.arrays[self.field_idx[field]][self.date_idx[date]]
+
+    def value(self, date, ticker, field):
+        i = self.date_idx.get(date)
+        j = self.ticker_idx.get(ticker)
+        if i is None or j is None or field not in self.field_idx:
+            return None
+        return self.arrays[self.field_idx[field]][i, j]
+
+    def to_frames(self, tickers=None):
+        """{ticker: DataFrame} (複製出嚟)；每隻由第一個到最後一個有數據嘅日子 (上市前 / 除牌後嘅空行唔要)"""
+        frames = {}
+        ref = self.arrays[self.field_idx.get("Close", 0)]
+        for ticker in (self.tickers if tickers is None else tickers):
+            j = self.ticker_idx.get(ticker)
+            if j is None:
+                continue
+            valid = np.flatnonzero(~np.isnan(ref[:, j]))
+            if not len(valid):
+                continue
+            rows = slice(valid[0], valid[-1] + 1)
+            frames[ticker] = pd.DataFrame({f: np.asarray(a[rows, j]) for f, a in zip(self.fields, self.arrays)},
+                                          index=self.dates[rows].rename("Date"))
+        return frames
+
+
+class StopRegistry:
+    """
+    常駐 stop 單：以陣列保存 (ticker 索引, stop 價)，每日同當日 Low 向量一次過比較
+    策略只喺 stop 有變時送 STOP_AMEND / STOP_CANCEL；觸發時平晒當時持倉，stop 保留直至策略 cancel
+    """
+
+    def __init__(self, tickers, capacity=64):
+        self.tickers = list(tickers)
+        self.ticker_idx = {t: j for j, t in enumerate(self.tickers)}
+        self.ticker_ids = np.zeros(capacity, dtype=np.int64)
+        self.stop_prices = np.full(capacity, np.nan)
+        self.size = 0
+        self._slots: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._slots)
+
+    def active_tickers(self):
+        return list(self._slots.keys())
+
+    def amend(self, ticker, stop_price):
+        j = self.ticker_idx.get(ticker)
+        if j is None or stop_price is None:
+            return
+        slot = self._slots.get(ticker)
+        if slot is None:
+            if self.size == len(self.stop_prices):
+                self._grow()
+            slot = self.size
+            self.size += 1
+            self._slots[ticker] = slot
+            self.ticker_ids[slot] = j
+        self.stop_prices[slot] = stop_price
+
+    def cancel(self, ticker):
+        slot = self._slots.pop(ticker, None)
+        if slot is None:
+            return
+        # 留空位 (NaN 永遠唔會觸發)，空位多過一半先壓縮，保持登記次序
+        self.stop_prices[slot] = np.nan
+        if self.size > 64 and len(self._slots) * 2 < self.size:
+            self._compact()
+
+    def triggered(self, lows):
+        """lows: 按 ticker 索引排列嘅當日 Low；回傳觸發咗嘅 [(ticker, stop 價)]，按登記次序"""
+        n = self.size
+        hit = np.flatnonzero(lows[self.ticker_ids[:n]] <= self.stop_prices[:n])
+        return [(self.tickers[self.ticker_ids[s]], self.stop_prices[s]) for s in hit]
+
+    def _grow(self):
+        capacity = len(self.stop_prices) * 2
+        self.ticker_ids = np.resize(self.ticker_ids, capacity)
+        stops = np.full(capacity, np.nan)
+        stops[:self.size] = self.stop_prices[:self.size]
+        self.stop_prices = stops
+
+    def _compact(self):
+        keep = [slot for slot in range(self.size) if not np.isnan(self.stop_prices[slot])]
+        n = len(keep)
+        self.ticker_ids[:n] = self.ticker_ids[keep]
+        self.stop_prices[:n] = self.stop_prices[keep]
+        self.stop_prices[n:] = np.nan
+        self.size = n
+        self._slots = {self.tickers[self.ticker_ids[slot]]: slot for slot in range(n)}
+
+
+class ColumnarLog:
+    """
+    預先分配、按需倍增嘅欄式記錄，取代逐筆 append dict
+    schema: {欄名: dtype}；"category" 欄以整數 code 儲存，"datetime64" 欄按第一筆數據嘅時間單位分配
+    """
+
+    def __init__(self, schema, capacity=1024):
+        self.schema = dict(schema)
+        self.size = 0
+        self._capacity = capacity
+        self._data = {}
+        self._codes = {name: {} for name, dtype in self.schema.items() if dtype == "category"}
+        self._labels = {name: [] for name in self._codes}
+        for name, dtype in self.schema.items():
+            if dtype == "category":
+                self._data[name] = np.empty(capacity, dtype=np.int32)
+            elif dtype != "datetime64":
+                self._data[name] = np.empty(capacity, dtype=dtype)
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, n):
+        need = self.size + n
+        if need <= self._capacity:
+            return
+        capacity = max(self._capacity * 2, need)
+        for name, col in self._data.items():
+            self._data[name] = np.resize(col, capacity)
+        self._capacity = capacity
+
+    def _encode(self, name, value):
+        code = self._codes[name].get(value)
+        if code is None:
+            code = len(self._labels[name])
+            self._codes[name][value] = code
+            self._labels[name].append(value)
+        return code
+
+    def _ensure_datetime(self, name, values):
+        if name not in self._data:
+            self._data[name] = np.empty(self._capacity, dtype=values.dtype)
+
+    def append(self, **row):
+        self._reserve(1)
+        i = self.size
+        for name, value in row.items():
+            dtype = self.schema[name]
+            if dtype == "category":
+                value = self._encode(name, value)
+            elif dtype == "datetime64":
+                value = pd.Timestamp(value).to_datetime64()
+                self._ensure_datetime(name, value)
+            self._data[name][i] = value
+        self.size += 1
+
+    def extend(self, **columns):
+        """一次過寫入多行；每欄傳入等長嘅 array-like"""
+        n = len(next(iter(columns.values())))
+        self._reserve(n)
+        i = self.size
+        for name, values in columns.items():
+            dtype = self.schema[name]
+            if dtype == "category":
+                values = [self._encode(name, v) for v in values]
+            elif dtype == "datetime64":
+                values = np.asarray(values)
+                self._ensure_datetime(name, values)
+            self._data[name][i:i + n] = values
+        self.size += n
+
+    def column(self, name):
+        values = self._data[name][:self.size]
+        if self.schema[name] == "category":
+            return np.asarray(self._labels[name], dtype=object)[values]
+        return values
+
+    def to_frame(self):
+        data = {}
+        for name, dtype in self.schema.items():
+            if dtype == "category":
+                data[name] = pd.Categorical.from_codes(self._data[name][:self.size].copy(), self._labels[name])
+            elif name in self._data:
+                data[name] = self._data[name][:self.size].copy()
+            else:
+                data[name] = pd.Series([], dtype="datetime64[ns]")
+        return pd.DataFrame(data, columns=list(self.schema))
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        arrays = []
+        for name, dtype in self.schema.items():
+            if dtype == "category":
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(self._data[name][:self.size]), pa.array(self._labels[name], type=pa.string())))
+            elif name in self._data:
+                arrays.append(pa.array(self._data[name][:self.size]))
+            else:
+                arrays.append(pa.array([], type=pa.timestamp("ns")))
+        return pa.Table.from_arrays(arrays, names=list(self.schema))
+
+    def to_parquet(self, path):
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path)
+
+    def __getstate__(self):
+        # checkpoint 只保存已用部分
+        state = dict(self.__dict__)
+        state["_data"] = {name: col[:self.size].copy() for name, col in self._data.items()}
+        state["_capacity"] = self.size
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._capacity = max(self._capacity, 1)
+        self._data = {name: np.resize(col, self._capacity) for name, col in self._data.items()}
+
+
+TRADE_SCHEMA = {"Date": "datetime64", "Ticker": "category", "Action": "category",
+                "Qty": "float64", "Price": "float64", "Commission": "float64"}
+EQUITY_SCHEMA = {"Date": "datetime64", "Equity": "float64"}
+TURNOVER_SCHEMA = {"Date": "datetime64", "Turnover": "float64"}
+
+
+def _stable_digest(value, h):
+    """將參數值穩定咁餵入 hash：DataFrame / Series 用內容雜湊，dict 按 key 排序"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        h.update(f"{type(value).__name__}{value.shape}{list(getattr(value, 'columns', []))}".encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(value.tobytes())
+    elif isinstance(value, dict):
+        for k in sorted(value, key=str):
+            h.update(f"{k!r}=".encode())
+            _stable_digest(value[k], h)
+            h.update(b";")
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value
+        h.update(f"{type(value).__name__}[".encode())
+        for item in items:
+            _stable_digest(item, h)
+            h.update(b",")
+        h.update(b"]")
+    else:
+        h.update(repr(value).encode())
+
+
 class UniversalBacktester:
-    def __init__(self, initial_capital=100000, calendar_ticker="SPY", allow_fractional=True, cost_model=None):
+    ENGINES = ("pandas", "columnar")
+    CHECKPOINT_VERSION = 2
+
+    def __init__(self, initial_capital=100000, calendar_ticker="SPY", allow_fractional=True, cost_model=None,
+                 engine="pandas", checkpoint_dir=None, checkpoint_every=0):
+        if engine not in self.ENGINES:
+            raise ValueError(f"未知引擎 {engine}，可選: {self.ENGINES}")
         self.initial_capital = initial_capital
         self.calendar_ticker = calendar_ticker
         self.allow_fractional = allow_fractional
         self.cost_model = cost_model or TransactionCostModel()
+        self.engine = engine
+        self._panel: Optional[PricePanel] = None
+        self.stop_registry: Optional[StopRegistry] = None
+        # checkpoint_every: 每處理幾多個 bar 寫一次快照 (0 = 只喺完結時寫)；checkpoint_dir 為 None 即唔寫
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
 
         self.cash = initial_capital
         self.positions: Dict[str, float] = {}
-        self.equity_curve = []
-        self.trade_log = []
-        self.turnover_log = []
+        self.equity_curve = ColumnarLog(EQUITY_SCHEMA)
+        self.trade_log = ColumnarLog(TRADE_SCHEMA)
+        self.turnover_log = ColumnarLog(TURNOVER_SCHEMA)
 
     def _build_trading_days(self, prices_dict, start_date, end_date):
         if self.calendar_ticker in prices_dict:
@@ -56,16 +375,33 @@ class UniversalBacktester:
         union_idx = sorted(set().union(*all_indices))
         return pd.DatetimeIndex(union_idx)
 
-    def _align_prices(self, prices_dict, trading_days):
-        return {t: df.reindex(trading_days).ffill() for t, df in prices_dict.items()}
+    def _align_prices(self, prices_dict, trading_days, aligned=False):
+        # aligned=True：調用方已經 reindex(trading_days).ffill() 過 (例如 parameter sweep 嘅共享 panel)，
+        # index 一致就直接用，唔再逐隻複製
+        return {t: df if aligned and df.index.equals(trading_days) else df.reindex(trading_days).ffill()
+                for t, df in prices_dict.items()}
 
     def _get_bar(self, ticker, date, prices_dict):
         if ticker in prices_dict and date in prices_dict[ticker].index:
             return prices_dict[ticker].loc[date]
         return None
 
+    def _get_price(self, ticker, date, prices_dict, field="Close"):
+        if self._panel is not None:
+            return self._panel.value(date, ticker, field)
+        bar = self._get_bar(ticker, date, prices_dict)
+        return None if bar is None else bar[field]
+
     def _calc_portfolio_value(self, date, prices_dict):
         value = self.cash
+        if self._panel is not None:
+            closes = self._panel.row_values(date, "Close")
+            for ticker, qty in self.positions.items():
+                j = self._panel.ticker_idx.get(ticker)
+                if j is not None:
+                    value += qty * closes[j]
+            return value
+
         for ticker, qty in self.positions.items():
             bar = self._get_bar(ticker, date, prices_dict)
             if bar is not None:
@@ -94,21 +430,48 @@ class UniversalBacktester:
         if abs(self.positions[ticker]) < 1e-8:
             del self.positions[ticker]
 
-        self.trade_log.append({
-            "Date": date,
-            "Ticker": ticker,
-            "Action": "BUY" if qty > 0 else "SELL",
-            "Qty": qty,
-            "Price": exec_price,
-            "Commission": commission
-        })
+        self.trade_log.append(
+            Date=date,
+            Ticker=ticker,
+            Action="BUY" if qty > 0 else "SELL",
+            Qty=qty,
+            Price=exec_price,
+            Commission=commission
+        )
+
+    def _trigger_resting_stops(self, date, prices_dict):
+        registry = self.stop_registry
+        if registry is None or not len(registry):
+            return
+        if self._panel is not None:
+            lows = self._panel.row_values(date, "Low")
+        else:
+            lows = np.full(len(registry.tickers), np.nan)
+            for ticker in registry.active_tickers():
+                low = self._get_price(ticker, date, prices_dict, "Low")
+                if low is not None:
+                    lows[registry.ticker_idx[ticker]] = low
+        for ticker, stop_price in registry.triggered(lows):
+            self._process_trade(date, ticker, -self.positions.get(ticker, 0), stop_price)
+
+    def _apply_stop_events(self, orders):
+        if self.stop_registry is None:
+            return
+        for order in orders:
+            if order.order_type == "STOP_AMEND":
+                self.stop_registry.amend(order.ticker, order.stop_loss)
+            elif order.order_type == "STOP_CANCEL":
+                self.stop_registry.cancel(order.ticker)
 
     def _execute_orders(self, orders, date, prices_dict, portfolio_value):
+        # STOP_AMEND / STOP_CANCEL 只改 registry，由下一個 bar 開始生效
+        self._apply_stop_events(orders)
+
         for order in [o for o in orders if o.order_type == "STOP_LIMIT"]:
-            bar = self._get_bar(order.ticker, date, prices_dict)
-            if bar is None or order.stop_loss is None:
+            low = self._get_price(order.ticker, date, prices_dict, "Low")
+            if low is None or order.stop_loss is None:
                 continue
-            if bar["Low"] <= order.stop_loss:
+            if low <= order.stop_loss:
                 qty = order.quantity if order.quantity != 0 else -self.positions.get(order.ticker, 0)
                 self._process_trade(date, order.ticker, qty, order.stop_loss)
 
@@ -121,10 +484,9 @@ class UniversalBacktester:
 
             turnover = 0.0
             for ticker, target_weight in target_map.items():
-                bar = self._get_bar(ticker, date, prices_dict)
-                if bar is None:
+                price = self._get_price(ticker, date, prices_dict)
+                if price is None:
                     continue
-                price = bar["Close"]
                 current_qty = self.positions.get(ticker, 0)
                 current_value = current_qty * price
                 target_value = portfolio_value * target_weight
@@ -133,27 +495,238 @@ class UniversalBacktester:
                 turnover += abs(diff_value)
                 self._process_trade(date, ticker, qty_to_trade, price)
 
-            self.turnover_log.append({"Date": date, "Turnover": turnover / portfolio_value})
+            self.turnover_log.append(Date=date, Turnover=turnover / portfolio_value)
 
         for order in [o for o in orders if o.order_type == "MARKET"]:
-            bar = self._get_bar(order.ticker, date, prices_dict)
-            if bar is None:
+            price = self._get_price(order.ticker, date, prices_dict)
+            if price is None:
                 continue
-            self._process_trade(date, order.ticker, order.quantity, bar["Close"])
+            self._process_trade(date, order.ticker, order.quantity, price)
 
-    def run(self, strategy: BaseStrategy, prices_dict, start_date, end_date):
+    def _mark_to_market(self, close_block):
+        # 逐隻持倉累加，次序同 _calc_portfolio_value 一樣
+        value = np.full(len(close_block), float(self.cash))
+        for ticker, qty in self.positions.items():
+            j = self._panel.ticker_idx.get(ticker)
+            if j is not None:
+                value += qty * close_block[:, j]
+        return value
+
+    def _skip_days(self, start, stop, trading_days, prices_dict):
+        """[start, stop) 行冇決策：向量化 mark-to-market，逐段搵常駐 stop 最早觸發日"""
+        close = self._panel.field("Close")
+        low = self._panel.field("Low")
+        registry = self.stop_registry
+        while start < stop:
+            end, hit = stop, False
+            if registry is not None and len(registry):
+                n = registry.size
+                hits = (low[start:stop][:, registry.ticker_ids[:n]] <= registry.stop_prices[:n]).any(axis=1)
+                if hits.any():
+                    end, hit = start + int(np.argmax(hits)) + 1, True
+
+            # 觸發日當日 equity 係成交前嘅市值，同逐日引擎一致
+            equity = self._mark_to_market(close[start:end])
+            self.equity_curve.extend(Date=trading_days[start:end].values, Equity=equity)
+            if hit:
+                self._trigger_resting_stops(trading_days[end - 1], prices_dict)
+            start = end
+
+    # ------------------------------------------------------------
+    # Checkpoint：引擎 + 策略狀態快照，resume 時只處理快照之後嘅 bar
+    # ------------------------------------------------------------
+    def _config_hash(self, strategy):
+        """資金、成本模型、策略類別 + 原始碼 + 全部 params；任何一樣改咗舊 checkpoint 就唔再用"""
+        h = hashlib.sha1()
+        _stable_digest({
+            "initial_capital": self.initial_capital,
+            "allow_fractional": self.allow_fractional,
+            "calendar_ticker": self.calendar_ticker,
+            "cost_model": (type(self.cost_model).__name__, vars(self.cost_model)),
+            "strategy": type(strategy).__qualname__,
+            "params": strategy.params(),
+        }, h)
+        for cls in (type(strategy), type(self)):
+            try:
+                h.update(inspect.getsource(cls).encode())
+            except (OSError, TypeError):
+                h.update(cls.__qualname__.encode())
+        return h.hexdigest()
+
+    def _build_price_hashes(self, prices_dict, trading_days):
+        """
+        每個交易日一個 uint64 (所有 ticker 嗰日 OHLCV 行雜湊嘅組合)，再做前綴累加：
+        _price_hash(date) = 由第一日到 date 嘅價格歷史指紋，O(1) 查；新增 bar 唔影響舊日子嘅指紋，
+        但歷史重新調整 / 補數據 / universe 改變都會令指紋唔同
+        """
+        combined = np.zeros(len(trading_days), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for ticker in sorted(prices_dict):
+                df = prices_dict[ticker]
+                cols = [c for c in PricePanel.FIELDS if c in df.columns]
+                rows = pd.util.hash_pandas_object(df[cols], index=True).to_numpy(dtype=np.uint64)
+                salt = pd.util.hash_pandas_object(pd.Index([ticker])).to_numpy(dtype=np.uint64)[0] | np.uint64(1)
+                combined += rows * salt
+            self._price_prefix = np.cumsum(combined, dtype=np.uint64)
+        self._price_days = trading_days
+
+    def _price_hash(self, date):
+        row = int(self._price_days.searchsorted(pd.Timestamp(date), side="right")) - 1
+        return None if row < 0 else f"{row}:{int(self._price_prefix[row])}"
+
+    def checkpoint_path(self, name):
+        return os.path.join(self.checkpoint_dir, f"{name}.pkl")
+
+    def save_checkpoint(self, strategy, date, name=None):
+        state = {
+            "version": self.CHECKPOINT_VERSION,
+            "strategy": strategy.name,
+            "config_hash": self._config_hash(strategy),
+            "price_hash": self._price_hash(date),
+            "last_date": date,
+            "cash": self.cash,
+            "positions": dict(self.positions),
+            "equity_curve": self.equity_curve,
+            "trade_log": self.trade_log,
+            "turnover_log": self.turnover_log,
+            # 按登記次序保存，restore 後觸發次序不變
+            "stops": {t: self.stop_registry.stop_prices[slot] for t, slot in self.stop_registry._slots.items()},
+            "strategy_state": strategy.get_state(),
+        }
+        path = self.checkpoint_path(name or strategy.name)
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # 先寫暫存檔再 rename，中途 crash 都唔會損壞上一個快照
+        os.replace(tmp, path)
+
+    def load_checkpoint(self, name):
+        if self.checkpoint_dir is None:
+            return None
+        path = self.checkpoint_path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != self.CHECKPOINT_VERSION:
+            print(f"⚠️ Checkpoint 版本唔符 ({path})，由頭回測")
+            return None
+        return state
+
+    def _restore_checkpoint(self, state, strategy):
+        self.cash = state["cash"]
+        self.positions = dict(state["positions"])
+        self.equity_curve = state["equity_curve"]
+        self.trade_log = state["trade_log"]
+        self.turnover_log = state["turnover_log"]
+        for ticker, stop_price in state["stops"].items():
+            self.stop_registry.amend(ticker, stop_price)
+        strategy.set_state(state["strategy_state"])
+
+    def _maybe_checkpoint(self, row, trading_days, strategy, name):
+        if self.checkpoint_dir is None or not self.checkpoint_every:
+            return
+        # 未完成嘅 bar (例如今日盤中) 唔入快照，下次續跑會用收市價重新計
+        if row >= self._complete_rows:
+            return
+        if row + 1 - self._last_checkpoint_row >= self.checkpoint_every:
+            self.save_checkpoint(strategy, trading_days[row], name)
+            self._last_checkpoint_row = row + 1
+
+    def run(self, strategy: BaseStrategy, prices_dict, start_date, end_date, resume=False, checkpoint_name=None,
+            aligned=False, complete_through=None):
+        """
+        resume: 有相符 checkpoint 就由快照之後繼續；資金 / 成本模型 / 策略參數 / 原始碼 / 快照日之前嘅價格
+                任何一樣唔同都會由頭回測
+        complete_through: 最後一個已完成 (已收市) 嘅 bar 日期，只有呢日或之前嘅 bar 會寫入 checkpoint；
+                          預設係今日之前 (今日嘅 bar 可能係盤中數據)
+        """
         print(f"🚀 啟動回測引擎: {strategy.name}")
+        name = checkpoint_name or strategy.name
         trading_days = self._build_trading_days(prices_dict, start_date, end_date)
-        prices_dict = self._align_prices(prices_dict, trading_days)
-
-        for date in trading_days:
+        prices_dict = self._align_prices(prices_dict, trading_days, aligned=aligned)
+        schedule = strategy.decision_dates(trading_days)
+        # 跳日模式需要 panel 做向量化 mark-to-market
+        use_panel = self.engine == "columnar" or schedule is not None
+        self._panel = PricePanel.from_prices(prices_dict, trading_days) if use_panel else None
+        self.stop_registry = StopRegistry(prices_dict.keys())
+        strategy.prepare(prices_dict)
+
+        if complete_through is None:
+            complete_through = pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+        self._complete_rows = int(trading_days.searchsorted(pd.Timestamp(complete_through), side="right"))
+        if self.checkpoint_dir is not None:
+            self._build_price_hashes(prices_dict, trading_days)
+
+        first_row = 0
+        state = self.load_checkpoint(name) if resume else None
+        if state is not None:
+            reason = None
+            if len(state["equity_curve"]) and state["equity_curve"].column("Date")[0] != trading_days[0]:
+                reason = "起始日同今次回測唔同"
+            elif state.get("config_hash") != self._config_hash(strategy):
+                reason = "資金 / 成本模型 / 策略參數或原始碼有改"
+            elif state.get("price_hash") != self._price_hash(state["last_date"]):
+                reason = "快照日之前嘅價格歷史有變 (重新調整 / 補數據 / universe 改變)"
+            if reason:
+                print(f"⚠️ Checkpoint {reason}，由頭回測")
+                state = None
+        if state is not None:
+            self._restore_checkpoint(state, strategy)
+            first_row = int(trading_days.searchsorted(pd.Timestamp(state["last_date"]), side="right"))
+            print(f"♻️ 由 checkpoint 續跑: {state['last_date']:%Y-%m-%d} 之後尚有 {len(trading_days) - first_row} 個 bar")
+            if schedule is not None:
+                # 策略狀態已還原，重新取排程 (例如已做過嘅 rebalance 唔會再排)
+                schedule = strategy.decision_dates(trading_days[first_row:])
+        self._last_checkpoint_row = first_row
+
+        if schedule is None:
+            decision_rows = list(range(first_row, len(trading_days)))
+        else:
+            decision_rows = sorted({self._panel.date_idx[d] for d in schedule
+                                    if self._panel.date_idx.get(d, -1) >= first_row})
+
+        # 先跑完已完成嘅 bar 再寫快照，之後先處理未完成嘅 bar
+        split = max(first_row, self._complete_rows)
+        self._run_rows(first_row, split, [i for i in decision_rows if i < split], trading_days, prices_dict,
+                       strategy, name)
+        if self.checkpoint_dir is not None and first_row < split:
+            self.save_checkpoint(strategy, trading_days[split - 1], name)
+        self._run_rows(split, len(trading_days), [i for i in decision_rows if i >= split], trading_days,
+                       prices_dict, strategy, name)
+
+        return self.equity_curve.to_frame()
+
+    def _run_rows(self, start, stop, decision_rows, trading_days, prices_dict, strategy, name):
+        """處理 [start, stop) 行：決策日逐日跑，中間冇決策嘅日子向量化跳過"""
+        next_row = start
+        for i in decision_rows:
+            if i > next_row:
+                self._skip_days(next_row, i, trading_days, prices_dict)
+                self._maybe_checkpoint(i - 1, trading_days, strategy, name)
+            date = trading_days[i]
             portfolio_value = self._calc_portfolio_value(date, prices_dict)
-            self.equity_curve.append({"Date": date, "Equity": portfolio_value})
+            self.equity_curve.append(Date=date, Equity=portfolio_value)
             orders = strategy.on_bar(date, prices_dict, portfolio_value)
+            self._trigger_resting_stops(date, prices_dict)
             if orders:
                 self._execute_orders(orders, date, prices_dict, portfolio_value)
-
-        return pd.DataFrame(self.equity_curve)
+            self._maybe_checkpoint(i, trading_days, strategy, name)
+            next_row = i + 1
+
+        if next_row < stop:
+            self._skip_days(next_row, stop, trading_days, prices_dict)
+
+    def save_results(self, out_dir, prefix=""):
+        """equity / 交易 / turnover 直接由欄式緩衝寫 Parquet，回傳各檔案路徑"""
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {}
+        for name, log in (("equity_curve", self.equity_curve), ("trade_log", self.trade_log),
+                          ("turnover", self.turnover_log)):
+            paths[name] = os.path.join(out_dir, f"{prefix}{name}.parquet")
+            log.to_parquet(paths[name])
+        return paths
 
 
 class PerformanceAnalyzer:
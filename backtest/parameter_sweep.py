@@ -0,0 +1,207 @@
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from universal_backtester import UniversalBacktester, PerformanceAnalyzer
+from utils.shared_arrays import SharedArray
+
+
+def expand_grid(param_grid):
+    """{'a': [1, 2], 'b': [3]} -> [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]"""
+    keys = list(param_grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+
+def params_key(params):
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def pack_prices(prices_dict):
+    """
+    將 {ticker: DataFrame} 打包成一個 (ticker, date, field) 連續陣列
+    每隻股票一段連續記憶體，worker 可以直接包成 DataFrame 而唔使複製
+    """
+    tickers = list(prices_dict.keys())
+    fields = [c for c in prices_dict[tickers[0]].columns
+              if all(c in prices_dict[t].columns for t in tickers)]
+    dates = pd.DatetimeIndex(sorted(set().union(*(df.index for df in prices_dict.values()))))
+
+    values = np.full((len(tickers), len(dates), len(fields)), np.nan)
+    rows = []
+    for j, ticker in enumerate(tickers):
+        df = prices_dict[ticker]
+        pos = dates.get_indexer(df.index)
+        values[j, pos] = df[fields].to_numpy(dtype=float)
+        # 冇缺口就用 slice (零複製)，否則記低實際有數據嘅行
+        if len(pos) and pos[-1] - pos[0] + 1 == len(pos):
+            rows.append((int(pos[0]), int(pos[-1]) + 1))
+        else:
+            rows.append(pos)
+    return values, dates, tickers, fields, rows
+
+
+def unpack_prices(values, dates, tickers, fields, rows):
+    prices = {}
+    for j, ticker in enumerate(tickers):
+        r = rows[j]
+        if isinstance(r, tuple):
+            prices[ticker] = pd.DataFrame(values[j, r[0]:r[1]], index=dates[r[0]:r[1]], columns=fields, copy=False)
+        else:
+            prices[ticker] = pd.DataFrame(values[j, r], index=dates[r], columns=fields)
+    return prices
+
+
+# ------------------------------------------------------------
+# Worker：每個進程 attach 一次共享價格，之後只收參數
+# ------------------------------------------------------------
+WORKER = {}
+
+
+def init_worker(spec, dates, tickers, fields, rows, job):
+    shared = SharedArray.attach(spec)
+    WORKER["shared"] = shared
+    WORKER["prices"] = unpack_prices(shared.array, dates, tickers, fields, rows)
+    WORKER["job"] = job
+
+
+def build_strategy(job, params, **extra):
+    return job["strategy_cls"](**{**job["strategy_kwargs"], **params, **extra})
+
+
+def run_backtest_job(prices, job, strategy, start_date, end_date):
+    backtester = UniversalBacktester(**job["backtester_kwargs"])
+    equity = backtester.run(strategy, prices, start_date, end_date, aligned=job.get("aligned", False))
+
+    benchmark = job.get("benchmark")
+    bench_prices = prices[benchmark]["Close"] if benchmark in prices else None
+    metrics, _ = PerformanceAnalyzer(**job["analyzer_kwargs"]).analyze(equity, benchmark_prices=bench_prices)
+    return equity, backtester, metrics
+
+
+def _run_one(params):
+    job = WORKER["job"]
+    t0 = time.perf_counter()
+    strategy = build_strategy(job, params)
+    equity, backtester, metrics = run_backtest_job(WORKER["prices"], job, strategy, job["start_date"], job["end_date"])
+    return {
+        **params,
+        **metrics,
+        "Final Equity": float(equity["Equity"].iloc[-1]),
+        "Trades": len(backtester.trade_log),
+        "Seconds": time.perf_counter() - t0,
+        "params_key": params_key(params)
+    }
+
+
+class ParameterSweep:
+    """
+    參數掃描：strategy_cls + param_grid，用 process pool 並行跑 UniversalBacktester
+    價格只載入一次，經 shared memory 零複製畀 worker；結果逐筆寫入 results_path，可斷點續跑
+    """
+
+    def __init__(self,
+                 strategy_cls,
+                 param_grid,
+                 strategy_kwargs=None,
+                 backtester_kwargs=None,
+                 analyzer_kwargs=None,
+                 start_date="2015-01-01",
+                 end_date=None,
+                 benchmark="SPY",
+                 n_workers=None,
+                 results_path=None):
+        self.strategy_cls = strategy_cls
+        self.param_grid = param_grid
+        self.strategy_kwargs = strategy_kwargs or {}
+        self.backtester_kwargs = backtester_kwargs or {}
+        self.analyzer_kwargs = analyzer_kwargs or {}
+        self.start_date = start_date
+        self.end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+        self.benchmark = benchmark
+        self.n_workers = n_workers or os.cpu_count()
+        self.results_path = results_path
+
+    def _load_done(self):
+        if self.results_path is None or not os.path.exists(self.results_path):
+            return pd.DataFrame()
+        return pd.read_csv(self.results_path)
+
+    @property
+    def failed_path(self):
+        if self.results_path is None:
+            return None
+        root, ext = os.path.splitext(self.results_path)
+        return f"{root}_failed{ext or '.csv'}"
+
+    def _append_result(self, row):
+        if self.results_path is None:
+            return
+        os.makedirs(os.path.dirname(self.results_path) or ".", exist_ok=True)
+        header = not os.path.exists(self.results_path)
+        pd.DataFrame([row]).to_csv(self.results_path, mode="a", header=header, index=False)
+
+    def _job(self):
+        return {
+            "strategy_cls": self.strategy_cls,
+            "strategy_kwargs": self.strategy_kwargs,
+            "backtester_kwargs": self.backtester_kwargs,
+            "analyzer_kwargs": self.analyzer_kwargs,
+            "benchmark": self.benchmark,
+            "start_date": self.start_date,
+            "end_date": self.end_date
+        }
+
+    def _record_failure(self, params, error):
+        """失敗嘅參數組都放入結果 (Error 欄)，另外寫入 *_failed.csv；唔入 results_path，續跑時會重試"""
+        row = {**params, "Error": repr(error), "params_key": params_key(params)}
+        if self.failed_path is not None:
+            os.makedirs(os.path.dirname(self.failed_path) or ".", exist_ok=True)
+            header = not os.path.exists(self.failed_path)
+            pd.DataFrame([row]).to_csv(self.failed_path, mode="a", header=header, index=False)
+        return row
+
+    def run(self, prices_dict):
+        done = self._load_done()
+        done_keys = set(done["params_key"]) if "params_key" in done.columns else set()
+        todo = [p for p in expand_grid(self.param_grid) if params_key(p) not in done_keys]
+        print(f"🧪 參數掃描: {self.strategy_cls.__name__} | 共 {len(todo) + len(done_keys)} 組，"
+              f"已完成 {len(done_keys)}，待跑 {len(todo)}")
+
+        results = []
+        failures = []
+        if todo:
+            # 主進程先按回測日曆對齊一次 (同 UniversalBacktester.run 一樣)，worker 就唔使逐 job 重新 reindex / 複製
+            backtester = UniversalBacktester(**self.backtester_kwargs)
+            trading_days = backtester._build_trading_days(prices_dict, self.start_date, self.end_date)
+            values, dates, tickers, fields, rows = pack_prices(backtester._align_prices(prices_dict, trading_days))
+            shared = SharedArray.create(values)
+            del values
+            try:
+                with ProcessPoolExecutor(max_workers=self.n_workers,
+                                         initializer=init_worker,
+                                         initargs=(shared.spec, dates, tickers, fields, rows,
+                                                   {**self._job(), "aligned": True})) as executor:
+                    futures = {executor.submit(_run_one, p): p for p in todo}
+                    for future in tqdm(as_completed(futures), total=len(futures)):
+                        try:
+                            row = future.result()
+                        except Exception as e:
+                            print(f"⚠️ 參數 {futures[future]} 回測失敗: {e}")
+                            failures.append(self._record_failure(futures[future], e))
+                            continue
+                        results.append(row)
+                        self._append_result(row)
+            finally:
+                shared.unlink()
+
+        if failures:
+            print(f"⚠️ {len(failures)} 組參數失敗" + (f"，見 {self.failed_path}" if self.failed_path else ""))
+        table = pd.concat([done, pd.DataFrame(results), pd.DataFrame(failures)], ignore_index=True)
+        return table.drop(columns=["params_key"], errors="ignore")
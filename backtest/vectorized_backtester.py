@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from universal_backtester import UniversalBacktester, PricePanel, Order
+
+
+class VectorizedWeightBacktester(UniversalBacktester):
+    """
+    純 TARGET_WEIGHT 策略嘅向量化回測
+    策略一次過提供所有 rebalance 日嘅權重 (target_weights)，只喺 rebalance 日成交，
+    中間日子用持倉向量做 mark-to-market，equity / trade_log / turnover_log 同 run() 一致
+    """
+
+    def run(self, strategy, prices_dict, start_date, end_date):
+        trading_days = self._build_trading_days(prices_dict, start_date, end_date)
+        prices_dict = self._align_prices(prices_dict, trading_days)
+        weights = strategy.target_weights(prices_dict, trading_days)
+        return self.run_weights(weights, prices_dict, trading_days)
+
+    def run_weights(self, weights, prices_dict, trading_days):
+        """
+        weights: {date: {ticker: weight}} 或 DataFrame (rebalance 日 x ticker，NaN 代表唔持有)
+        prices_dict 需已對齊到 trading_days
+        """
+        if isinstance(weights, pd.DataFrame):
+            weights = {d: row.dropna().to_dict() for d, row in weights.iterrows()}
+
+        self._panel = PricePanel.from_prices(prices_dict, trading_days, fields=("Close",))
+        close = self._panel.field("Close")
+        equity = np.empty(len(trading_days))
+
+        seg_start = 0
+        for date in sorted(weights):
+            target = weights[date]
+            i = self._panel.date_idx.get(pd.Timestamp(date))
+            if i is None or not target:
+                continue
+
+            equity[seg_start:i + 1] = self._mark_to_market(close[seg_start:i + 1])
+            orders = [Order(t, "TARGET_WEIGHT", target_weight=w) for t, w in target.items()]
+            self._execute_orders(orders, trading_days[i], prices_dict, equity[i])
+            seg_start = i + 1
+
+        equity[seg_start:] = self._mark_to_market(close[seg_start:])
+
+        self.equity_curve.extend(Date=trading_days.values, Equity=equity)
+        return self.equity_curve.to_frame()
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from universal_backtester import UniversalBacktester
+from parameter_sweep import (expand_grid, params_key, pack_prices, init_worker, build_strategy,
+                             run_backtest_job, WORKER)
+from utils.shared_arrays import SharedArray
+
+
+def build_windows(start_date, end_date, in_sample_years=3, out_sample_months=6):
+    """滾動窗口：每個 OOS 區間前面緊接 in_sample_years 年嘅 IS 區間"""
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    windows = []
+    oos_start = start + pd.DateOffset(years=in_sample_years)
+    while oos_start <= end:
+        oos_end = min(oos_start + pd.DateOffset(months=out_sample_months) - pd.Timedelta(days=1), end)
+        windows.append({
+            "window": len(windows),
+            "is_start": oos_start - pd.DateOffset(years=in_sample_years),
+            "is_end": oos_start - pd.Timedelta(days=1),
+            "oos_start": oos_start,
+            "oos_end": oos_end
+        })
+        oos_start = oos_start + pd.DateOffset(months=out_sample_months)
+    return windows
+
+
+def stitch_equity(curves, initial_capital):
+    """將各 OOS equity 按比例接駁：每段起點 = 上一段終點"""
+    stitched = []
+    level = float(initial_capital)
+    for curve in curves:
+        if curve is None or curve.empty:
+            continue
+        scale = level / curve["Equity"].iloc[0]
+        seg = curve.assign(Equity=curve["Equity"] * scale)
+        stitched.append(seg)
+        level = seg["Equity"].iloc[-1]
+    if not stitched:
+        return pd.DataFrame(columns=["Date", "Equity"])
+    return pd.concat(stitched, ignore_index=True)
+
+
+# ------------------------------------------------------------
+# Worker：指標快取跨窗口重用
+# ------------------------------------------------------------
+MAX_CACHED_FEATURE_SETS = 4
+
+
+def _data_fingerprint(values, dates, tickers, fields, rows):
+    """打包後價格嘅內容雜湊，feature_cache 用佢做 key 一部分，數據一變舊指標就唔會命中"""
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(values).tobytes())
+    h.update(dates.asi8.tobytes())
+    h.update("|".join(map(str, tickers)).encode())
+    h.update("|".join(fields).encode())
+    for r in rows:
+        h.update(np.asarray(r, dtype=np.int64).tobytes() + b";")
+    return h.hexdigest()
+
+
+def _full_history():
+    # 每個 worker 只對齊一次全歷史，畀策略喺全歷史上預計指標
+    if "full_prices" not in WORKER:
+        bt = UniversalBacktester(**WORKER["job"]["backtester_kwargs"])
+        prices = WORKER["prices"]
+        days = bt._build_trading_days(prices, None, None)
+        WORKER["full_prices"] = bt._align_prices(prices, days)
+    return WORKER["full_prices"]
+
+
+def _run_window(task):
+    phase, window, params = task
+    job = WORKER["job"]
+    t0 = time.perf_counter()
+
+    extra = {}
+    if hasattr(job["strategy_cls"], "feature_key"):
+        cache = WORKER.setdefault("feature_cache", OrderedDict())
+        extra["feature_cache"] = cache
+        extra["data_fingerprint"] = job["data_fingerprint"]
+    strategy = build_strategy(job, params, **extra)
+    if extra:
+        # 全歷史指標只計一次，之後所有重疊窗口 prepare 時直接命中快取
+        strategy.prepare(_full_history())
+        cache.move_to_end(strategy.cache_key())
+        while len(cache) > MAX_CACHED_FEATURE_SETS:
+            cache.popitem(last=False)
+
+    start, end = (window["is_start"], window["is_end"]) if phase == "IS" else (window["oos_start"], window["oos_end"])
+    equity, backtester, metrics = run_backtest_job(WORKER["prices"], job, strategy, start, end)
+    return {
+        "phase": phase,
+        "window": window["window"],
+        "params": params,
+        "metrics": metrics,
+        "equity": equity if phase == "OOS" else None,
+        "Trades": len(backtester.trade_log),
+        "Seconds": time.perf_counter() - t0
+    }
+
+
+class WalkForwardOptimizer:
+    """
+    Walk-forward：滾動 IS / OOS 窗口，IS 內做參數掃描揀最佳，OOS 用最佳參數回測再接駁成一條 equity
+    所有窗口喺 process pool 並行跑；價格經 shared memory 共享，SwingBase 指標喺每個 worker 只計一次
+    """
+
+    def __init__(self,
+                 strategy_cls,
+                 param_grid,
+                 strategy_kwargs=None,
+                 backtester_kwargs=None,
+                 analyzer_kwargs=None,
+                 start_date="2015-01-01",
+                 end_date=None,
+                 in_sample_years=3,
+                 out_sample_months=6,
+                 metric="Sharpe",
+                 benchmark="SPY",
+                 n_workers=None):
+        self.strategy_cls = strategy_cls
+        self.param_grid = param_grid
+        self.strategy_kwargs = strategy_kwargs or {}
+        self.backtester_kwargs = backtester_kwargs or {}
+        self.analyzer_kwargs = analyzer_kwargs or {}
+        self.start_date = start_date
+        self.end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+        self.in_sample_years = in_sample_years
+        self.out_sample_months = out_sample_months
+        self.metric = metric
+        self.benchmark = benchmark
+        self.n_workers = n_workers or os.cpu_count()
+
+    def _job(self):
+        return {
+            "strategy_cls": self.strategy_cls,
+            "strategy_kwargs": self.strategy_kwargs,
+            "backtester_kwargs": self.backtester_kwargs,
+            "analyzer_kwargs": self.analyzer_kwargs,
+            "benchmark": self.benchmark
+        }
+
+    def _map(self, executor, tasks):
+        results = []
+        futures = {executor.submit(_run_window, t): t for t in tasks}
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                phase, window, params = futures[future]
+                print(f"⚠️ {phase} 窗口 {window['window']} 參數 {params} 回測失敗: {e}")
+        return results
+
+    def _pick_best(self, is_results):
+        best = {}
+        for r in is_results:
+            score = r["metrics"].get(self.metric, np.nan)
+            if score is None or not np.isfinite(score):
+                continue
+            w = r["window"]
+            if w not in best or score > best[w]["score"]:
+                best[w] = {"params": r["params"], "score": score}
+        return best
+
+    def run(self, prices_dict):
+        windows = build_windows(self.start_date, self.end_date, self.in_sample_years, self.out_sample_months)
+        grid = expand_grid(self.param_grid)
+        print(f"🔁 Walk-forward: {self.strategy_cls.__name__} | {len(windows)} 個窗口 x {len(grid)} 組參數")
+
+        values, dates, tickers, fields, rows = pack_prices(prices_dict)
+        job = {**self._job(), "data_fingerprint": _data_fingerprint(values, dates, tickers, fields, rows)}
+        shared = SharedArray.create(values)
+        del values
+        try:
+            with ProcessPoolExecutor(max_workers=self.n_workers,
+                                     initializer=init_worker,
+                                     initargs=(shared.spec, dates, tickers, fields, rows, job)) as executor:
+                # 同一組指標參數排埋一齊，worker 快取命中率最高
+                tasks = [("IS", w, p) for p in sorted(grid, key=params_key) for w in windows]
+                best = self._pick_best(self._map(executor, tasks))
+
+                oos_tasks = [("OOS", w, best[w["window"]]["params"]) for w in windows if w["window"] in best]
+                oos_results = {r["window"]: r for r in self._map(executor, oos_tasks)}
+        finally:
+            shared.unlink()
+
+        summary = []
+        for w in windows:
+            r = oos_results.get(w["window"])
+            row = {**w, "best_params": best.get(w["window"], {}).get("params"),
+                   f"IS_{self.metric}": best.get(w["window"], {}).get("score", np.nan)}
+            if r is not None:
+                row.update({f"OOS_{k}": v for k, v in r["metrics"].items()})
+                row["OOS_Trades"] = r["Trades"]
+            summary.append(row)
+
+        initial_capital = self.backtester_kwargs.get("initial_capital", 100000)
+        curves = [oos_results[w["window"]]["equity"] for w in windows if w["window"] in oos_results]
+        return stitch_equity(curves, initial_capital), pd.DataFrame(summary)
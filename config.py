@@ -4,7 +4,8 @@ from pathlib import Path
 DEFAULT_CONFIG = {
     "paths": {
         "raw_data": "data/raw",
-        "processed_data": "data/processed"
+        "processed_data": "data/processed",
+        "price_store": "data/price_store"
     },
     "universe": {
         "symbols": ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA"]
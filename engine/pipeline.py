@@ -1,7 +1,10 @@
-import os
 from typing import Tuple, List, Dict
 
+import pandas as pd
+
 from data_layer import Config, UniverseProvider, PriceDownloader
+from layers.panel_cache import PanelCache
+from layers.price_store import memory_summary
 from strategy_long_term import LongTermStrategy
 
 
@@ -10,24 +13,88 @@ class QuantPipeline:
         self.strategy_cls = strategy_cls
         self.universe_provider = UniverseProvider()
         self.price_downloader = PriceDownloader()
+        self.panel_cache = PanelCache(Config.PANEL_CACHE_DIR, self.price_downloader.store)
 
     def build_universe(self) -> Tuple[object, List[str]]:
         universe_df = self.universe_provider.build_universe()
         tickers = universe_df["Ticker"].tolist()
         return universe_df, tickers
 
-    def ensure_prices(self, tickers: List[str], min_ratio: float = 0.5) -> List[str]:
-        existing_files = [
-            f for f in os.listdir(Config.PRICES_DIR)
-            if f.endswith(".parquet")
-        ]
-        if len(existing_files) < len(tickers) * min_ratio:
-            print("⚠️ 數據不足，開始下載...")
-            self.price_downloader.download_all(tickers)
-        return existing_files
-
-    def load_prices(self, tickers: List[str]) -> Dict[str, object]:
-        return self.price_downloader.load_prices(tickers)
+    def ensure_prices(self, tickers: List[str], max_lag_days: int = 3, min_coverage: float = 0.9) -> List[str]:
+        """
+        按 price store manifest 逐隻檢查：missing / truncated 全量下載，stale 增量更新，ok 唔郁
+        回傳處理完之後 store 入面有數據嘅 ticker
+        """
+        store = self.price_downloader.store
+        status = store.freshness(tickers, max_lag_days=max_lag_days, min_coverage=min_coverage)
+        counts = status.value_counts().to_dict()
+        print("🗂️ 價格狀態: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+
+        full = status.index[status.isin(["missing", "truncated"])].tolist()
+        stale = status.index[status == "stale"].tolist()
+        if full:
+            print(f"⚠️ {len(full)} 隻缺失 / 不完整，全量下載...")
+            self.price_downloader.download_all(full)
+        if stale:
+            print(f"⚠️ {len(stale)} 隻過期，增量更新...")
+            self.price_downloader.update_all(stale)
+
+        manifest = store.manifest()
+        return [t for t in tickers if t in manifest.index]
+
+    def refresh_prices(self, tickers: List[str]) -> Dict[str, object]:
+        """日常更新：只抓新 bar，遇到重新調整先重寫該 ticker 全歷史"""
+        return self.price_downloader.update_all(tickers)
+
+    def load_panel(self):
+        """memory-mapped 對齊價格；price store 有更新會自動重建"""
+        return self.panel_cache.load()
+
+    def load_prices(self, tickers: List[str], columns=None, start=None, end=None, compact=False, parallel=True,
+                    verbose=False) -> Dict[str, object]:
+        """
+        {ticker: DataFrame(index=Date)}；兩條路徑回傳格式一樣：對齊 panel cache 嘅交易日曆，
+        每隻由第一條到最後一條真 bar，中間空隙 ffill
+        - 冇 columns / start / end / compact：直接由 panel cache (對齊好、memory-mapped) 切出
+        - 有：price store 按需讀 (只讀要嘅欄 / row group)，再用同一套規則對齊
+        """
+        if columns is None and start is None and end is None and not compact:
+            data = self.panel_cache.load_prices(tickers)
+        else:
+            raw = self.price_downloader.load_prices(tickers, columns=columns, start=start, end=end, compact=compact,
+                                                    parallel=parallel)
+            data = self._align(raw, self._trading_days(raw, start, end))
+        if verbose:
+            summary = memory_summary(data)
+            print(f"📦 價格載入: {summary['tickers']} 隻 / {summary['rows']:,} 行 / "
+                  f"{summary['bytes'] / 1e6:,.1f} MB | {summary['dtypes']}")
+        return data
+
+    def _trading_days(self, frames, start=None, end=None):
+        """同 PanelCache 一樣用 calendar ticker 嘅日子；佢唔喺 store 就用所有已讀日子嘅聯集"""
+        calendar = self.panel_cache.calendar_ticker
+        if calendar not in frames:
+            frames = {**frames, **self.price_downloader.load_prices([calendar], columns=["Close"], start=start,
+                                                                    end=end)}
+        if calendar in frames:
+            days = pd.DatetimeIndex(frames[calendar].index)
+        else:
+            days = pd.DatetimeIndex(sorted(set().union(*[df.index for df in frames.values()])))
+        return days.as_unit("ns").rename("Date")
+
+    @staticmethod
+    def _align(frames, trading_days):
+        out = {}
+        for ticker, df in frames.items():
+            frame = df.reindex(trading_days).ffill(limit_area="inside")
+            valid = frame["Close"].notna() if "Close" in frame.columns else frame.notna().any(axis=1)
+            if not valid.any():
+                continue
+            frame = frame.loc[valid.idxmax():valid[::-1].idxmax()]
+            # reindex 插 NaN 會令整數欄 (compact 嘅 Volume) 變 float，冇缺值就轉返原本 dtype
+            restore = {c: t for c, t in df.dtypes.items() if frame[c].dtype != t and not frame[c].isna().any()}
+            out[ticker] = frame.astype(restore) if restore else frame
+        return out
 
     def init_long_term_strategy(self, universe_df, **kwargs):
         return self.strategy_cls(fundamentals_df=universe_df, **kwargs)
\ No newline at end of file
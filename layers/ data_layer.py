@@ -1,21 +1,24 @@
 import pandas as pd
-import yfinance as yf
 import requests
 import os
 import datetime
 import time
 from io import StringIO
-from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor
+
+from layers.download_scheduler import DownloadScheduler, TokenBucket, RetryQueue, YFinanceBatchSource
+from layers.price_store import PriceStore, memory_summary
 
 # ==========================================
 # ⚙️ 1. 配置層 (Configuration)
 # ==========================================
 class Config:
     DATA_DIR = "data"
+    PRICE_STORE_DIR = os.path.join(DATA_DIR, "price_store")
+    PANEL_CACHE_DIR = os.path.join(DATA_DIR, "panel_cache")
+    # 舊版逐 ticker 一個檔嘅目錄，只用嚟一次性搬入 price store
     PRICES_DIR = os.path.join(DATA_DIR, "prices_parquet")
     UNIVERSE_FILE = os.path.join(DATA_DIR, "universe.csv")
-    FAILED_FILE = os.path.join(DATA_DIR, "failed_tickers.csv")
+    RETRY_QUEUE_FILE = os.path.join(DATA_DIR, "retry_queue.csv")
 
     CACHE_DAYS = 7
     EXTRA_ETFS = ["SPY", "QQQ", "IWM", "VTI", "TLT", "GLD"]
@@ -23,17 +26,29 @@ class Config:
     START_DATE = "2015-01-01"
     END_DATE = None
 
-    MAX_WORKERS = 3
     REQUEST_TIMEOUT = 10
     RETRY = 5
     SLEEP_BETWEEN_RETRIES = 1.0
 
+    # 批量下載：每個請求幾多隻 ticker；token bucket 起始速率 (請求/秒)，會按限流自動調節
+    BATCH_SIZE = 50
+    RATE_LIMIT = 1.0
+    BACKOFF_BASE = 1.0
+    BACKOFF_CAP = 60.0
+    RETRY_QUEUE_MAX_ATTEMPTS = 10
+
+    # 增量更新：由最後幾個已存 bar 開始重抓，用重疊部分判斷有冇 split / 派息重新調整
+    INCREMENTAL_OVERLAP_DAYS = 5
+    ADJUSTMENT_TOLERANCE = 1e-4
+
 
 # ==========================================
 # 🌍 2. Universe Provider
 # ==========================================
 class UniverseProvider:
-    def __init__(self):
+    def __init__(self, session=None):
+        # 可傳入共用連線池嘅 requests.Session，預設每次開新連線
+        self.session = session or requests
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                           "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
@@ -67,7 +82,7 @@ class UniverseProvider:
 
         for i in range(Config.RETRY):
             try:
-                resp = requests.get(url, headers=self.headers, timeout=Config.REQUEST_TIMEOUT)
+                resp = self.session.get(url, headers=self.headers, timeout=Config.REQUEST_TIMEOUT)
                 resp.raise_for_status()
                 tables = pd.read_html(StringIO(resp.text))
                 df = tables[0]
@@ -123,71 +138,104 @@ class UniverseProvider:
 # 📦 3. Price Downloader
 # ==========================================
 class PriceDownloader:
-    def __init__(self):
-        os.makedirs(Config.PRICES_DIR, exist_ok=True)
-
-    def _normalize_yf_columns(self, df, ticker):
-        # ✅ yfinance 會回 MultiIndex (Price, Ticker)
-        if isinstance(df.columns, pd.MultiIndex):
-            if ticker in df.columns.get_level_values(1):
-                df = df.xs(ticker, axis=1, level=1)
-            else:
-                df.columns = df.columns.get_level_values(0)
-
-        # 確保單層欄位
-        df.columns = [str(c) for c in df.columns]
-        return df
-
-    def _download_one(self, ticker):
-        for i in range(Config.RETRY):
-            try:
-                df = yf.download(
-                    ticker,
-                    start=Config.START_DATE,
-                    end=Config.END_DATE,
-                    auto_adjust=True,
-                    progress=False,
-                    threads=False
-                )
-                time.sleep(0.3)
-
-                if df.empty:
-                    continue
-
-                df = self._normalize_yf_columns(df, ticker)
-
-                required = {"Close", "High", "Low", "Volume"}
-                if not required.issubset(set(df.columns)):
-                    continue
-
-                return ticker, df
-            except Exception:
-                time.sleep(Config.SLEEP_BETWEEN_RETRIES)
-
-        return ticker, None
+    def __init__(self, source=None, sleep=time.sleep):
+        self.store = PriceStore(Config.PRICE_STORE_DIR)
+        if self.store.is_empty() and os.path.isdir(Config.PRICES_DIR):
+            n = self.store.import_ticker_files(Config.PRICES_DIR)
+            if n:
+                print(f"📦 已將 {n} 個舊格式價格檔搬入 {Config.PRICE_STORE_DIR}")
+        self.scheduler = DownloadScheduler(
+            source or YFinanceBatchSource(),
+            batch_size=Config.BATCH_SIZE,
+            bucket=TokenBucket(rate=Config.RATE_LIMIT, sleep=sleep),
+            retry_queue=RetryQueue(Config.RETRY_QUEUE_FILE, max_attempts=Config.RETRY_QUEUE_MAX_ATTEMPTS),
+            max_attempts=Config.RETRY,
+            backoff_base=Config.BACKOFF_BASE,
+            backoff_cap=Config.BACKOFF_CAP,
+            sleep=sleep
+        )
+
+    def _is_readjusted(self, stored, fresh):
+        """重疊日子嘅 Close 有變 => 供應商重新調整咗歷史 (split / 派息)，舊數據唔再可用"""
+        common = stored.index.intersection(fresh.index)
+        # 最後一個已存 bar 可能係盤中抓嘅未完成 bar，唔用嚟判斷
+        if len(common) > 1:
+            common = common[common < stored.index[-1]]
+        if common.empty:
+            return True
+        old = stored.loc[common, "Close"].to_numpy(dtype=float)
+        new = fresh.loc[common, "Close"].to_numpy(dtype=float)
+        return bool((abs(new - old) > Config.ADJUSTMENT_TOLERANCE * abs(old)).any())
+
+    def _classify_incremental(self, stored, fresh):
+        """stored 只需要最後幾行；回傳 readjusted (要全歷史重抓) / appended / unchanged"""
+        if self._is_readjusted(stored, fresh):
+            return "readjusted"
+        if fresh.index[-1] <= stored.index[-1]:
+            return "unchanged"
+        return "appended"
+
+    def _report(self, counts):
+        print("📊 價格更新: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+        queue = self.scheduler.retry_queue
+        if len(queue):
+            print(f"⚠️ Retry queue: {len(queue)} 隻待重試 ({len(queue.dead())} 隻已放棄)，見 {Config.RETRY_QUEUE_FILE}")
 
     def download_all(self, tickers):
-        results = {}
-        failed = []
-
-        with ThreadPoolExecutor(max_workers=Config.MAX_WORKERS) as executor:
-            for ticker, df in tqdm(executor.map(self._download_one, tickers), total=len(tickers)):
-                if df is None:
-                    failed.append(ticker)
-                else:
-                    results[ticker] = df
-                    df.to_parquet(os.path.join(Config.PRICES_DIR, f"{ticker}.parquet"))
-
-        if failed:
-            pd.DataFrame({"Ticker": failed}).to_csv(Config.FAILED_FILE, index=False)
+        results, failed = self.scheduler.run(tickers, start=Config.START_DATE, end=Config.END_DATE)
+        self.store.upsert(results, replace=results.keys())
+        self._report({"full": len(results), "failed": len(failed)})
         return results
 
-    def load_prices(self, tickers):
-        data = {}
-        for t in tickers:
-            path = os.path.join(Config.PRICES_DIR, f"{t}.parquet")
-            if os.path.exists(path):
-                data[t] = pd.read_parquet(path)
+    def update_all(self, tickers):
+        """
+        增量更新：只抓最後已存日期之後嘅 bar (加少量重疊)，只有重新調整先重寫全歷史
+        已存 ticker 按重疊起始日分組批量抓；冇舊數據或者要重抓嘅 ticker 最後一批過全量下載
+        只有受影響嘅年份分區會重寫；回傳更新後嘅完整價格
+        """
+        counts = {}
+        tails = self.store.tail(tickers, Config.INCREMENTAL_OVERLAP_DAYS, columns=["Close"])
+        full_needed = [t for t in tickers if t not in tails]
+        groups = {}
+        for ticker, tail in tails.items():
+            groups.setdefault(tail.index[0].strftime("%Y-%m-%d"), []).append(ticker)
+
+        appended = {}
+        for start, group in groups.items():
+            fetched, failed = self.scheduler.run(group, start=start, end=Config.END_DATE, include_due=False)
+            counts["failed"] = counts.get("failed", 0) + len(failed)
+            for ticker, fresh in fetched.items():
+                status = self._classify_incremental(tails[ticker], fresh)
+                counts[status] = counts.get(status, 0) + 1
+                if status == "readjusted":
+                    full_needed.append(ticker)
+                elif status == "appended":
+                    appended[ticker] = fresh
+        self.store.upsert(appended)
+
+        fetched, failed = self.scheduler.run(full_needed, start=Config.START_DATE, end=Config.END_DATE)
+        counts["failed"] = counts.get("failed", 0) + len(failed)
+        counts["full"] = len(fetched)
+        self.store.upsert(fetched, replace=fetched.keys())
+
+        self._report(counts)
+        return self.load_prices(tickers)
+
+    def load_prices(self, tickers, columns=None, start=None, end=None, compact=False, parallel=True, verbose=False):
+        """
+        columns: 只讀指定欄位 (例如 ["Close", "High", "Low", "Volume"])
+        start / end: 讀取時已經按日期過濾，唔會讀出窗口外嘅 row group
+        compact: 價格 float32、Volume 整數，記憶體大約減半
+        parallel: 分區 / row group 並行讀取
+        """
+        data = self.store.load_dict(tickers, start=start, end=end, columns=columns, compact=compact,
+                                    use_threads=parallel)
+        if verbose:
+            summary = memory_summary(data)
+            saved = 1 - summary["bytes"] / summary["bytes_float64"] if summary["bytes_float64"] else 0.0
+            print(f"📦 價格載入: {summary['tickers']} 隻 / {summary['rows']:,} 行 / "
+                  f"{summary['bytes'] / 1e6:,.1f} MB (全 float64 約 {summary['bytes_float64'] / 1e6:,.1f} MB，"
+                  f"慳 {saved:.0%}) | {summary['dtypes']}")
         return data
 
 
@@ -196,5 +244,5 @@ if __name__ == "__main__":
     universe = provider.build_universe()
     tickers = universe["Ticker"].tolist()
     downloader = PriceDownloader()
-    prices = downloader.download_all(tickers)
-    print(f"✅ 下載完成，共 {len(prices)} 隻股票")
+    prices = downloader.update_all(tickers)
+    print(f"✅ 更新完成，共 {len(prices)} 隻股票")
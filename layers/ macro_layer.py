@@ -4,6 +4,9 @@ from pathlib import Path
 from config import load_config
 
 class MacroLoader:
+    # (FRED series id, 欄名)
+    SERIES = (("VIXCLS", "VIX"), ("FEDFUNDS", "FEDFUNDS"), ("CPIAUCSL", "CPI"))
+
     def __init__(self, api_key=None, config=None):
         self.config = config or load_config()
         self.fred = Fred(api_key=api_key or self.config['data']['macro'].get('fred_api_key'))
@@ -16,16 +19,18 @@ class MacroLoader:
         df.index.name = 'date'
         return df
 
-    def download_all(self):
-        vix = self.download_series('VIXCLS', 'VIX')
-        fedfunds = self.download_series('FEDFUNDS', 'FEDFUNDS')
-        cpi = self.download_series('CPIAUCSL', 'CPI')
-
-        df = vix.join(fedfunds, how='outer').join(cpi, how='outer')
+    def save_combined(self, frames):
+        df = frames[0]
+        for other in frames[1:]:
+            df = df.join(other, how='outer')
         out_path = self.raw_dir / "macro.parquet"
         df.to_parquet(out_path)
         return df
 
+    def download_all(self):
+        frames = [self.download_series(series_id, name) for series_id, name in self.SERIES]
+        return self.save_combined(frames)
+
     def load(self, start=None, end=None):
         df = pd.read_parquet(self.raw_dir / "macro.parquet")
         df = df.sort_index()
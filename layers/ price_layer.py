@@ -2,12 +2,28 @@ import yfinance as yf
 import pandas as pd
 from pathlib import Path
 from config import load_config
+from layers.price_store import PriceStore
 
 class PriceLoader:
     def __init__(self, config=None):
         self.config = config or load_config()
         self.raw_dir = Path(self.config['paths']['raw_data'])
         self.raw_dir.mkdir(parents=True, exist_ok=True)
+        # 同 PriceDownloader 共用同一個 store，入面有曾經寫過嘅所有 ticker (包括已經唔喺 universe 嘅)
+        self.store = PriceStore(self.config['paths'].get('price_store', 'data/price_store'))
+        self.symbols = None
+
+    def _to_legacy_long(self, df):
+        # 保持舊輸出格式：date / Symbol 欄
+        return df.rename(columns={'Date': 'date', 'Ticker': 'Symbol'})
+
+    def universe(self, symbols=None):
+        """要讀嘅 symbols：明確傳入 > 上次 download 嘅 > config universe"""
+        if symbols is not None:
+            return list(symbols)
+        if self.symbols is not None:
+            return list(self.symbols)
+        return list(self.config['universe']['symbols'])
 
     def download(self, symbols=None, start=None, end=None, force=False):
         if symbols is None:
@@ -15,52 +31,35 @@ class PriceLoader:
         start = start or self.config['data']['price']['start_date']
         end = end or self.config['data']['price']['end_date']
 
-        out_path = self.raw_dir / f"prices_{start}_{end}.parquet"
-        if out_path.exists() and not force:
-            return pd.read_parquet(out_path)
+        if not force and set(symbols).issubset(self.store.tickers()):
+            self.symbols = list(symbols)
+            return self._to_legacy_long(self.store.query(symbols, start, end))
 
         data = yf.download(symbols, start=start, end=end, auto_adjust=True, group_by='ticker')
-        df_list = []
+        frames = {}
         for symbol in symbols:
             if symbol in data.columns.levels[0]:
-                sym = data[symbol].copy()
-                sym['Symbol'] = symbol
-                sym = sym.reset_index().rename(columns={'Date': 'date'})
-                df_list.append(sym)
+                frames[symbol] = data[symbol].dropna(how='all')
 
-        if not df_list:
+        if not frames:
             return pd.DataFrame()
 
-        df = pd.concat(df_list, ignore_index=True)
-        df.to_parquet(out_path, index=False)
-        return df
-
-    def load(self, start=None, end=None):
-        files = sorted(self.raw_dir.glob("prices_*.parquet"))
-        if not files:
-            df = self.download()
-        else:
-            df = pd.read_parquet(files[-1])
+        self.store.upsert(frames)
+        self.symbols = list(frames)
+        return self._to_legacy_long(self.store.query(list(frames), start, end))
 
-        if start:
-            df = df[df['date'] >= pd.to_datetime(start)]
-        if end:
-            df = df[df['date'] <= pd.to_datetime(end)]
+    def _query(self, start=None, end=None, columns=None, symbols=None):
+        if self.store.is_empty():
+            self.download()
+        symbols = self.universe(symbols)
+        return self._to_legacy_long(self.store.query(symbols, start=start, end=end, columns=columns))
 
+    def load(self, start=None, end=None, symbols=None):
+        df = self._query(start, end, columns=['Close'], symbols=symbols)
         pivot = df.pivot(index='date', columns='Symbol', values='Close')
         return pivot
 
-    def load_ohlcv(self, start=None, end=None):
-        files = sorted(self.raw_dir.glob("prices_*.parquet"))
-        if not files:
-            df = self.download()
-        else:
-            df = pd.read_parquet(files[-1])
-
-        if start:
-            df = df[df['date'] >= pd.to_datetime(start)]
-        if end:
-            df = df[df['date'] <= pd.to_datetime(end)]
-
+    def load_ohlcv(self, start=None, end=None, symbols=None):
+        df = self._query(start, end, symbols=symbols)
         df = df.set_index(['date', 'Symbol']).sort_index()
         return df
@@ -1,98 +1,542 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 from pathlib import Path
 
+from layers import indicator_engine as engine
+from layers.indicator_engine import PackedPanel
+from utils.shared_arrays import SharedArray
+
+
+def _to_long(frame):
+    """wide (date x symbol) -> 長表 (date, Symbol, value)，唔存 NaN；幾百欄嘅 wide Parquet 讀寫好慢"""
+    values = frame.to_numpy(dtype=np.float64)
+    rows, cols = np.nonzero(~np.isnan(values))
+    return pd.DataFrame({
+        "date": frame.index[rows],
+        "Symbol": np.asarray(frame.columns, dtype=object)[cols],
+        "value": values[rows, cols],
+    })
+
+
+def _to_wide(long):
+    dates, date_codes = np.unique(long["date"].to_numpy(), return_inverse=True)
+    symbols, symbol_codes = np.unique(long["Symbol"].to_numpy(dtype=object).astype(str), return_inverse=True)
+    values = np.full((len(dates), len(symbols)), np.nan)
+    values[date_codes, symbol_codes] = long["value"].to_numpy()
+    return pd.DataFrame(values, index=pd.DatetimeIndex(dates, name="date"), columns=list(symbols))
+
+
+def load_indicator(out_dir, name, years=None):
+    """讀 save_indicators 寫嘅 {name}/{year}.parquet (長表)，合返成 (date x symbol) DataFrame"""
+    parts = sorted((Path(out_dir) / name).glob("*.parquet"))
+    if years is not None:
+        parts = [p for p in parts if int(p.stem) in years]
+    if not parts:
+        return pd.DataFrame()
+    return _to_wide(pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True))
+
+
+def _same(a, b):
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def _mix(x):
+    """splitmix64 finaliser：uint64 陣列逐格打散"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _bar_hashes(dates, *fields):
+    """
+    每個 bar (日期 + 各欄數值) 打散成一個 uint64；按股票加總 (mod 2^64) 就係已消化歷史嘅 checksum
+    加總同次序無關，中段任何一個 bar (或者日期) 改咗 checksum 都會變
+    dates 可以係 (n, 1)，broadcast 去 (n, symbols) 嘅 panel
+    """
+    h = _mix(np.asarray(dates, dtype="datetime64[ns]").view(np.uint64))
+    for k, values in enumerate(fields, start=1):
+        # NaN / -0.0 先規一，同一個數值永遠同一組 bits
+        values = np.where(np.isnan(values), np.nan, values + 0.0)
+        h = _mix(h ^ values.view(np.uint64) ^ np.uint64(k * 0x9E3779B97F4A7C15 % 2 ** 64))
+    return h
+
+
+def _sum_by(codes, hashes, size):
+    total = np.zeros(size, dtype=np.uint64)
+    np.add.at(total, codes, hashes)
+    return total
+
+
+# ------------------------------------------------------------
+# 逐隻股票自訂指標嘅 worker：每個進程 attach 一次共享輸入 / 輸出，之後只收 symbol 位置
+# ------------------------------------------------------------
+_WORKER = {}
+
+
+def _init_custom_worker(inputs_spec, order_spec, out_spec, counts, dates, symbols, fields, fn, kwargs):
+    _WORKER.update({
+        "inputs": SharedArray.attach(inputs_spec),
+        "order": SharedArray.attach(order_spec),
+        "out": SharedArray.attach(out_spec),
+        "counts": counts, "dates": dates, "symbols": symbols, "fields": fields, "fn": fn, "kwargs": kwargs,
+    })
+
+
+def _run_custom(cols):
+    """
+    計 cols 呢幾隻股票，結果直接寫入共享輸出 out[:, j, :n]；位置固定，完成次序唔影響結果
+    回傳 [(symbol, 錯誤)]
+    """
+    w = _WORKER
+    inputs, order, out = w["inputs"].array, w["order"].array, w["out"].array
+    failed = []
+    for j in cols:
+        n = int(w["counts"][j])
+        if n == 0:
+            continue
+        # (symbol, bar, field) 佈局：每隻股票一段連續記憶體，包成 DataFrame 唔使複製
+        df = pd.DataFrame(inputs[j, :n], index=w["dates"][order[:n, j]], columns=w["fields"], copy=False)
+        try:
+            result = np.asarray(w["fn"](df, **w["kwargs"]), dtype=np.float64).reshape(n, -1)
+            if result.shape[1] != out.shape[0]:
+                raise ValueError(f"回傳 {result.shape[1]} 欄，預期 {out.shape[0]} 欄")
+            out[:, j, :n] = result.T
+        except Exception as e:
+            failed.append((w["symbols"][j], repr(e)))
+    return failed
+
+
 class TechnicalIndicator:
-    def __init__(self, price_close_df, ohlcv_df=None):
+    """
+    指標全部喺 (date x symbol) panel 上一次過 2D 計 (layers/indicator_engine.py)，
+    數值同逐隻股票調用 pandas_ta 一致：RSI / ATR / ADX / VWAP 逐位相同，BBands 差幾個 ulp (tests/test_indicator_engine.py)
+    save_indicators 會連遞推狀態 (Wilder 平均、上一個 bar 等) 一齊存落 _state.pkl；
+    下次先 resume(out_dir)，add_* 就只計上次之後新增嘅 bar，亦只重寫受影響年份嘅檔
+    股票歷史被改寫 (split / 派息重新調整、補數據、中段改價) 或者新上市就該股票全段重計：
+    state 存咗每隻股票已消化歷史 (用到嘅欄，到 last_date 為止) 嘅 checksum，下次逐隻比對
+    resume 之後 indicators[name] (同 add_* 回傳值) 只包含重寫咗嘅年份，要全段用 full_frame(name)
+    """
+    STATE_FILE = "_state.pkl"
+    STATE_VERSION = 2
+
+    def __init__(self, price_close_df, ohlcv_df=None, n_workers=1):
         self.price_close_df = price_close_df
         self.ohlcv_df = ohlcv_df
+        self.n_workers = n_workers or os.cpu_count()
         self.indicators = {}
+        self.state = {}
+        self._dirty = {}
+        self._packed = None
+        self._fields = {}
+        self._resume_dir = None
+        self._previous_state = {}
+        self._partial = set()
+
+    def _close_frame(self, values):
+        return pd.DataFrame(values, index=self.price_close_df.index, columns=list(self.price_close_df.columns))
+
+    def _ohlcv(self, *names):
+        """OHLCV 每個欄位只 unstack + 壓實一次"""
+        if self._packed is None:
+            self._packed = PackedPanel.from_long(self.ohlcv_df)
+        for name in names:
+            if name not in self._fields:
+                self._fields[name] = self._packed.field(self.ohlcv_df, name)
+        return [self._fields[name] for name in names]
+
+    # ------------------------------------------------------------
+    # 增量狀態
+    # ------------------------------------------------------------
+    def resume(self, out_dir):
+        """讀返上次 save_indicators 嘅狀態；之後 add_* 只計新 bar。冇狀態 / 版本唔啱就照全量計"""
+        path = Path(out_dir) / self.STATE_FILE
+        if not path.exists():
+            return False
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("version") != self.STATE_VERSION:
+            print(f"⚠️ 指標狀態版本唔同 ({payload.get('version')} != {self.STATE_VERSION})，全量重計")
+            return False
+        self._previous_state = payload["indicators"]
+        self._resume_dir = Path(out_dir)
+        return True
+
+    def _previous(self, group, params, names):
+        prev = self._previous_state.get(group)
+        if prev is None or prev["params"] != params:
+            return None
+        if not all((self._resume_dir / name).is_dir() for name in names):
+            return None
+        return prev
+
+    @staticmethod
+    def _previous_checksum(prev, pos):
+        checksum = np.asarray(prev["checksum"], dtype=np.uint64)
+        return np.where(pos >= 0, checksum[np.clip(pos, 0, None)], 0)
+
+    def _record(self, group, frames, params, state, columns, last_date, n_rows, dirty, checksum):
+        self.state[group] = {
+            "params": params,
+            "columns": list(columns),
+            "last_date": last_date,
+            "n_rows": n_rows,
+            "state": state,
+            "checksum": checksum,
+        }
+        for name, frame in frames.items():
+            self.indicators[name] = frame
+            self._dirty[name] = dirty
+
+    @staticmethod
+    def _assemble_state(parts):
+        """[(欄位置, state), ...] -> 按欄位置排好嘅 state"""
+        parts = [(idx, st) for idx, st in parts if len(idx)]
+        order = np.concatenate([idx for idx, _ in parts])
+        return engine.take_state(engine.concat_state([st for _, st in parts]), np.argsort(order, kind="stable"))
+
+    def _patch(self, name, index, columns, dirty, blocks):
+        """
+        只讀受影響年份嘅舊結果，寫入新計嘅 blocks [(行位置, 欄位置, values)]
+        回傳只包含呢啲年份嘅 frame；save_indicators 只重寫呢啲年份，full_frame 再同其餘年份合併
+        """
+        rows = np.flatnonzero(np.isin(index.year, sorted(dirty)))
+        frame = load_indicator(self._resume_dir, name, years=dirty).reindex(index=index[rows], columns=columns)
+        values = frame.to_numpy(dtype=np.float64, copy=True)
+        for block_rows, cols, block in blocks:
+            keep = np.isin(block_rows, rows)
+            values[np.ix_(np.searchsorted(rows, block_rows[keep]), cols)] = block[keep]
+        self._partial.add(name)
+        return pd.DataFrame(values, index=frame.index, columns=columns)
+
+    def _close_indicator(self, group, names, params, full_fn, update_fn):
+        """
+        收市價 panel 上嘅指標 (RSI / BBands)
+        full_fn(values) -> ({name: array}, state)；update_fn(state, values, n_rows) -> ({name: 新行 array}, state)
+        """
+        close = self.price_close_df
+        values = close.to_numpy(dtype=np.float64)
+        columns = list(close.columns)
 
+        hashes = _bar_hashes(close.index.to_numpy()[:, None], values)
+        checksum = hashes.sum(axis=0, dtype=np.uint64)
+
+        prev = self._previous(group, params, names)
+        n = prev["n_rows"] if prev is not None else 0
+        if prev is not None and (n == 0 or n > len(close) or close.index[n - 1] != prev["last_date"]
+                                 or (close.index <= prev["last_date"]).sum() != n):
+            prev = None
+
+        if prev is None:
+            results, state = full_fn(values)
+            frames = {name: self._close_frame(v) for name, v in results.items()}
+            self._record(group, frames, params, state, columns, close.index[-1], len(close), None, checksum)
+            return frames
+
+        pos = pd.Index(prev["columns"]).get_indexer(columns)
+        last_close = np.where(pos >= 0, np.asarray(prev["state"]["close"])[pos], np.nan)
+        warm = (pos >= 0) & _same(values[n - 1], last_close)
+        warm &= hashes[:n].sum(axis=0, dtype=np.uint64) == self._previous_checksum(prev, pos)
+        w, c = np.flatnonzero(warm), np.flatnonzero(~warm)
+
+        new_rows = np.arange(n, len(close))
+        dirty = set(close.index[new_rows].year)
+        blocks = {name: [] for name in names}
+        parts = []
+        if len(w):
+            rows_w, w_state = update_fn(engine.take_state(prev["state"], pos[w]), values[:, w], n)
+            for name, v in rows_w.items():
+                blocks[name].append((new_rows, w, v))
+            parts.append((w, w_state))
+        if len(c):
+            cold, c_state = full_fn(values[:, c])
+            # 重計嘅股票：有收市價嘅年份都要重寫
+            dirty |= set(close.index[~np.isnan(values[:, c]).all(axis=1)].year)
+            for name, v in cold.items():
+                blocks[name].append((np.arange(len(close)), c, v))
+            parts.append((c, c_state))
+
+        frames = {name: self._patch(name, close.index, columns, dirty, blocks[name]) for name in names}
+        state = self._assemble_state(parts)
+        self._record(group, frames, params, state, columns, close.index[-1], len(close), dirty, checksum)
+        return frames
+
+    def _ohlcv_indicator(self, group, names, params, fields, full_fn, update_fn, min_bars=0, zero_guard=False):
+        """
+        OHLCV 指標 (ATR / ADX / VWAP)，逐隻股票按自己嘅 bar 計
+        full_fn(*packed, counts) -> ({name: packed}, state)；update_fn(state, *packed, valid) -> 同上
+        min_bars: 至少要有幾多個 bar 先可以接續 (presma 種子)
+        zero_guard: 新 bar 第一次出現 high == low 會令 pandas_ta 成隻股票加 epsilon，要全段重計
+        """
+        ohlcv = self.ohlcv_df
+        mi = ohlcv.index.remove_unused_levels()
+        index = pd.DatetimeIndex(mi.levels[0])
+        columns = list(mi.levels[1])
+        date_codes, symbol_codes = mi.codes[0], mi.codes[1]
+        hashes = _bar_hashes(index.to_numpy()[date_codes], *[ohlcv[f].to_numpy(dtype=np.float64) for f in fields])
+        checksum = _sum_by(symbol_codes, hashes, len(columns))
+
+        prev = self._previous(group, params, names)
+        if prev is None:
+            packed = self._ohlcv(*fields)
+            results, state = full_fn(*packed, self._packed.counts)
+            frames = {name: self._packed.to_frame(v) for name, v in results.items()}
+            checksum = checksum[pd.Index(columns).get_indexer(self._packed.columns)]
+            self._record(group, frames, params, state, self._packed.columns, self._packed.index[-1], None, None,
+                         checksum)
+            return frames
+
+        pos = pd.Index(prev["columns"]).get_indexer(columns)
+        prev_state = prev["state"]
+
+        def prev_field(key):
+            return np.where(pos >= 0, np.asarray(prev_state[key])[pos], np.nan)
+
+        # 上次見過嘅歷史有冇變：bar 數、最後一個 bar 同成段歷史嘅 checksum 都要一樣
+        hist_mask = date_codes <= index.searchsorted(prev["last_date"], side="right") - 1
+        counts = np.bincount(symbol_codes[hist_mask], minlength=len(columns))
+        last_row = np.full(len(columns), -1)
+        hist_rows = np.flatnonzero(hist_mask)
+        np.maximum.at(last_row, symbol_codes[hist_rows], hist_rows)
+        warm = (pos >= 0) & (counts == prev_field("count")) & (counts >= min_bars) & (last_row >= 0)
+        for key, col in (("high", "High"), ("low", "Low"), ("close", "Close")):
+            bar = ohlcv[col].to_numpy(dtype=np.float64)[np.clip(last_row, 0, None)]
+            warm &= _same(bar, prev_field(key))
+        history = _sum_by(symbol_codes[hist_mask], hashes[hist_mask], len(columns))
+        warm &= history == self._previous_checksum(prev, pos)
+
+        delta = ohlcv[~hist_mask]
+        delta_codes = symbol_codes[~hist_mask]
+        if zero_guard and len(delta):
+            zero_range = ((delta["High"] - delta["Low"]) == 0).to_numpy()
+            new_zero = np.bincount(delta_codes[zero_range], minlength=len(columns)) > 0
+            has_zero = np.where(pos >= 0, np.asarray(prev_state["has_zero"])[pos], False).astype(bool)
+            warm &= ~(new_zero & ~has_zero)
+
+        dirty = set(index[np.unique(date_codes[~hist_mask])].year)
+        blocks = {name: [] for name in names}
+        parts = []
+
+        delta = delta[warm[delta_codes]]
+        moved = np.zeros(len(columns), dtype=bool)
+        if len(delta):
+            panel = PackedPanel.from_long(delta)
+            idx = pd.Index(columns).get_indexer(panel.columns)
+            moved[idx] = True
+            packed = [panel.field(delta, f) for f in fields]
+            new_rows, m_state = update_fn(engine.take_state(prev_state, pos[idx]), *packed, panel.valid)
+            block_rows = index.get_indexer(panel.index)
+            for name, v in new_rows.items():
+                blocks[name].append((block_rows, idx, panel.unpack(v)))
+            parts.append((idx, m_state))
+        still = np.flatnonzero(warm & ~moved)
+        parts.append((still, engine.take_state(prev_state, pos[still])))
+
+        c = np.flatnonzero(~warm)
+        if len(c):
+            sub = ohlcv[np.isin(symbol_codes, c)]
+            panel = PackedPanel.from_long(sub)
+            idx = pd.Index(columns).get_indexer(panel.columns)
+            cold, c_state = full_fn(*[panel.field(sub, f) for f in fields], panel.counts)
+            block_rows = index.get_indexer(panel.index)
+            dirty |= set(panel.index.year)
+            for name, v in cold.items():
+                blocks[name].append((block_rows, idx, panel.unpack(v)))
+            parts.append((idx, c_state))
+
+        frames = {name: self._patch(name, index, columns, dirty, blocks[name]) for name in names}
+        state = self._assemble_state(parts)
+        self._record(group, frames, params, state, columns, index[-1], None, dirty, checksum)
+        return frames
+
+    # ------------------------------------------------------------
+    # 指標
+    # ------------------------------------------------------------
     def add_rsi(self, length=14):
-        rsi_all = []
-        for col in self.price_close_df.columns:
-            rsi = ta.rsi(self.price_close_df[col], length=length)
-            rsi.name = col
-            rsi_all.append(rsi)
+        name = f'RSI_{length}'
 
-        rsi_df = pd.concat(rsi_all, axis=1)
-        self.indicators[f'RSI_{length}'] = rsi_df
-        return rsi_df
+        def full(values):
+            result, state = engine.rsi_stateful(values, length=length)
+            return {name: result}, state
+
+        def update(state, values, n):
+            result, state = engine.rsi_update(state, values[n:], length=length)
+            return {name: result}, state
+
+        return self._close_indicator(name, [name], {"length": length}, full, update)[name]
 
     def add_bbands(self, length=20, std=2):
-        bb = ta.bbands(self.price_close_df, length=length, std=std)
-        self.indicators[f'BBL_{length}'] = bb.iloc[:, 0]
-        self.indicators[f'BBM_{length}'] = bb.iloc[:, 1]
-        self.indicators[f'BBU_{length}'] = bb.iloc[:, 2]
-        return bb
+        names = (f'BBL_{length}', f'BBM_{length}', f'BBU_{length}')
+
+        def full(values):
+            bands = engine.bbands(values, length=length, std=std)
+            return dict(zip(names, bands)), {"close": values[-1].copy()}
+
+        def update(state, values, n):
+            # 滾動窗口只需要最後 length - 1 行歷史
+            start = max(n - (length - 1), 0)
+            bands = engine.bbands(values[start:], length=length, std=std)
+            return {k: v[n - start:] for k, v in zip(names, bands)}, {"close": values[-1].copy()}
+
+        return self._close_indicator(f'BB_{length}', names, {"length": length, "std": std}, full, update)
 
     def add_atr(self, length=14):
         if self.ohlcv_df is None:
             raise ValueError("ATR 需要 OHLCV")
+        name = f'ATR_{length}'
+
+        def full(high, low, close, counts):
+            result, state = engine.atr_stateful(high, low, close, counts, length=length)
+            return {name: result}, state
 
-        atr_all = []
-        for symbol, sym_df in self.ohlcv_df.groupby(level=1):
-            df = sym_df.droplevel(1)
-            atr = ta.atr(df['High'], df['Low'], df['Close'], length=length)
-            atr.name = symbol
-            atr_all.append(atr)
+        def update(state, high, low, close, valid):
+            result, state = engine.atr_update(state, high, low, close, valid, length=length)
+            return {name: result}, state
 
-        atr_df = pd.concat(atr_all, axis=1)
-        self.indicators[f'ATR_{length}'] = atr_df
-        return atr_df
+        return self._ohlcv_indicator(name, [name], {"length": length}, ("High", "Low", "Close"), full, update,
+                                     min_bars=length, zero_guard=True)[name]
 
     def add_adx(self, length=14):
         if self.ohlcv_df is None:
             raise ValueError("ADX 需要 OHLCV")
+        name = f'ADX_{length}'
 
-        adx_all = []
-        for symbol, sym_df in self.ohlcv_df.groupby(level=1):
-            df = sym_df.droplevel(1)
-            adx = ta.adx(df['High'], df['Low'], df['Close'], length=length)
-            adx = adx[f'ADX_{length}']
-            adx.name = symbol
-            adx_all.append(adx)
+        def full(high, low, close, counts):
+            result, state = engine.adx_stateful(high, low, close, counts, length=length)
+            return {name: result}, state
 
-        adx_df = pd.concat(adx_all, axis=1)
-        self.indicators[f'ADX_{length}'] = adx_df
-        return adx_df
+        def update(state, high, low, close, valid):
+            result, state = engine.adx_update(state, high, low, close, valid, length=length)
+            return {name: result}, state
+
+        return self._ohlcv_indicator(name, [name], {"length": length}, ("High", "Low", "Close"), full, update,
+                                     min_bars=length, zero_guard=True)[name]
 
     def add_vwap(self):
         if self.ohlcv_df is None:
             raise ValueError("VWAP 需要 OHLCV")
 
-        vwap_all = []
-        for symbol, sym_df in self.ohlcv_df.groupby(level=1):
-            df = sym_df.droplevel(1)
-            vwap = ta.vwap(df['High'], df['Low'], df['Close'], df['Volume'])
-            vwap.name = symbol
-            vwap_all.append(vwap)
+        def full(high, low, close, volume, counts):
+            return {'VWAP': engine.vwap(high, low, close, volume)}, engine.bar_state(high, low, close, counts)
+
+        def update(state, high, low, close, volume, valid):
+            state = engine.bar_update(state, high, low, close, valid.sum(axis=0))
+            return {'VWAP': engine.vwap(high, low, close, volume)}, state
 
-        vwap_df = pd.concat(vwap_all, axis=1)
-        self.indicators['VWAP'] = vwap_df
-        return vwap_df
+        return self._ohlcv_indicator('VWAP', ['VWAP'], {}, ("High", "Low", "Close", "Volume"), full, update)['VWAP']
 
-    # ✅ 1) cache：每個指標獨立存檔
+    def add_custom(self, name, fn, fields=("Open", "High", "Low", "Close", "Volume"), names=None,
+                   n_workers=None, chunks_per_worker=4, **kwargs):
+        """
+        逐隻股票計嘅自訂指標 (例如自己寫嘅 pandas_ta study)：fn(df, **kwargs) -> Series / ndarray / DataFrame，
+        df = 該股票嘅 OHLCV (index=date，只有佢有 bar 嘅日子)，回傳長度要同 df 一樣
+        names: 多欄輸出時每欄嘅指標名 (預設 [name])
+        n_workers > 1 就分 symbol 畀 process pool：輸入經 shared memory 傳 (唔 pickle DataFrame)，
+        worker 直接寫入共享輸出陣列，結果同串行一致；fn 要可以 pickle (module 層級函數)
+        呢類指標冇遞推狀態，resume 之後都係全段重計
+        """
+        if self.ohlcv_df is None:
+            raise ValueError(f"{name} 需要 OHLCV")
+        names = list(names or [name])
+        fields = list(fields)
+        n_workers = n_workers or self.n_workers
+        packed = self._ohlcv(*fields)
+        panel = self._packed
+        n_bars, n_symbols = panel.valid.shape
+
+        inputs = SharedArray.create(np.stack(packed, axis=-1).transpose(1, 0, 2))
+        order = SharedArray.create(panel.order)
+        out = SharedArray.empty((len(names), n_symbols, n_bars), fill=np.nan)
+        try:
+            initargs = (inputs.spec, order.spec, out.spec, panel.counts, pd.DatetimeIndex(panel.index),
+                        list(panel.columns), fields, fn, kwargs)
+            if n_workers <= 1 or n_symbols <= 1:
+                _init_custom_worker(*initargs)
+                failed = _run_custom(range(n_symbols))
+            else:
+                n_chunks = min(n_symbols, n_workers * chunks_per_worker)
+                chunks = np.array_split(np.arange(n_symbols), n_chunks)
+                with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_custom_worker,
+                                         initargs=initargs) as executor:
+                    failed = [f for part in executor.map(_run_custom, chunks) for f in part]
+            results = {k: panel.to_frame(out.array[i].T) for i, k in enumerate(names)}
+        finally:
+            _WORKER.clear()
+            inputs.unlink()
+            order.unlink()
+            out.unlink()
+
+        for symbol, error in failed:
+            print(f"⚠️ {name} 計 {symbol} 失敗: {error}")
+        for k, frame in results.items():
+            self.indicators[k] = frame
+            self._dirty[k] = None
+            self._partial.discard(k)
+        return results[names[0]] if len(names) == 1 else results
+
+    # ✅ 1) cache：每個指標獨立存檔 ({name}/{year}.parquet 長表)，連同遞推狀態
     def save_indicators(self, out_dir):
         out_dir = Path(out_dir)
         out_dir.mkdir(parents=True, exist_ok=True)
         for name, df in self.indicators.items():
+            years = self._dirty.get(name)
+            if years is not None and not years:
+                continue
             print(f"[DEBUG] {name} -> {type(df)} | empty={getattr(df, 'empty', None)}")
             if df is None or (hasattr(df, "empty") and df.empty):
                 raise ValueError(f"Indicator {name} is None/empty")
-            df.to_parquet(out_dir / f"{name}.parquet")
+            target = out_dir / name
+            target.mkdir(exist_ok=True)
+            for year, part in df.groupby(df.index.year):
+                if years is not None and year not in years:
+                    continue
+                tmp = target / f".{year}.parquet.tmp"
+                _to_long(part).to_parquet(tmp, index=False)
+                os.replace(tmp, target / f"{year}.parquet")
+
+        payload = {"version": self.STATE_VERSION, "indicators": {**self._previous_state, **self.state}}
+        tmp = out_dir / f".{self.STATE_FILE}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, out_dir / self.STATE_FILE)
+
+    def full_frame(self, name):
+        """完整指標：resume 模式下 = 磁碟上未受影響嘅年份 + 今次重寫嘅年份"""
+        frame = self.indicators[name]
+        if name not in self._partial:
+            return frame
+        years = self._dirty.get(name) or set()
+        on_disk = sorted((self._resume_dir / name).glob("*.parquet"))
+        old = load_indicator(self._resume_dir, name, years={int(p.stem) for p in on_disk} - years)
+        if old.empty:
+            return frame
+        old = old.reindex(columns=frame.columns)
+        return pd.concat([old, frame]).sort_index()
 
     # ✅ 2) unified output：合併成一個 parquet
     def to_unified_frame(self):
         frames = []
-        for name, df in self.indicators.items():
-            frames.append(pd.concat({name: df}, axis=1))
+        for name in self.indicators:
+            frames.append(pd.concat({name: self.full_frame(name)}, axis=1))
         if not frames:
             return pd.DataFrame()
         unified = pd.concat(frames, axis=1)
         # columns 變成 MultiIndex: (indicator, symbol)
         return unified
 
+    # ✅ 3) 指標庫：長表 + 年份分區，讀取端可以按指標 / symbol / 日期只讀需要嘅部分
+    def save_store(self, store):
+        """
+        寫入 IndicatorStore；resume 模式只重寫受影響年份
+        指標庫仲未有嘅指標 (第一次寫 / 新指標) 就寫完整歷史
+        """
+        existing = set(store.indicators())
+        frames = {name: (df if name in existing else self.full_frame(name)) for name, df in self.indicators.items()}
+        store.upsert(frames)
+        return store
+
     def save_unified(self, out_path):
         unified = self.to_unified_frame()
         out_path = Path(out_path)
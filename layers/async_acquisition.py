@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from layers.data_hub import DataHub
+from layers.data_layer import UniverseProvider
+
+
+def make_session(pool_size=16):
+    """共用連線池：同一 host 嘅請求重用 TCP / TLS 連線"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class AsyncAcquisition:
+    """
+    並行數據抓取：Universe -> (價格 / 基本面 / 宏觀) 同時進行
+    各 loader 本身係 blocking，用 asyncio.to_thread 跑；每個數據源有自己嘅並發上限 (semaphore)
+    宏觀每條 FRED series 獨立一個 task，唔使等 universe
+    提供 awaitable (acquire_all) 同 sync (run) 兩個入口
+    """
+    DEFAULT_LIMITS = {"wikipedia": 1, "yfinance": 1, "simfin": 1, "fred": 4}
+
+    def __init__(self, hub: Optional[DataHub] = None, universe_provider=None, limits=None, pool_size=16):
+        self.hub = hub or DataHub()
+        self.session = make_session(pool_size)
+        self.universe_provider = universe_provider or UniverseProvider(session=self.session)
+        self.limits = {**self.DEFAULT_LIMITS, **(limits or {})}
+        self.timings: Dict[str, float] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def _call(self, source, label, fn, *args, **kwargs):
+        async with self._semaphores[source]:
+            t0 = time.perf_counter()
+            try:
+                return await asyncio.to_thread(fn, *args, **kwargs)
+            finally:
+                self.timings[label] = time.perf_counter() - t0
+
+    async def fetch_universe(self):
+        universe_df = await self._call("wikipedia", "universe", self.universe_provider.build_universe)
+        return universe_df, universe_df["Ticker"].dropna().unique().tolist()
+
+    async def fetch_prices(self, tickers):
+        return await self._call("yfinance", "prices", self.hub.price.download, symbols=tickers, force=True)
+
+    async def fetch_fundamentals(self, tickers):
+        return await self._call("simfin", "fundamentals", self.hub.fundamentals.download_quarterly, tickers)
+
+    async def fetch_macro(self):
+        macro = self.hub.macro
+        frames = await asyncio.gather(*[
+            self._call("fred", f"macro:{series_id}", macro.download_series, series_id, name)
+            for series_id, name in macro.SERIES
+        ])
+        return await asyncio.to_thread(macro.save_combined, list(frames))
+
+    async def acquire_all(self):
+        """
+        回傳 {"universe", "tickers", "prices", "fundamentals", "macro"}
+        任何一個數據源失敗都會等其他數據源完成 (照樣落盤) 先至拋出第一個錯誤
+        """
+        self._semaphores = {source: asyncio.Semaphore(n) for source, n in self.limits.items()}
+        self.timings = {}
+        t0 = time.perf_counter()
+
+        macro_task = asyncio.create_task(self.fetch_macro())
+        try:
+            universe_df, tickers = await self.fetch_universe()
+        except BaseException:
+            await asyncio.gather(macro_task, return_exceptions=True)
+            raise
+
+        prices, fundamentals, macro = await asyncio.gather(
+            self.fetch_prices(tickers), self.fetch_fundamentals(tickers), macro_task,
+            return_exceptions=True
+        )
+        self.timings["total"] = time.perf_counter() - t0
+
+        for result in (prices, fundamentals, macro):
+            if isinstance(result, BaseException):
+                raise result
+        return {
+            "universe": universe_df,
+            "tickers": tickers,
+            "prices": prices,
+            "fundamentals": fundamentals,
+            "macro": macro,
+        }
+
+    def run(self):
+        """同步入口 (唔可以喺已經運行緊嘅 event loop 入面調用，嗰陣請用 await acquire_all())"""
+        return asyncio.run(self.acquire_all())
+
+    def close(self):
+        self.session.close()
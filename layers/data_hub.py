@@ -1,21 +1,101 @@
+from collections import OrderedDict
+from pathlib import Path
+
+from config import load_config
 from layers.price_layer import PriceLoader
 from layers.technical_layer import TechnicalIndicator
+from layers.indicator_store import IndicatorStore
 from layers.fundamentals_layer import FundamentalsLoader
 from layers.macro_layer import MacroLoader
 
+
+def _file_fingerprint(path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
 class DataHub:
-    def __init__(self, config=None):
-        self.price = PriceLoader(config=config)
-        self.fundamentals = FundamentalsLoader(config=config)
-        self.macro = MacroLoader(config=config)
+    """
+    config 只讀一次，三個 loader 共用
+    讀取結果放入 process 內 LRU cache，key = (source, start, end, 數據檔 fingerprint)：
+    同一段期間只讀一次；數據檔有寫入 fingerprint 就會變，舊結果自然唔再命中
+    close pivot 由 cache 住嘅 OHLCV 推導，唔會再讀一次 Parquet
+    回傳嘅 DataFrame 係共用物件，調用方唔好就地修改
+    """
+
+    def __init__(self, config=None, cache_size=16):
+        self.config = config or load_config()
+        self.price = PriceLoader(config=self.config)
+        self.fundamentals = FundamentalsLoader(config=self.config)
+        self.macro = MacroLoader(config=self.config)
+        self.indicator_store = IndicatorStore(Path(self.config['paths']['processed_data']) / "indicator_store")
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------
+    def _fingerprint(self, source):
+        if source in ("ohlcv", "close"):
+            return self.price.store.fingerprint()
+        if source == "macro":
+            return _file_fingerprint(self.macro.raw_dir / "macro.parquet")
+        if source == "fundamentals":
+            return _file_fingerprint(Path(self.config['paths']['raw_data']) / "fundamentals_quarterly.parquet")
+        raise KeyError(f"未知數據源: {source}")
+
+    def _cached(self, source, start, end, loader, symbols=None):
+        key = (source, str(start), str(end), None if symbols is None else tuple(symbols), self._fingerprint(source))
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        self.misses += 1
+        value = loader()
+        self._cache[key] = value
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    def cache_info(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "max_size": self.cache_size}
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    # ------------------------------------------------------------
+    # 讀取
+    # ------------------------------------------------------------
+    def load_ohlcv(self, start=None, end=None, symbols=None):
+        # symbols 預設 = 上次 download 嘅 / config universe (見 PriceLoader.universe)，唔係 store 入面全部 ticker
+        symbols = self.price.universe(symbols)
+        return self._cached("ohlcv", start, end,
+                            lambda: self.price.load_ohlcv(start=start, end=end, symbols=symbols), symbols)
+
+    def load_price(self, start=None, end=None, symbols=None):
+        # 同 PriceLoader.load 一樣嘅 (date x Symbol) close pivot
+        symbols = self.price.universe(symbols)
+        return self._cached("close", start, end,
+                            lambda: self.load_ohlcv(start=start, end=end, symbols=symbols)["Close"].unstack("Symbol"),
+                            symbols)
+
+    def load_macro(self, start=None, end=None):
+        return self._cached("macro", start, end, lambda: self.macro.load(start=start, end=end))
 
-    def load_price(self, start=None, end=None):
-        return self.price.load(start=start, end=end)
+    def load_fundamentals(self, as_of_date):
+        return self._cached("fundamentals", None, as_of_date, lambda: self.fundamentals.load_latest(as_of_date))
 
-    def load_ohlcv(self, start=None, end=None):
-        return self.price.load_ohlcv(start=start, end=end)
+    def query_indicators(self, indicators=None, symbols=None, start=None, end=None):
+        # lazy handle，唔經 cache：物化時先按條件讀
+        return self.indicator_store.query(indicators, symbols, start, end)
 
-    def build_technical(self, start=None, end=None):
-        close_df = self.price.load(start=start, end=end)
-        ohlcv_df = self.price.load_ohlcv(start=start, end=end)
+    def build_technical(self, start=None, end=None, symbols=None):
+        close_df = self.load_price(start=start, end=end, symbols=symbols)
+        ohlcv_df = self.load_ohlcv(start=start, end=end, symbols=symbols)
         return TechnicalIndicator(close_df, ohlcv_df)
@@ -0,0 +1,271 @@
+import os
+import time
+import random
+import threading
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+
+class ThrottledError(Exception):
+    """數據源回應限流 (HTTP 429 / rate limit)"""
+
+
+def _is_rate_limit(error):
+    text = f"{type(error).__name__} {error}" if isinstance(error, BaseException) else str(error)
+    return "RateLimit" in text or "Too Many Requests" in text or "429" in text
+
+
+# ==========================================
+# 🪣 Token bucket (AIMD 自適應速率)
+# ==========================================
+class TokenBucket:
+    """
+    每秒補 rate 個 token，最多儲 capacity 個
+    成功 => 速率慢慢加 (additive increase)；限流 / 錯誤 => 速率減半 (multiplicative decrease)
+    clock / sleep 可注入，測試時唔使真係等
+    """
+
+    def __init__(self, rate=1.0, capacity=2.0, min_rate=0.05, max_rate=5.0, increase=0.05,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens=1.0):
+        while True:
+            with self._lock:
+                self._refill()
+                # 容許浮點誤差，否則等待時間細過 clock 精度時會空轉
+                if self.tokens >= tokens - 1e-9:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            # 清空存量，避免限流後即刻再爆一輪請求
+            self.tokens = 0.0
+            self._last = self.clock()
+
+    def on_error(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.75)
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0, rng=random):
+    """指數退避 + full jitter：uniform(0, min(cap, base * 2^attempt))"""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# ==========================================
+# 📒 Durable retry queue
+# ==========================================
+class RetryQueue:
+    """
+    下載失敗嘅 ticker 持久化到 CSV (Ticker, Attempts, LastError, NextAttempt)
+    每次 run 都會將到期嘅 ticker 加返入下載清單，成功先移除；超過 max_attempts 嘅保留但唔再排
+    """
+    COLUMNS = ["Ticker", "Attempts", "LastError", "NextAttempt"]
+
+    def __init__(self, path, max_attempts=10):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.entries: Dict[str, dict] = {}
+        if path and os.path.exists(path):
+            df = pd.read_csv(path)
+            for row in df.to_dict("records"):
+                self.entries[row["Ticker"]] = row
+
+    def __len__(self):
+        return len(self.entries)
+
+    def due(self, now=None):
+        now = now if now is not None else time.time()
+        return [t for t, e in self.entries.items()
+                if e["Attempts"] < self.max_attempts and e["NextAttempt"] <= now]
+
+    def dead(self):
+        return [t for t, e in self.entries.items() if e["Attempts"] >= self.max_attempts]
+
+    def add(self, ticker, error, delay=0.0, now=None):
+        now = now if now is not None else time.time()
+        entry = self.entries.get(ticker, {"Ticker": ticker, "Attempts": 0})
+        entry["Attempts"] += 1
+        entry["LastError"] = str(error)[:200]
+        entry["NextAttempt"] = now + delay
+        self.entries[ticker] = entry
+
+    def remove(self, tickers):
+        for ticker in tickers:
+            self.entries.pop(ticker, None)
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        pd.DataFrame(list(self.entries.values()), columns=self.COLUMNS).to_csv(tmp, index=False)
+        os.replace(tmp, self.path)
+
+
+# ==========================================
+# 🌐 Data sources
+# ==========================================
+class YFinanceBatchSource:
+    """
+    一次 yf.download 抓多隻 ticker，拆返做 {ticker: DataFrame}，做法同 PriceLoader.download 一致
+    yfinance 限流好多時唔會 raise，只係逐隻 ticker log 錯誤 (yf.shared._ERRORS) 再回傳空 / 缺欄嘅 frame，
+    所以要睇埋逐隻 ticker 嘅錯誤，有 rate limit 就當成限流
+    """
+    REQUIRED = {"Close", "High", "Low", "Volume"}
+
+    def fetch(self, tickers, start, end=None) -> Dict[str, pd.DataFrame]:
+        import yfinance as yf
+
+        try:
+            data = yf.download(list(tickers), start=start, end=end, auto_adjust=True, group_by="ticker",
+                               progress=False, threads=False)
+        except Exception as e:
+            if _is_rate_limit(e):
+                raise ThrottledError(str(e)) from e
+            raise
+
+        errors = dict(getattr(getattr(yf, "shared", None), "_ERRORS", None) or {})
+        limited = [t for t, err in errors.items() if _is_rate_limit(err)]
+        if limited:
+            raise ThrottledError(f"{len(limited)} 隻 ticker 被限流: {errors[limited[0]]}")
+
+        out = {}
+        if data is None or data.empty:
+            return out
+        for ticker in tickers:
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                df = data[ticker].copy()
+            else:
+                df = data.copy()
+            df.columns = [str(c) for c in df.columns]
+            df = df.dropna(how="all")
+            if not df.empty and self.REQUIRED.issubset(df.columns):
+                out[ticker] = df
+        return out
+
+
+class ParquetDirectorySource:
+    """本地假數據源：由 {ticker}.parquet 目錄讀，用嚟離線測試 scheduler"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, tickers, start, end=None) -> Dict[str, pd.DataFrame]:
+        out = {}
+        for ticker in tickers:
+            path = os.path.join(self.directory, f"{ticker}.parquet")
+            if os.path.exists(path):
+                df = pd.read_parquet(path)
+                out[ticker] = df.loc[start:end] if start or end else df
+        return out
+
+
+# ==========================================
+# 🗓️ Scheduler
+# ==========================================
+class DownloadScheduler:
+    """
+    將 ticker 分批用多 symbol 請求下載：
+    - token bucket 控制請求速率，按限流 / 錯誤自動調節
+    - 每批失敗用指數退避 + jitter 重試，重試完都唔得就入 retry queue
+    - 回傳空或者缺咗大部分 ticker (> max_missing_ratio) 嘅批次當成限流 (靜默限流唔一定會 raise)，
+      同樣減速 + 退避重試；重試完就用最完整嗰次嘅結果
+    - 批次成功但缺咗少量 ticker 就直接入 retry queue (唔拖累成批)
+    source 只需要提供 fetch(tickers, start, end) -> {ticker: df}
+    """
+
+    def __init__(self, source, batch_size=50, bucket: Optional[TokenBucket] = None,
+                 retry_queue: Optional[RetryQueue] = None, max_attempts=5, backoff_base=1.0, backoff_cap=60.0,
+                 requeue_base=300.0, requeue_cap=86400.0, max_missing_ratio=0.5, sleep=time.sleep, rng=None):
+        self.source = source
+        self.max_missing_ratio = max_missing_ratio
+        self.batch_size = batch_size
+        self.bucket = bucket or TokenBucket(sleep=sleep)
+        self.retry_queue = retry_queue if retry_queue is not None else RetryQueue(None)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        # 入 retry queue 之後下次幾時再試 (跨 run)，同樣係指數退避
+        self.requeue_base = requeue_base
+        self.requeue_cap = requeue_cap
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+    def _fetch_batch(self, batch, start, end):
+        error = None
+        best = {}
+        for attempt in range(self.max_attempts):
+            self.bucket.acquire()
+            try:
+                result = self.source.fetch(batch, start, end)
+                missing = len([t for t in batch if t not in result])
+                if not result or missing > self.max_missing_ratio * len(batch):
+                    if len(result) > len(best):
+                        best = result
+                    raise ThrottledError(f"批次 {len(batch)} 隻只返到 {len(result)} 隻，疑似被限流")
+                self.bucket.on_success()
+                return result, None
+            except ThrottledError as e:
+                self.bucket.on_throttle()
+                error = e
+            except Exception as e:
+                self.bucket.on_error()
+                error = e
+            self.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap, self.rng))
+        return best, error
+
+    def run(self, tickers: List[str], start=None, end=None, include_due=True):
+        """
+        回傳 (results, failed)；include_due=True 會順便重試 retry queue 入面到期嘅 ticker
+        retry queue 喺完結時寫返落磁碟
+        """
+        queue = list(dict.fromkeys(tickers))
+        if include_due:
+            queued = set(queue)
+            queue += [t for t in self.retry_queue.due() if t not in queued]
+
+        results: Dict[str, pd.DataFrame] = {}
+        failed: List[str] = []
+        for i in range(0, len(queue), self.batch_size):
+            batch = queue[i:i + self.batch_size]
+            data, error = self._fetch_batch(batch, start, end)
+            results.update(data)
+            self.retry_queue.remove(data.keys())
+
+            for ticker in batch:
+                if ticker in data:
+                    continue
+                failed.append(ticker)
+                attempts = self.retry_queue.entries.get(ticker, {}).get("Attempts", 0)
+                self.retry_queue.add(ticker, error or "no data",
+                                     delay=backoff_delay(attempts, self.requeue_base, self.requeue_cap, self.rng))
+
+        self.retry_queue.save()
+        return results, failed
@@ -1,14 +1,30 @@
 import simfin as sf
 from simfin.names import *
+import os
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from config import load_config
 
 class FundamentalsLoader:
+    # 每份報表要保留嘅欄位 (SimFinId / REPORT_DATE 一定會讀)；CURRENCY 只由 income 提供
+    STATEMENTS = {
+        "income": [CURRENCY, REVENUE, GROSS_PROFIT, OPERATING_INCOME, NET_INCOME, EPS],
+        "balance": [CASH_EQUIV_ST_INVEST, TOTAL_ASSETS, ST_DEBT, LT_DEBT, TOTAL_LIABILITIES, TOTAL_EQUITY],
+        "cashflow": [NET_CASH_OPS, NET_CASH_INV, NET_CASH_FIN],
+    }
+    CHUNKSIZE = 100_000
+    # PIT index 嘅可用日期欄：PUBLISH_DATE；冇公佈日 (舊檔 / 缺值) 就用 REPORT_DATE + PUBLISH_LAG_DAYS
+    AVAILABLE_DATE = "Available Date"
+    PUBLISH_LAG_DAYS = 90
+
     def __init__(self, api_key=None, config=None):
         self.config = config or load_config()
         sf.set_api_key(api_key or self.config['data']['fundamentals'].get('api_key'))
         sf.set_data_dir(self.config['paths']['raw_data'])
+        self._mapping = None
+        self._mapping_mtime = None
+        self._companies = None
 
     def _load_mapping(self):
         mapping_path = Path(
@@ -18,13 +34,28 @@ class FundamentalsLoader:
         )
         if not mapping_path.exists():
             return None
+        # 檔案冇改過就用返上次 parse 好嘅結果
+        mtime = mapping_path.stat().st_mtime_ns
+        if self._mapping is not None and self._mapping_mtime == mtime:
+            return self._mapping
         df = pd.read_csv(mapping_path)
         df.columns = [c.strip() for c in df.columns]
         if "Ticker" not in df.columns or "SimFinId" not in df.columns:
             raise KeyError(f"mapping 檔案欄位錯誤，需要 Ticker, SimFinId: {list(df.columns)}")
         df["Ticker"] = df["Ticker"].astype(str).str.strip().str.upper()
+        self._mapping, self._mapping_mtime = df, mtime
         return df
 
+    def _load_companies(self):
+        if self._companies is None:
+            companies = sf.load_companies(market='us')
+            # sf.load_companies 預設將 Ticker 放喺 index
+            if TICKER not in companies.columns and "Ticker" not in companies.columns and \
+                    (companies.index.name in (TICKER, "Ticker")):
+                companies = companies.reset_index()
+            self._companies = companies
+        return self._companies
+
     def _get_simfin_ids(self, symbols):
         # 1) 先用 mapping 檔（如果有）
         mapping = self._load_mapping()
@@ -32,7 +63,7 @@ class FundamentalsLoader:
             return mapping[mapping["Ticker"].isin(symbols)]["SimFinId"].dropna().unique()
 
         # 2) fallback：嘗試從 companies 取得 ticker
-        companies = sf.load_companies(market='us')
+        companies = self._load_companies()
         if TICKER in companies.columns:
             ticker_col = TICKER
         elif "Ticker" in companies.columns:
@@ -51,42 +82,189 @@ class FundamentalsLoader:
 
         return companies[companies[ticker_col].isin(symbols)][id_col].unique()
 
-    def download_quarterly(self, symbols):
-        df = sf.load_income(variant='quarterly', market='us')
+    def _bulk_file(self, dataset):
+        """
+        同 sf.load_* 一樣嘅下載 / refresh 邏輯，但只攞本地 bulk 檔路徑，唔將成個數據集讀入記憶體
+        simfin 冇公開「只下載」嘅 API，要用私有 helper：
+        simfin.download._maybe_download_dataset 只負責下載 (回傳 bool：有冇下載過)，
+        CSV 路徑由 simfin.paths._path_dataset 計；新版 simfin 冇咗 / 改咗簽名就回傳 None，
+        由 _read_statement 行返公開嘅 sf.load
+        """
+        kwargs = dict(dataset=dataset, variant='quarterly', market='us')
+        try:
+            from simfin.download import _maybe_download_dataset
+            from simfin.paths import _path_dataset
+            _maybe_download_dataset(refresh_days=30, **kwargs)
+            path = _path_dataset(**kwargs)
+        except (ImportError, TypeError) as e:
+            print(f"⚠️ simfin 私有下載 API 用唔到 ({e})，改用 sf.load 全量讀入 {dataset}")
+            return None
+        if not isinstance(path, (str, os.PathLike)) or not os.path.exists(path):
+            print(f"⚠️ 搵唔到 simfin bulk 檔 ({path})，改用 sf.load 全量讀入 {dataset}")
+            return None
+        return path
 
-        # 轉用 SimFinId 過濾
-        simfin_ids = self._get_simfin_ids(symbols)
-        if SIMFIN_ID in df.columns:
-            id_col = SIMFIN_ID
-        elif "SimFinId" in df.columns:
-            id_col = "SimFinId"
+    def _read_statement(self, dataset, columns, simfin_ids=None):
+        """
+        分 chunk 讀 bulk CSV：usecols 只 parse 要嘅欄，每個 chunk 讀完即刻按 SimFinId 過濾
+        峰值記憶體 ~ 一個 chunk + 過濾後結果 (fallback 去 sf.load 就係成個數據集)
+        PUBLISH_DATE 一定保留，PIT index 用佢做可用日期
+        """
+        wanted = {SIMFIN_ID, "SimFinId", REPORT_DATE, PUBLISH_DATE, *columns}
+        ids = None if simfin_ids is None or len(simfin_ids) == 0 else set(simfin_ids)
+        parts = []
+        path = self._bulk_file(dataset)
+        if path is None:
+            full = sf.load(dataset=dataset, variant='quarterly', market='us', refresh_days=30,
+                           parse_dates=[REPORT_DATE, PUBLISH_DATE])
+            full = full.reset_index() if SIMFIN_ID not in full.columns and "SimFinId" not in full.columns else full
+            reader = [full[[c for c in full.columns if c in wanted]]]
         else:
-            raise KeyError(f"找不到 SimFinId 欄位於 income, 現有欄位: {list(df.columns)}")
+            reader = pd.read_csv(path, sep=';', usecols=lambda c: c in wanted,
+                                 parse_dates=[REPORT_DATE, PUBLISH_DATE], chunksize=self.CHUNKSIZE)
+        for chunk in reader:
+            id_col = self._id_col(chunk)
+            if ids is not None:
+                chunk = chunk[chunk[id_col].isin(ids)]
+            if not chunk.empty:
+                parts.append(chunk)
+        if not parts:
+            return pd.DataFrame(columns=[SIMFIN_ID, REPORT_DATE, PUBLISH_DATE, *columns])
+        df = pd.concat(parts, ignore_index=True)
+        if PUBLISH_DATE not in df.columns:
+            df[PUBLISH_DATE] = pd.NaT
+        keep = [self._id_col(df), REPORT_DATE, PUBLISH_DATE] + [c for c in columns if c in df.columns]
+        return df[keep]
 
-        if simfin_ids is not None and len(simfin_ids) > 0:
-            df = df[df[id_col].isin(simfin_ids)]
-        else:
+    def download_quarterly(self, symbols):
+        """
+        income / balance / cashflow 三份季度報表一次過 ingest，按 (SimFinId, REPORT_DATE) 合併成一個檔
+        每份報表同一份報告 (restatement) 只留最遲公佈嗰行；合併後 PUBLISH_DATE 取三份報表最遲嗰個
+        (成行數據齊晒先當已公佈)
+        """
+        # 轉用 SimFinId 過濾
+        simfin_ids = self._get_simfin_ids(symbols)
+        if simfin_ids is None or len(simfin_ids) == 0:
             print("⚠️ 冇可用 mapping，fundamentals 先全量保存（之後可加 mapping 再過濾）")
 
-        keep_cols = [id_col, REPORT_DATE, CURRENCY, REVENUE, GROSS_PROFIT,
-                     OPERATING_INCOME, NET_INCOME, EPS]
-        keep_cols = [c for c in keep_cols if c in df.columns]
-        df = df[keep_cols]
+        df = None
+        published = []
+        for dataset, columns in self.STATEMENTS.items():
+            statement = self._read_statement(dataset, columns, simfin_ids)
+            id_col = self._id_col(statement)
+            # 同一份報告可能重複 (restatement)，保留最遲公佈嗰行 (冇公佈日嘅當最早)
+            statement = statement.sort_values([id_col, REPORT_DATE, PUBLISH_DATE], kind="stable", na_position="first")
+            statement = statement.drop_duplicates(subset=[id_col, REPORT_DATE], keep="last")
+            statement = statement.rename(columns={PUBLISH_DATE: f"{PUBLISH_DATE} ({dataset})"})
+            published.append(f"{PUBLISH_DATE} ({dataset})")
+            df = statement if df is None else df.merge(statement, on=[id_col, REPORT_DATE], how="outer")
 
+        df.insert(2, PUBLISH_DATE, df[published].max(axis=1))
+        df = df.drop(columns=published)
+        df = df.sort_values([self._id_col(df), REPORT_DATE], kind="stable").reset_index(drop=True)
         out_path = Path(self.config['paths']['raw_data']) / "fundamentals_quarterly.parquet"
         df.to_parquet(out_path)
         return df
 
-    def load_latest(self, as_of_date):
-        df = pd.read_parquet(Path(self.config['paths']['raw_data']) / "fundamentals_quarterly.parquet")
+    # ------------------------------------------------------------
+    # Point-in-time index
+    # ------------------------------------------------------------
+    @property
+    def _quarterly_path(self):
+        return Path(self.config['paths']['raw_data']) / "fundamentals_quarterly.parquet"
+
+    @property
+    def _pit_path(self):
+        return Path(self.config['paths']['raw_data']) / "fundamentals_pit.parquet"
 
+    @staticmethod
+    def _id_col(df):
         if SIMFIN_ID in df.columns:
-            id_col = SIMFIN_ID
-        elif "SimFinId" in df.columns:
-            id_col = "SimFinId"
-        else:
-            raise KeyError(f"找不到 SimFinId 欄位於 fundamentals, 現有欄位: {list(df.columns)}")
+            return SIMFIN_ID
+        if "SimFinId" in df.columns:
+            return "SimFinId"
+        raise KeyError(f"找不到 SimFinId 欄位於 fundamentals, 現有欄位: {list(df.columns)}")
+
+    def build_pit_index(self):
+        """
+        將 fundamentals_quarterly.parquet 整理成 point-in-time index 並落盤：
+        每行嘅可用日期 (AVAILABLE_DATE) = PUBLISH_DATE，冇就 REPORT_DATE + PUBLISH_LAG_DAYS (保守估計)
+        按 (AVAILABLE_DATE, id) 排序，每個 id 嘅數值欄位向前填補，
+        令「某日之前最新一行」== 嗰日已公佈報告嘅逐欄最後非空值
+        遲公佈嘅舊期報告 (REPORT_DATE 早過已公佈嘅最新一期) 唔會蓋過新數據，直接丟走
+        有 mapping 就加埋 Ticker 欄
+        註：SimFin 嘅數值係 restate 之後嘅版本，呢個偏差呢度消除唔到
+        """
+        df = pd.read_parquet(self._quarterly_path)
+        if REPORT_DATE not in df.columns and REPORT_DATE in df.index.names:
+            df = df.reset_index()
+        id_col = self._id_col(df)
+
+        fallback = df[REPORT_DATE] + pd.Timedelta(days=self.PUBLISH_LAG_DAYS)
+        available = df[PUBLISH_DATE].fillna(fallback) if PUBLISH_DATE in df.columns else fallback
+        df.insert(df.columns.get_loc(REPORT_DATE) + 1, self.AVAILABLE_DATE, available)
+
+        df = df.sort_values([self.AVAILABLE_DATE, id_col, REPORT_DATE], kind="stable").reset_index(drop=True)
+        newest = df.groupby(id_col, sort=False)[REPORT_DATE].cummax()
+        df = df[df[REPORT_DATE] >= newest].reset_index(drop=True)
+        value_cols = [c for c in df.columns
+                      if c not in (id_col, REPORT_DATE, PUBLISH_DATE, self.AVAILABLE_DATE, "Ticker")]
+        df[value_cols] = df.groupby(id_col, sort=False)[value_cols].ffill()
+
+        mapping = self._load_mapping()
+        if "Ticker" not in df.columns and mapping is not None:
+            mapping = mapping[["Ticker", "SimFinId"]].rename(columns={"SimFinId": id_col})
+            df = df.merge(mapping.drop_duplicates(), on=id_col, how="left")
+            df = df.sort_values([self.AVAILABLE_DATE, id_col], kind="stable").reset_index(drop=True)
 
-        df = df[df[REPORT_DATE] <= pd.to_datetime(as_of_date)]
-        latest = df.sort_values(REPORT_DATE).groupby(id_col).last().reset_index()
-        return latest
+        tmp = self._pit_path.with_name(f".{self._pit_path.name}.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, self._pit_path)
+        return df
+
+    def load_pit_index(self):
+        """讀落盤嘅 PIT index；quarterly 檔比佢新 (重新下載過) 或者係冇可用日期欄嘅舊格式就重建"""
+        pit, src = self._pit_path, self._quarterly_path
+        if not pit.exists() or pit.stat().st_mtime_ns < src.stat().st_mtime_ns:
+            return self.build_pit_index()
+        index = pd.read_parquet(pit)
+        return index if self.AVAILABLE_DATE in index.columns else self.build_pit_index()
+
+    def as_of(self, dates, index=None):
+        """
+        一次 merge_asof 答晒 N 個日期：每個日期 x 每個 id 喺嗰日 (含) 之前已公佈 (AVAILABLE_DATE) 嘅最新報告
+        回傳長表 (Date, id, [Ticker], 各欄)；嗰日之前未有報告公佈嘅 id 唔會出現
+        """
+        index = self.load_pit_index() if index is None else index
+        id_col = self._id_col(index)
+        dates = pd.DatetimeIndex(pd.to_datetime(dates)).unique().sort_values()
+        ids = index[id_col].unique()
+
+        grid = pd.DataFrame({
+            "Date": dates.repeat(len(ids)),
+            id_col: np.tile(ids, len(dates)),
+        })
+        out = pd.merge_asof(grid, index, left_on="Date", right_on=self.AVAILABLE_DATE, by=id_col,
+                            direction="backward", allow_exact_matches=True)
+        return out.dropna(subset=[REPORT_DATE]).reset_index(drop=True)
+
+    def pit_panel(self, trading_days, fields, key="Ticker"):
+        """
+        {field: DataFrame(index=trading_days, columns=key)}，同價格 panel 一樣對齊交易日曆
+        策略可以直接用 panel[field].loc[date] 攞嗰日已公佈 (按 PUBLISH_DATE) 嘅最新數值
+        """
+        long = self.as_of(trading_days)
+        if key not in long.columns:
+            raise KeyError(f"PIT index 冇 {key} 欄位 (需要 simfin mapping 先有 Ticker)")
+        long = long.dropna(subset=[key]).drop_duplicates(subset=["Date", key], keep="last")
+        trading_days = pd.DatetimeIndex(trading_days)
+        return {
+            field: long.pivot(index="Date", columns=key, values=field).reindex(trading_days)
+            for field in ([fields] if isinstance(fields, str) else fields)
+        }
+
+    def load_latest(self, as_of_date):
+        index = self.load_pit_index()
+        id_col = self._id_col(index)
+        latest = self.as_of([as_of_date], index=index).drop(columns=["Date"])
+        return latest.sort_values(id_col, kind="stable").reset_index(drop=True)
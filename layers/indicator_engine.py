@@ -0,0 +1,347 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+# pandas_ta 用嚟判斷「接近零」嘅 epsilon
+EPS = sys.float_info.epsilon
+
+
+class PackedPanel:
+    """
+    (date x symbol) panel 嘅「逐隻股票壓實」版本：
+    每隻股票自己有數據嘅行順序搬到頂 (第 k 行 = 佢第 k 個 bar)，尾部補 NaN
+    pandas_ta 係逐隻股票用佢自己嘅日期計，shift / ewm / 前 n 行 SMA 都係按「自己第幾個 bar」；
+    壓實之後所有股票可以一齊做 2D 運算而結果一樣 (指標全部係因果嘅，尾部 NaN 唔會影響前面)
+    """
+
+    def __init__(self, index, columns, present):
+        self.index = pd.DatetimeIndex(index)
+        self.columns = pd.Index(columns)
+        self.present = np.asarray(present, dtype=bool)
+        # stable argsort：有數據嘅行喺前，並保持日期次序
+        self.order = np.argsort(~self.present, axis=0, kind="stable")
+        self.counts = self.present.sum(axis=0)
+        self.valid = np.arange(len(self.index))[:, None] < self.counts[None, :]
+
+    @classmethod
+    def from_long(cls, ohlcv_df):
+        """ohlcv_df: MultiIndex (date, Symbol) 長表；有行就算「有數據」(即使數值係 NaN)"""
+        present = pd.Series(True, index=ohlcv_df.index).unstack(fill_value=False)
+        return cls(present.index, present.columns, present.to_numpy())
+
+    def field(self, ohlcv_df, name):
+        wide = ohlcv_df[name].unstack().reindex(index=self.index, columns=self.columns)
+        return self.pack(wide.to_numpy(dtype=np.float64))
+
+    def pack(self, values):
+        packed = np.take_along_axis(values, self.order, axis=0)
+        packed[~self.valid] = np.nan
+        return packed
+
+    def unpack(self, packed):
+        out = np.full(packed.shape, np.nan)
+        cols = np.broadcast_to(np.arange(packed.shape[1]), packed.shape)
+        out[self.order[self.valid], cols[self.valid]] = packed[self.valid]
+        return out
+
+    def to_frame(self, packed):
+        return pd.DataFrame(self.unpack(packed), index=self.index, columns=list(self.columns))
+
+
+# ------------------------------------------------------------
+# 2D 基本運算 (axis 0 = 時間)
+# ------------------------------------------------------------
+def shift(values, periods=1):
+    out = np.full(values.shape, np.nan)
+    if periods < len(values):
+        out[periods:] = values[:len(values) - periods]
+    return out
+
+
+def rma(values, length):
+    """Wilder MA = ewm(alpha=1/length, adjust=False)；用 DataFrame.ewm 一次計晒所有欄，數值同逐隻一樣"""
+    return pd.DataFrame(values).ewm(alpha=1.0 / length, adjust=False).mean().to_numpy()
+
+
+def head_mean(values, n):
+    """每欄頭 n 行嘅 nanmean；轉置令每欄連續，加總次序同 pandas Series.mean 一樣"""
+    head = np.ascontiguousarray(values[:n].T)
+    mask = np.isnan(head)
+    count = (~mask).sum(axis=1)
+    total = np.where(mask, 0.0, head).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def non_zero_range(x, y):
+    """x - y；某欄有任何一個 0 就成欄加 epsilon (pandas_ta 逐條 Series 嘅做法)"""
+    diff = x - y
+    has_zero = (diff == 0).any(axis=0)
+    return np.where(has_zero[None, :], diff + EPS, diff)
+
+
+def zero(values):
+    return np.where(np.abs(values) < EPS, 0.0, values)
+
+
+def sma(values, length):
+    """滾動平均 (窗口內有 NaN 就係 NaN)，同 pandas_ta sma 嘅卷積一樣係 sum(x / n 權重)"""
+    out = np.full(values.shape, np.nan)
+    if len(values) >= length:
+        windows = np.lib.stride_tricks.sliding_window_view(values, length, axis=0)
+        out[length - 1:] = windows @ np.full(length, 1.0 / length)
+    return out
+
+
+# ------------------------------------------------------------
+# 指標 (輸入輸出都係 2D numpy；OHLCV 類要先用 PackedPanel 壓實)
+# ------------------------------------------------------------
+def rsi(close, length=14, scalar=100.0):
+    diff = close - shift(close)
+    positive = np.where(diff < 0, 0.0, diff)
+    negative = np.where(diff > 0, 0.0, diff)
+    positive_avg = rma(positive, length)
+    negative_avg = rma(negative, length)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return scalar * positive_avg / (positive_avg + np.abs(negative_avg))
+
+
+def true_range(high, low, close, prenan=False):
+    prev_close = shift(close)
+    tr = np.fmax(np.fmax(np.abs(non_zero_range(high, low)), np.abs(high - prev_close)),
+                 np.abs(prev_close - low))
+    if prenan:
+        tr[:1] = np.nan
+    return tr
+
+
+def _seeded_tr(high, low, close, length, prenan):
+    tr = true_range(high, low, close, prenan=prenan)
+    seed = head_mean(tr, length)
+    tr[:length - 1] = np.nan
+    if len(tr) >= length:
+        tr[length - 1] = seed
+    return tr
+
+
+def atr(high, low, close, length=14, prenan=False):
+    """pandas_ta atr (rma + presma)：頭 length 個 TR 嘅平均做種子，之後 Wilder 平滑"""
+    return rma(_seeded_tr(high, low, close, length, prenan), length)
+
+
+def _directional_movement(up, dn):
+    pos = zero(((up > dn) & (up > 0)) * up)
+    neg = zero(((dn > up) & (dn > 0)) * dn)
+    return pos, neg
+
+
+def _dx(atr_, dmp_avg, dmn_avg, scalar):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        k = scalar / atr_
+        dmp = k * dmp_avg
+        dmn = k * dmn_avg
+        return scalar * np.abs(dmp - dmn) / (dmp + dmn)
+
+
+def _adx_parts(high, low, close, length, scalar):
+    tr = _seeded_tr(high, low, close, length, prenan=True)
+    pos, neg = _directional_movement(high - shift(high), shift(low) - low)
+    atr_, pos_avg, neg_avg = rma(tr, length), rma(pos, length), rma(neg, length)
+    dx = _dx(atr_, pos_avg, neg_avg, scalar)
+    return {"tr": (tr, atr_), "pos": (pos, pos_avg), "neg": (neg, neg_avg), "dx": (dx, rma(dx, length))}
+
+
+def adx(high, low, close, length=14, scalar=100.0):
+    return _adx_parts(high, low, close, length, scalar)["dx"][1]
+
+
+def rolling_std(values, length, ddof=1):
+    var = pd.DataFrame(values).rolling(length, min_periods=length).var(ddof)
+    return np.sqrt(var.to_numpy())
+
+
+def bbands(close, length=20, std=2.0):
+    """回傳 (lower, mid, upper)"""
+    deviation = std * rolling_std(close, length)
+    mid = sma(close, length)
+    return mid - deviation, mid, mid + deviation
+
+
+def vwap(high, low, close, volume):
+    """日線 + pandas_ta 預設 anchor="D"：每個 bar 自成一組，即 typical price (volume 為 0 時係 NaN)"""
+    typical_price = (high + low + close) / 3.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (typical_price * volume) / volume
+
+
+# ------------------------------------------------------------
+# 增量計算：由完整結果抽出遞推狀態，之後只計新 bar
+# (狀態同 pandas ewm(adjust=False) 內部一樣：weighted 值 + old_wt，逐行接續結果 bit-for-bit 一致)
+# ------------------------------------------------------------
+def _last_rows(values, counts):
+    """每欄最後一個有效行 (counts 為 None 即係成個 array)；冇數據嘅欄係 NaN"""
+    if counts is None:
+        return values[-1].copy() if len(values) else np.full(values.shape[1], np.nan)
+    idx = np.clip(counts - 1, 0, None)
+    out = values[idx, np.arange(values.shape[1])] if len(values) else np.full(values.shape[1], np.nan)
+    return np.where(counts > 0, out, np.nan)
+
+
+def rma_state(values, result, length, counts=None):
+    """
+    (weighted, old_wt)：weighted = 最後輸出；old_wt 由最後一個觀測值之後每個 NaN 行乘一次 (1 - alpha)
+    """
+    factor = 1.0 - 1.0 / length
+    n = len(values) if counts is None else counts
+    rows = np.arange(len(values))[:, None]
+    observed = ~np.isnan(values) & (rows < n)
+    last_obs = np.where(observed.any(axis=0), len(values) - 1 - np.argmax(observed[::-1], axis=0), -1)
+    weighted = _last_rows(result, counts)
+    gap = np.where(last_obs >= 0, (n - 1) - last_obs, 0)
+    old_wt = np.ones(values.shape[1])
+    for step in range(int(gap.max()) if gap.size else 0):
+        old_wt = np.where(step < gap, old_wt * factor, old_wt)
+    return weighted, old_wt
+
+
+def rma_update(state, values, length, valid=None):
+    """逐行延續 ewm；valid=False 嘅格 (壓實後嘅尾部填充) 唔會推進狀態"""
+    alpha = 1.0 / length
+    factor = 1.0 - alpha
+    weighted, old_wt = state
+    out = np.full(values.shape, np.nan)
+    for i, cur in enumerate(values):
+        active = np.ones(len(cur), dtype=bool) if valid is None else valid[i]
+        observed = active & (cur == cur)
+        has = active & (weighted == weighted)
+        old_wt = np.where(has, old_wt * factor, old_wt)
+        with np.errstate(invalid="ignore"):
+            blended = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(has & observed & (weighted != cur), blended, weighted)
+        old_wt = np.where(has & observed, 1.0, old_wt)
+        weighted = np.where(~has & observed, cur, weighted)
+        out[i] = weighted
+    return out, (weighted, old_wt)
+
+
+def _prev_rows(first, values):
+    """shift(1)，第 0 行用上次狀態嘅最後值"""
+    prev = shift(values)
+    if len(values):
+        prev[0] = first
+    return prev
+
+
+def rsi_stateful(close, length=14, scalar=100.0):
+    diff = close - shift(close)
+    positive = np.where(diff < 0, 0.0, diff)
+    negative = np.where(diff > 0, 0.0, diff)
+    positive_avg, negative_avg = rma(positive, length), rma(negative, length)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = scalar * positive_avg / (positive_avg + np.abs(negative_avg))
+    state = {
+        "close": _last_rows(close, None),
+        "pos": rma_state(positive, positive_avg, length),
+        "neg": rma_state(negative, negative_avg, length),
+    }
+    return result, state
+
+
+def rsi_update(state, close, length=14, scalar=100.0):
+    diff = close - _prev_rows(state["close"], close)
+    positive = np.where(diff < 0, 0.0, diff)
+    negative = np.where(diff > 0, 0.0, diff)
+    positive_avg, pos_state = rma_update(state["pos"], positive, length)
+    negative_avg, neg_state = rma_update(state["neg"], negative, length)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = scalar * positive_avg / (positive_avg + np.abs(negative_avg))
+    last = close[-1].copy() if len(close) else state["close"]
+    return result, {"close": last, "pos": pos_state, "neg": neg_state}
+
+
+def bar_state(high, low, close, counts):
+    return {
+        "high": _last_rows(high, counts),
+        "low": _last_rows(low, counts),
+        "close": _last_rows(close, counts),
+        "has_zero": ((high - low) == 0).any(axis=0),
+        "count": counts.copy(),
+    }
+
+
+def bar_update(state, high, low, close, counts):
+    new = bar_state(high, low, close, counts)
+    moved = counts > 0
+    return {
+        "high": np.where(moved, new["high"], state["high"]),
+        "low": np.where(moved, new["low"], state["low"]),
+        "close": np.where(moved, new["close"], state["close"]),
+        "has_zero": state["has_zero"] | new["has_zero"],
+        "count": state["count"] + counts,
+    }
+
+
+def _tr_update(state, high, low, close):
+    prev_close = _prev_rows(state["close"], close)
+    hl = high - low
+    hl = np.where(state["has_zero"][None, :], hl + EPS, hl)
+    return np.fmax(np.fmax(np.abs(hl), np.abs(high - prev_close)), np.abs(prev_close - low))
+
+
+def atr_stateful(high, low, close, counts, length=14):
+    tr = _seeded_tr(high, low, close, length, prenan=False)
+    result = rma(tr, length)
+    state = bar_state(high, low, close, counts)
+    state["atr"] = rma_state(tr, result, length, counts)
+    return result, state
+
+
+def atr_update(state, high, low, close, valid, length=14):
+    """只適用於已有 >= length 個 bar 嘅股票 (presma 種子已經過咗)，而且新 bar 冇令 high == low 第一次出現"""
+    counts = valid.sum(axis=0)
+    result, atr_state = rma_update(state["atr"], _tr_update(state, high, low, close), length, valid)
+    new_state = bar_update(state, high, low, close, counts)
+    new_state["atr"] = atr_state
+    return result, new_state
+
+
+def adx_stateful(high, low, close, counts, length=14, scalar=100.0):
+    parts = _adx_parts(high, low, close, length, scalar)
+    state = bar_state(high, low, close, counts)
+    for name, (values, result) in parts.items():
+        state[name] = rma_state(values, result, length, counts)
+    return parts["dx"][1], state
+
+
+def adx_update(state, high, low, close, valid, length=14, scalar=100.0):
+    counts = valid.sum(axis=0)
+    tr = _tr_update(state, high, low, close)
+    pos, neg = _directional_movement(high - _prev_rows(state["high"], high), _prev_rows(state["low"], low) - low)
+    atr_, tr_state = rma_update(state["tr"], tr, length, valid)
+    pos_avg, pos_state = rma_update(state["pos"], pos, length, valid)
+    neg_avg, neg_state = rma_update(state["neg"], neg, length, valid)
+    result, dx_state = rma_update(state["dx"], _dx(atr_, pos_avg, neg_avg, scalar), length, valid)
+    new_state = bar_update(state, high, low, close, counts)
+    new_state.update(tr=tr_state, pos=pos_state, neg=neg_state, dx=dx_state)
+    return result, new_state
+
+
+# ------------------------------------------------------------
+# 狀態 (dict / tuple / 每欄一個值嘅 array) 按欄揀選、合併
+# ------------------------------------------------------------
+def take_state(state, idx):
+    if isinstance(state, dict):
+        return {k: take_state(v, idx) for k, v in state.items()}
+    if isinstance(state, tuple):
+        return tuple(take_state(v, idx) for v in state)
+    return np.asarray(state)[idx]
+
+
+def concat_state(states):
+    first = states[0]
+    if isinstance(first, dict):
+        return {k: concat_state([s[k] for s in states]) for k in first}
+    if isinstance(first, tuple):
+        return tuple(concat_state([s[i] for s in states]) for i in range(len(first)))
+    return np.concatenate([np.asarray(s) for s in states])
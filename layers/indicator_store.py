@@ -0,0 +1,280 @@
+import os
+import glob
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+class IndicatorStore:
+    """
+    指標庫：按年 Hive 分區 (root/year=YYYY/part-0.parquet)，長表 (Date, Symbol, 每個指標一欄)
+    同 PriceStore 一樣每個分區按 (Symbol, Date) 排序、固定 row group 寫入連 min/max 統計：
+    讀一個指標只解一欄 (column pruning)，symbol / 日期過濾跳過唔中嘅分區同 row group (row pruning)
+    唔同年份可以有唔同指標欄 (後加嘅指標)，讀取時合併 schema，冇嘅欄當 NaN
+    """
+    PARTITION = "year"
+    KEYS = ("Date", "Symbol")
+
+    def __init__(self, root, row_group_size=65_536):
+        self.root = Path(root)
+        self.row_group_size = row_group_size
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    # ------------------------------------------------------------
+    # 讀取
+    # ------------------------------------------------------------
+    def _partition_path(self, year):
+        return self.root / f"{self.PARTITION}={year}" / "part-0.parquet"
+
+    def years(self):
+        return sorted(int(Path(p).parent.name.split("=")[1])
+                      for p in glob.glob(str(self.root / f"{self.PARTITION}=*" / "part-0.parquet")))
+
+    def is_empty(self):
+        return not self.years()
+
+    def fingerprint(self):
+        """分區檔嘅 (路徑, 大小, mtime) 雜湊；任何寫入都會改變佢"""
+        h = hashlib.sha1()
+        for year in self.years():
+            path = self._partition_path(year)
+            stat = path.stat()
+            h.update(f"{path.relative_to(self.root)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return h.hexdigest()
+
+    def schema(self) -> pa.Schema:
+        """所有分區 schema 嘅聯集 (只讀 footer)"""
+        schemas = [pq.read_schema(self._partition_path(year)) for year in self.years()]
+        return pa.unify_schemas(schemas) if schemas else pa.schema([])
+
+    def indicators(self):
+        return [name for name in self.schema().names if name not in self.KEYS]
+
+    def _dataset(self):
+        schema = self.schema().append(pa.field(self.PARTITION, pa.int32()))
+        return ds.dataset(str(self.root), format="parquet", schema=schema,
+                          partitioning=ds.partitioning(pa.schema([(self.PARTITION, pa.int32())]), flavor="hive"))
+
+    def query(self, indicators=None, symbols=None, start=None, end=None):
+        """
+        回傳 IndicatorQuery (lazy)：呢度唔會讀任何數據，物化 (to_frame / panel / ...) 先按需要讀
+        indicators: 指標名 (例如 ["RSI_14", "ATR_14"])；None = 全部
+        指定指標時只回傳至少一個要求指標有值嘅行 (要求嘅欄全部 NaN 嘅行喺 scan 時已經濾走)
+        """
+        if isinstance(indicators, str):
+            indicators = [indicators]
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        return IndicatorQuery(self, indicators, symbols, start, end)
+
+    # ------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------
+    @staticmethod
+    def _grid_values(existing, incoming, dates, symbols):
+        """舊分區欄 + 新 wide frame 全部攤喺同一個 (date x symbol) 網格上"""
+        values = {}
+        if existing is not None and len(existing.columns) > 2:
+            rows = dates.get_indexer(pd.DatetimeIndex(existing["Date"]))
+            cols = symbols.get_indexer(existing["Symbol"].astype(str))
+            for name in existing.columns.drop(list(IndicatorStore.KEYS)):
+                grid = np.full((len(dates), len(symbols)), np.nan)
+                grid[rows, cols] = existing[name].to_numpy(dtype=np.float64)
+                values[name] = grid
+        for name, frame in incoming.items():
+            frame = frame.set_axis(pd.DatetimeIndex(frame.index).tz_localize(None).as_unit("ns"), axis=0)
+            frame = frame.set_axis(frame.columns.astype(str), axis=1)
+            values[name] = frame.reindex(index=dates, columns=symbols).to_numpy(dtype=np.float64)
+        return values
+
+    def _write_partition(self, year, df):
+        path = self._partition_path(year)
+        if df.empty:
+            if path.exists():
+                path.unlink()
+            return
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # "." 開頭嘅暫存檔 pyarrow.dataset 會自動忽略
+        tmp = str(path.parent / f".{path.name}.tmp")
+        pq.write_table(table, tmp, row_group_size=self.row_group_size, write_statistics=True,
+                       use_dictionary=["Symbol"], compression="zstd")
+        os.replace(tmp, path)
+
+    def upsert(self, frames: Dict[str, pd.DataFrame], drop: Iterable[str] = ()):
+        """
+        frames: {指標名: (date x symbol) DataFrame}，例如 TechnicalIndicator.indicators
+        每個指標喺 frame 覆蓋到嘅年份整年取代舊值，其他年份 / 其他指標唔郁
+        (resume 模式下 indicators 只含重寫咗嘅年份，所以只會重寫嗰啲分區)
+        drop: 要由所有分區刪走嘅指標
+        """
+        drop = set(drop)
+        by_year = {}
+        for name, frame in frames.items():
+            if frame is None or frame.empty:
+                continue
+            years = pd.DatetimeIndex(frame.index).year
+            for year in np.unique(years):
+                by_year.setdefault(int(year), {})[name] = frame[years == year]
+        years = set(by_year)
+        if drop:
+            years |= set(self.years())
+
+        for year in sorted(years):
+            incoming = by_year.get(year, {})
+            replaced = set(incoming) | drop
+            path = self._partition_path(year)
+            existing = None
+            if path.exists():
+                existing = pq.read_table(path).to_pandas()
+                existing = existing.drop(columns=[c for c in existing.columns if c in replaced])
+
+            dates = pd.DatetimeIndex([]).as_unit("ns")
+            symbols = pd.Index([], dtype=object)
+            if existing is not None:
+                dates = dates.union(pd.DatetimeIndex(existing["Date"]).unique())
+                symbols = symbols.union(pd.Index(existing["Symbol"].astype(str).unique()))
+            for frame in incoming.values():
+                dates = dates.union(pd.DatetimeIndex(frame.index).tz_localize(None).as_unit("ns"))
+                symbols = symbols.union(pd.Index(frame.columns.astype(str)))
+            values = self._grid_values(existing, incoming, dates, symbols)
+            if not values:
+                self._write_partition(year, pd.DataFrame())
+                continue
+
+            # 按 (Symbol, Date) 排序：轉置之後 nonzero 就係呢個次序；全部指標都係 NaN 嘅格唔存
+            present = np.zeros((len(symbols), len(dates)), dtype=bool)
+            for grid in values.values():
+                present |= ~np.isnan(grid.T)
+            cols, rows = np.nonzero(present)
+            df = pd.DataFrame({
+                "Date": dates[rows],
+                "Symbol": pd.Categorical.from_codes(cols, categories=symbols),
+                **{name: grid[rows, cols] for name, grid in values.items()},
+            })
+            self._write_partition(year, df)
+
+
+class IndicatorQuery:
+    """
+    IndicatorStore.query 回傳嘅 lazy handle：記住 (指標, symbols, 日期) 條件，物化先讀
+    filter / 欄位 pushdown 由 pyarrow.dataset 處理，只解要用嘅欄同 row group
+    """
+
+    def __init__(self, store, indicators=None, symbols=None, start=None, end=None):
+        self.store = store
+        self.indicators = None if indicators is None else list(indicators)
+        self.symbols = None if symbols is None else list(symbols)
+        self.start = None if start is None else pd.Timestamp(start)
+        self.end = None if end is None else pd.Timestamp(end)
+
+    def __repr__(self):
+        return (f"IndicatorQuery(indicators={self.indicators}, symbols={self.symbols}, "
+                f"start={self.start}, end={self.end})")
+
+    def where(self, indicators=None, symbols=None, start=None, end=None):
+        """再收窄條件 (仍然 lazy)；日期取交集"""
+        if isinstance(indicators, str):
+            indicators = [indicators]
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        if start is not None and self.start is not None:
+            start = max(self.start, pd.Timestamp(start))
+        if end is not None and self.end is not None:
+            end = min(self.end, pd.Timestamp(end))
+        return IndicatorQuery(
+            self.store,
+            self.indicators if indicators is None else indicators,
+            self.symbols if symbols is None else symbols,
+            self.start if start is None else start,
+            self.end if end is None else end,
+        )
+
+    def __getitem__(self, indicator):
+        return self.where(indicators=[indicator]).panel(indicator)
+
+    def _filter(self):
+        expr = None
+
+        def _and(a, b):
+            return b if a is None else a & b
+
+        part = IndicatorStore.PARTITION
+        if self.symbols is not None:
+            expr = _and(expr, ds.field("Symbol").isin(self.symbols))
+        if self.start is not None:
+            # 分區欄位過濾 => 成個年份目錄唔使開
+            expr = _and(expr, ds.field(part) >= self.start.year)
+            expr = _and(expr, ds.field("Date") >= pa.scalar(self.start.as_unit("ns").to_pydatetime(),
+                                                            pa.timestamp("ns")))
+        if self.end is not None:
+            expr = _and(expr, ds.field(part) <= self.end.year)
+            expr = _and(expr, ds.field("Date") <= pa.scalar(self.end.as_unit("ns").to_pydatetime(),
+                                                            pa.timestamp("ns")))
+        if self.indicators is not None:
+            # 分區係所有指標共用嘅 (Date, Symbol) 網格：只要子集嘅話，要求嘅欄全部 NaN 嗰啲行唔要
+            valid = None
+            for name in self._columns():
+                present = ~ds.field(name).is_null(nan_is_null=True)
+                valid = present if valid is None else valid | present
+            expr = _and(expr, valid)
+        return expr
+
+    def _columns(self):
+        available = self.store.indicators()
+        if self.indicators is None:
+            return available
+        missing = [name for name in self.indicators if name not in available]
+        if missing:
+            raise KeyError(f"指標庫冇呢啲指標: {missing}")
+        return self.indicators
+
+    def scanner(self, use_threads=True, batch_size=None):
+        kwargs = {} if batch_size is None else {"batch_size": batch_size}
+        return self.store._dataset().scanner(columns=list(IndicatorStore.KEYS) + self._columns(),
+                                             filter=self._filter(), use_threads=use_threads, **kwargs)
+
+    def to_table(self, use_threads=True) -> pa.Table:
+        names = list(IndicatorStore.KEYS) + (self.indicators or [])
+        if self.store.is_empty():
+            return pa.table({c: pa.array([], type=pa.timestamp("ns") if c == "Date" else
+                                         pa.string() if c == "Symbol" else pa.float64()) for c in names})
+        return self.scanner(use_threads=use_threads).to_table()
+
+    def iter_batches(self, batch_size=65_536):
+        """逐批 (DataFrame) 讀，成個結果唔使一次過放入記憶體"""
+        if self.store.is_empty():
+            return
+        for batch in self.scanner(batch_size=batch_size).to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def count_rows(self):
+        return 0 if self.store.is_empty() else self.scanner().count_rows()
+
+    def to_frame(self, use_threads=True) -> pd.DataFrame:
+        """長表：index (Date, Symbol)，每個指標一欄"""
+        df = self.to_table(use_threads=use_threads).to_pandas(use_threads=use_threads)
+        df["Symbol"] = df["Symbol"].astype(str)
+        return df.set_index(list(IndicatorStore.KEYS)).sort_index()
+
+    def panel(self, indicator) -> pd.DataFrame:
+        """(date x symbol) DataFrame，同 TechnicalIndicator.indicators[name] 一樣格式；只讀呢一欄"""
+        query = self if self.indicators == [indicator] else self.where(indicators=[indicator])
+        series = query.to_frame()[indicator].dropna()
+        wide = series.unstack("Symbol").rename_axis(index="date", columns=None)
+        if self.symbols is not None:
+            wide = wide.reindex(columns=[s for s in self.symbols if s in wide.columns])
+        return wide
+
+    def panels(self):
+        """{指標: (date x symbol) DataFrame}，一次讀晒要求嘅欄"""
+        long = self.to_frame()
+        return {name: long[name].dropna().unstack("Symbol").rename_axis(index="date", columns=None)
+                for name in long.columns}
@@ -0,0 +1,120 @@
+import os
+import json
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from universal_backtester import PricePanel
+
+
+class PanelCache:
+    """
+    將 price store 對齊成 (date, ticker) 嘅 memory-mapped NumPy 陣列：
+      root/current/dates.npy       交易日 (int64 ns)
+      root/current/{field}.npy     每個 OHLCV field 一個 float64 陣列
+      root/current/manifest.json   tickers / fields / shape / store fingerprint
+    對齊方式同 UniversalBacktester._align_prices 一樣 (reindex 到 calendar 再 ffill)，
+    不過係喺全段日曆上做，而且 ffill 只填每隻 ticker 第一至最後一條真 bar 之間嘅空隙：
+    最後一條 bar 之後 (停牌 / 除牌) 係 NaN，唔會扮有平價 bar；回測時 _align_prices 照舊會 ffill 持倉估值
+    load 只係 np.load(mmap_mode="r")，唔讀 Parquet 亦唔複製
+    store 嘅分區檔有改動 (fingerprint 唔同) 就自動重建
+    """
+    VERSION = 2
+
+    def __init__(self, root, store, calendar_ticker="SPY", fields=PricePanel.FIELDS):
+        self.root = Path(root)
+        self.store = store
+        self.calendar_ticker = calendar_ticker
+        self.fields = tuple(fields)
+
+    @property
+    def current(self):
+        return self.root / "current"
+
+    def fingerprint(self):
+        return self.store.fingerprint()
+
+    def manifest(self):
+        path = self.current / "manifest.json"
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def is_stale(self):
+        manifest = self.manifest()
+        return (manifest is None
+                or manifest.get("version") != self.VERSION
+                or manifest.get("fingerprint") != self.fingerprint()
+                or manifest.get("calendar_ticker") != self.calendar_ticker
+                or tuple(manifest.get("fields", ())) != self.fields)
+
+    def _trading_days(self, prices):
+        if self.calendar_ticker in prices:
+            return pd.DatetimeIndex(prices[self.calendar_ticker].index)
+        return pd.DatetimeIndex(sorted(set().union(*[df.index for df in prices.values()])))
+
+    def build(self):
+        fingerprint = self.fingerprint()
+        prices = self.store.load_dict(columns=list(self.fields))
+        if not prices:
+            raise RuntimeError("❌ price store 冇數據，無法建立 panel cache")
+
+        trading_days = self._trading_days(prices)
+        tickers = list(prices.keys())
+        shape = (len(trading_days), len(tickers))
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".building-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+
+        np.save(tmp / "dates.npy", trading_days.as_unit("ns").asi8)
+        for field in self.fields:
+            out = np.lib.format.open_memmap(tmp / f"{field}.npy", mode="w+", dtype=np.float64, shape=shape)
+            for j, ticker in enumerate(tickers):
+                out[:, j] = (prices[ticker][field].reindex(trading_days).ffill(limit_area="inside")
+                             .to_numpy(dtype=np.float64))
+            out.flush()
+            del out
+
+        (tmp / "manifest.json").write_text(json.dumps({
+            "version": self.VERSION,
+            "fingerprint": fingerprint,
+            "calendar_ticker": self.calendar_ticker,
+            "fields": list(self.fields),
+            "tickers": tickers,
+            "shape": list(shape),
+            "start": str(trading_days[0].date()),
+            "end": str(trading_days[-1].date()),
+            "built_at": datetime.now().isoformat(),
+        }, indent=2))
+
+        # 先整好新目錄再換入，讀緊舊 cache 嘅 process 唔受影響
+        old = self.root / f".old-{os.getpid()}"
+        if self.current.exists():
+            self.current.rename(old)
+        tmp.rename(self.current)
+        shutil.rmtree(old, ignore_errors=True)
+        print(f"🧱 Panel cache 已重建: {shape[1]} 隻 x {shape[0]} 日 -> {self.current}")
+
+    def load(self, rebuild=True) -> PricePanel:
+        if self.is_stale():
+            if not rebuild and self.manifest() is not None:
+                print("⚠️ Panel cache 已過期 (price store 有更新)，照用舊 cache")
+            else:
+                self.build()
+        manifest = self.manifest()
+        dates = pd.DatetimeIndex(np.load(self.current / "dates.npy"))
+        arrays = [np.load(self.current / f"{field}.npy", mmap_mode="r") for field in manifest["fields"]]
+        return PricePanel(dates, manifest["tickers"], fields=manifest["fields"], arrays=arrays)
+
+    def load_prices(self, tickers=None, rebuild=True):
+        """
+        {ticker: DataFrame}，已對齊交易日曆同 ffill，每隻只包第一至最後一條真 bar
+        注意呢度會由 memory map 複製出獨立 DataFrame (成個 universe 就係成個 panel 嘅記憶體)；
+        唔想複製就用 load() 直接拎 PricePanel
+        """
+        return self.load(rebuild=rebuild).to_frames(tickers)
@@ -0,0 +1,324 @@
+import os
+import glob
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+class PriceStore:
+    """
+    單一價格庫：按年 Hive 分區 (root/year=YYYY/part-0.parquet)，長表 (Date, Ticker, OHLCV)
+    每個分區按 (Ticker, Date) 排序並以固定 row group 寫入，row group 統計 (min/max) 令 ticker / 日期過濾
+    只需要讀中咗嘅 row group；query 只讀要求嘅欄位
+    root/_manifest.parquet 記錄每隻 ticker 嘅首尾日期、行數、有數據嘅欄位同內容雜湊，每次寫入都會更新
+    ("_" 開頭 pyarrow.dataset 會忽略，唔會當成價格分區)
+    """
+    FIELDS = ("Open", "High", "Low", "Close", "Volume")
+    PARTITION = "year"
+    MANIFEST = "_manifest.parquet"
+    MANIFEST_COLUMNS = ("FirstDate", "LastDate", "Rows", "Schema", "Hash")
+
+    def __init__(self, root, row_group_size=32_768):
+        self.root = Path(root)
+        self.row_group_size = row_group_size
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    # ------------------------------------------------------------
+    # 讀取
+    # ------------------------------------------------------------
+    def _partition_path(self, year):
+        return self.root / f"{self.PARTITION}={year}" / "part-0.parquet"
+
+    def years(self):
+        return sorted(int(Path(p).parent.name.split("=")[1])
+                      for p in glob.glob(str(self.root / f"{self.PARTITION}=*" / "part-0.parquet")))
+
+    def is_empty(self):
+        return not self.years()
+
+    def fingerprint(self):
+        """分區檔嘅 (路徑, 大小, mtime) 雜湊；任何寫入都會改變佢"""
+        h = hashlib.sha1()
+        for year in self.years():
+            path = self._partition_path(year)
+            stat = path.stat()
+            h.update(f"{path.relative_to(self.root)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return h.hexdigest()
+
+    def _dataset(self):
+        return ds.dataset(str(self.root), format="parquet", partitioning="hive")
+
+    def _filter(self, tickers=None, start=None, end=None):
+        expr = None
+
+        def _and(a, b):
+            return b if a is None else a & b
+
+        if tickers is not None:
+            expr = _and(expr, ds.field("Ticker").isin(list(tickers)))
+        if start is not None:
+            start = pd.Timestamp(start)
+            # 分區欄位過濾 => 成個年份目錄唔使開
+            expr = _and(expr, ds.field(self.PARTITION) >= start.year)
+            expr = _and(expr, ds.field("Date") >= pa.scalar(start.as_unit("ns").to_pydatetime(), pa.timestamp("ns")))
+        if end is not None:
+            end = pd.Timestamp(end)
+            expr = _and(expr, ds.field(self.PARTITION) <= end.year)
+            expr = _and(expr, ds.field("Date") <= pa.scalar(end.as_unit("ns").to_pydatetime(), pa.timestamp("ns")))
+        return expr
+
+    def query_table(self, tickers=None, start=None, end=None, columns=None, use_threads=True) -> pa.Table:
+        """
+        回傳 Arrow Table (Date, Ticker, columns...)；predicate / column pushdown 由 pyarrow.dataset 處理
+        use_threads=True 時各分區 / row group 並行讀取同解壓
+        """
+        cols = ["Date", "Ticker"] + [c for c in (columns or self.FIELDS) if c not in ("Date", "Ticker")]
+        if self.is_empty():
+            return pa.table({c: pa.array([], type=pa.timestamp("ns") if c == "Date" else
+                                         pa.string() if c == "Ticker" else pa.float64()) for c in cols})
+        return self._dataset().to_table(columns=cols, filter=self._filter(tickers, start, end),
+                                        use_threads=use_threads)
+
+    @staticmethod
+    def compact_table(table: pa.Table) -> pa.Table:
+        """價格轉 float32；Volume 冇缺值就轉整數 (裝得落就 uint32，否則 int64)，有缺值就 float32"""
+        fields = []
+        for field in table.schema:
+            if field.name in ("Date", "Ticker") or not pa.types.is_floating(field.type):
+                fields.append(field)
+            elif field.name == "Volume":
+                col = table.column("Volume")
+                if col.null_count or pc.any(pc.is_nan(col)).as_py():
+                    fields.append(pa.field("Volume", pa.float32()))
+                else:
+                    vmax = pc.max(col).as_py() or 0
+                    fields.append(pa.field("Volume", pa.uint32() if 0 <= vmax < 2 ** 32 else pa.int64()))
+            else:
+                fields.append(pa.field(field.name, pa.float32()))
+        # Volume 可能有小數 (例如調整後)，轉整數前先四捨五入
+        if "Volume" in table.column_names and pa.types.is_integer(fields[table.column_names.index("Volume")].type):
+            i = table.column_names.index("Volume")
+            table = table.set_column(i, "Volume", pc.round(table.column("Volume")))
+        return table.cast(pa.schema(fields))
+
+    def query(self, tickers=None, start=None, end=None, columns=None, compact=False, use_threads=True) -> pd.DataFrame:
+        """長表 DataFrame，按 (Ticker, Date) 排序"""
+        table = self.query_table(tickers, start, end, columns, use_threads=use_threads)
+        if compact:
+            table = self.compact_table(table)
+        df = table.to_pandas(use_threads=use_threads)
+        return df.sort_values(["Ticker", "Date"], kind="stable").reset_index(drop=True)
+
+    def load_dict(self, tickers=None, start=None, end=None, columns=None, compact=False,
+                  use_threads=True) -> Dict[str, pd.DataFrame]:
+        """{ticker: DataFrame(index=Date)}，同以前逐檔讀嘅格式一致"""
+        df = self.query(tickers, start, end, columns, compact=compact, use_threads=use_threads)
+        out = {}
+        if df.empty:
+            return out
+        value_cols = [c for c in df.columns if c not in ("Date", "Ticker")]
+        for ticker, frame in df.groupby("Ticker", sort=False):
+            out[ticker] = frame.set_index("Date")[value_cols]
+        if tickers is not None:
+            out = {t: out[t] for t in tickers if t in out}
+        return out
+
+    def tickers(self):
+        if self.is_empty():
+            return []
+        table = self._dataset().to_table(columns=["Ticker"])
+        return sorted(pc.unique(table["Ticker"]).to_pylist())
+
+    def last_dates(self, tickers=None) -> pd.Series:
+        """每隻 ticker 最後一個已存日期 (只讀 Date / Ticker 兩欄)"""
+        if self.is_empty():
+            return pd.Series(dtype="datetime64[ns]")
+        table = self._dataset().to_table(columns=["Date", "Ticker"], filter=self._filter(tickers))
+        grouped = table.group_by("Ticker").aggregate([("Date", "max")])
+        return pd.Series(grouped["Date_max"].to_pandas().values, index=grouped["Ticker"].to_pylist()).sort_index()
+
+    def tail(self, tickers, n, columns=None) -> Dict[str, pd.DataFrame]:
+        """每隻 ticker 最後 n 行；讀取範圍由最舊嘅最後日期往前推"""
+        last = self.last_dates(tickers)
+        if last.empty:
+            return {}
+        start = last.min() - pd.tseries.offsets.BDay(n * 2 + 5)
+        frames = self.load_dict(list(last.index), start=start, columns=columns)
+        return {t: df.iloc[-n:] for t, df in frames.items()}
+
+    # ------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------
+    @property
+    def manifest_path(self):
+        return self.root / self.MANIFEST
+
+    @classmethod
+    def _ticker_stats(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """由長表計每隻 ticker 嘅 manifest 行"""
+        rows = {}
+        value_cols = [c for c in cls.FIELDS if c in df.columns]
+        for ticker, frame in df.groupby("Ticker", sort=True):
+            values = frame.set_index("Date")[value_cols]
+            digest = hashlib.sha1(pd.util.hash_pandas_object(values, index=True).to_numpy().tobytes())
+            rows[ticker] = {
+                "FirstDate": values.index[0],
+                "LastDate": values.index[-1],
+                "Rows": len(values),
+                "Schema": ",".join(c for c in value_cols if values[c].notna().any()),
+                "Hash": digest.hexdigest(),
+            }
+        out = pd.DataFrame.from_dict(rows, orient="index", columns=list(cls.MANIFEST_COLUMNS))
+        return out.rename_axis("Ticker")
+
+    def _write_manifest(self, manifest: pd.DataFrame):
+        tmp = self.root / f".{self.MANIFEST}.tmp"
+        manifest.sort_index().to_parquet(tmp)
+        os.replace(tmp, self.manifest_path)
+
+    def rebuild_manifest(self) -> pd.DataFrame:
+        manifest = self._ticker_stats(self.query())
+        self._write_manifest(manifest)
+        return manifest
+
+    def manifest(self) -> pd.DataFrame:
+        """index=Ticker；舊 store 冇 manifest 就即場由全部分區重建一次"""
+        if self.manifest_path.exists():
+            return pd.read_parquet(self.manifest_path)
+        if self.is_empty():
+            return self._ticker_stats(self.to_long({}))
+        return self.rebuild_manifest()
+
+    def _update_manifest(self, tickers):
+        """只重算受影響 ticker (只讀佢哋嘅 row group)，其他行照舊"""
+        tickers = sorted(set(tickers))
+        if not tickers:
+            return
+        manifest = self.manifest()
+        manifest = manifest[~manifest.index.isin(tickers)]
+        fresh = self._ticker_stats(self.query(tickers))
+        self._write_manifest(pd.concat([manifest, fresh]) if not manifest.empty else fresh)
+
+    def freshness(self, tickers, as_of=None, max_lag_days=3, min_coverage=0.9) -> pd.Series:
+        """
+        按 manifest 判斷每隻 ticker 嘅狀態：
+          missing   store 冇呢隻
+          truncated 冇 Close，或者首尾日期之間嘅行數少過 min_coverage x 營業日 (中間有洞)
+          stale     最後日期落後 as_of 超過 max_lag_days 個營業日
+          ok        其他
+        """
+        manifest = self.manifest()
+        as_of = pd.Timestamp(as_of if as_of is not None else pd.Timestamp.today()).normalize()
+        cutoff = as_of - pd.tseries.offsets.BDay(max_lag_days)
+        status = {}
+        for ticker in tickers:
+            if ticker not in manifest.index:
+                status[ticker] = "missing"
+                continue
+            row = manifest.loc[ticker]
+            expected = np.busday_count(row["FirstDate"].date(), row["LastDate"].date()) + 1
+            if "Close" not in row["Schema"].split(",") or row["Rows"] < min_coverage * expected:
+                status[ticker] = "truncated"
+            elif row["LastDate"] < cutoff:
+                status[ticker] = "stale"
+            else:
+                status[ticker] = "ok"
+        return pd.Series(status, dtype="object", name="Status")
+
+    # ------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------
+    @classmethod
+    def to_long(cls, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        parts = []
+        for ticker, df in frames.items():
+            if df is None or df.empty:
+                continue
+            part = df.reindex(columns=list(cls.FIELDS)).astype("float64")
+            part.index = pd.DatetimeIndex(part.index).tz_localize(None).as_unit("ns")
+            part = part.rename_axis("Date").reset_index()
+            part.insert(1, "Ticker", ticker)
+            parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=["Date", "Ticker", *cls.FIELDS])
+        return pd.concat(parts, ignore_index=True)
+
+    def _write_partition(self, year, df):
+        path = self._partition_path(year)
+        if df.empty:
+            if path.exists():
+                path.unlink()
+            return
+        df = df.sort_values(["Ticker", "Date"], kind="stable").reset_index(drop=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # "." 開頭嘅暫存檔 pyarrow.dataset 會自動忽略
+        tmp = str(path.parent / f".{path.name}.tmp")
+        pq.write_table(table, tmp, row_group_size=self.row_group_size, write_statistics=True,
+                       use_dictionary=["Ticker"], compression="zstd")
+        os.replace(tmp, path)
+
+    def upsert(self, frames: Dict[str, pd.DataFrame], replace: Iterable[str] = ()):
+        """
+        以 (Ticker, Date) 為 key 寫入：同 key 嘅舊行會被覆蓋，只重寫受影響嘅年份分區
+        replace 入面嘅 ticker 會先刪晒舊數據 (例如 split 後全歷史重抓)
+        """
+        new = self.to_long(frames)
+        replace = set(replace)
+        if new.empty and not replace:
+            return
+        new_years = new["Date"].dt.year
+        years = set(new_years.unique().tolist())
+        if replace:
+            years |= set(self.years())
+
+        for year in sorted(years):
+            path = self._partition_path(year)
+            incoming = new[new_years == year]
+            if path.exists():
+                existing = pq.read_table(path).to_pandas()
+                keep = ~existing["Ticker"].isin(replace)
+                if not incoming.empty:
+                    keys = pd.MultiIndex.from_frame(incoming[["Ticker", "Date"]])
+                    keep &= ~pd.MultiIndex.from_frame(existing[["Ticker", "Date"]]).isin(keys)
+                merged = pd.concat([existing[keep], incoming], ignore_index=True)
+            else:
+                merged = incoming
+            self._write_partition(year, merged)
+        self._update_manifest(set(new["Ticker"]) | replace)
+
+    def import_ticker_files(self, directory, batch_size=100):
+        """將舊格式 {ticker}.parquet 目錄一次過搬入 store，回傳搬咗幾多隻"""
+        paths = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+        for i in range(0, len(paths), batch_size):
+            frames = {Path(p).stem: pd.read_parquet(p) for p in paths[i:i + batch_size]}
+            self.upsert(frames)
+        return len(paths)
+
+
+def memory_summary(frames: Dict[str, pd.DataFrame]):
+    """{ticker: df} 嘅記憶體用量，連同全部用 float64 時嘅對照"""
+    n_bytes = 0
+    n_bytes_f64 = 0
+    rows = 0
+    dtypes = {}
+    for df in frames.values():
+        n_bytes += int(df.memory_usage(index=True, deep=False).sum())
+        n_bytes_f64 += df.size * 8 + len(df.index) * 8
+        rows += len(df)
+        for col, dtype in df.dtypes.items():
+            dtypes[col] = str(dtype)
+    return {
+        "tickers": len(frames),
+        "rows": rows,
+        "bytes": n_bytes,
+        "bytes_float64": n_bytes_f64,
+        "dtypes": dtypes,
+    }
@@ -1,12 +1,13 @@
-import pandas as pd
 import os
+import sys
 from datetime import datetime
 
 from engine.pipeline import QuantPipeline
 from universal_backtester import UniversalBacktester, TransactionCostModel, PerformanceAnalyzer
 
 
-def main():
+def main(resume=False):
+    # resume: 由上次 checkpoint 續跑 (python run_backtest.py --resume)；設定或價格歷史有變會自動由頭回測
     print("=" * 60)
     print("🚀 QUANT SYSTEM: 自動化回測流程啟動")
     print("=" * 60)
@@ -57,7 +58,9 @@ def main():
 
     backtester = UniversalBacktester(
         initial_capital=100_000,
-        cost_model=cost_model
+        cost_model=cost_model,
+        checkpoint_dir="data/checkpoints",
+        checkpoint_every=252
     )
 
     start_date = "2015-01-01"
@@ -67,7 +70,9 @@ def main():
         strategy=strategy,
         prices_dict=price_data,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        resume=resume,
+        checkpoint_name=f"{strategy.name}_top{strategy.top_n}_{strategy.max_sector_count}_{strategy.rebalance_freq}"
     )
 
     # ==========================================
@@ -100,14 +105,11 @@ def main():
         print(f"🧠 Alpha: {metrics['Alpha']:.2%} | Beta: {metrics['Beta']:.2f} | IR: {metrics['Information Ratio']:.2f}")
     print("=" * 40)
 
-    results_df.to_csv("backtest_results.csv", index=False)
-    rolling.to_csv("rolling_metrics.csv")
-    print("\n💾 已輸出: backtest_results.csv / rolling_metrics.csv")
-
-    if backtester.trade_log:
-        pd.DataFrame(backtester.trade_log).to_csv("trade_log.csv", index=False)
-        print("💾 交易記錄已儲存至: trade_log.csv")
+    paths = backtester.save_results("results")
+    rolling.to_parquet("results/rolling_metrics.parquet")
+    print("\n💾 已輸出: " + " / ".join(paths.values()) + " / results/rolling_metrics.parquet")
+    print(f"💾 交易記錄: {len(backtester.trade_log)} 筆")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(resume="--resume" in sys.argv[1:])
\ No newline at end of file
@@ -1,5 +1,5 @@
 from layers.data_hub import DataHub
-from layers.data_layer import UniverseProvider
+from layers.async_acquisition import AsyncAcquisition
 from utils.validation import validate_missing, validate_spikes
 from utils.reporting import append_report
 from pathlib import Path
@@ -9,33 +9,31 @@ def run_update():
     processed_dir = Path(hub.price.config['paths']['processed_data'])
     processed_dir.mkdir(parents=True, exist_ok=True)
 
-    # 0) Universe（S&P500 + EXTRA_ETFS）
-    u_provider = UniverseProvider()
-    universe_df = u_provider.build_universe()
-    tickers = universe_df["Ticker"].dropna().unique().tolist()
-    print(f"✅ Universe Ready: {len(tickers)} tickers")
+    # 0) 並行抓取：Universe（S&P500 + EXTRA_ETFS）之後，價格 / 基本面（用 S&P500 tickers 過濾）/ 宏觀同時進行
+    acquisition = AsyncAcquisition(hub)
+    try:
+        acquired = acquisition.run()
+    finally:
+        acquisition.close()
+    print(f"✅ Universe Ready: {len(acquired['tickers'])} tickers")
+    print("⏱️ 抓取耗時: " + ", ".join(f"{k}={v:.1f}s" for k, v in acquisition.timings.items()))
 
-    # 1) 更新價格
-    hub.price.download(symbols=tickers, force=True)
-    close_df = hub.price.load()
+    # 1) 價格
+    close_df = hub.load_price()
 
     # 2) 技術指標
+    # 有上次嘅指標狀態就只計新 bar，只重寫受影響年份
     tech = hub.build_technical()
+    tech.resume(processed_dir / "indicators")
     tech.add_rsi(14)
     tech.add_atr(14)
     tech.add_adx(14)
     tech.add_vwap()
 
     tech.save_indicators(processed_dir / "indicators")
-    tech.save_unified(processed_dir / "indicators_all.parquet")
+    tech.save_store(hub.indicator_store)
 
-    # 3) 基本面（用 S&P500 tickers 嘗試過濾）
-    hub.fundamentals.download_quarterly(tickers)
-
-    # 4) 宏觀
-    hub.macro.download_all()
-
-    # 5) 驗證
+    # 3) 驗證
     missing = validate_missing(close_df)
     spikes = validate_spikes(close_df)
 
@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from universal_backtester import UniversalBacktester, PerformanceAnalyzer
+from strategy_long_term import LongTermStrategy
+from strategies.strategy_a import StrategyA_VCPBreakout
+from strategies.strategy_b import StrategyB_AVWAPPullback
+from strategies.strategy_c import StrategyC_BollingerReversion
+from utils.synthetic_market import make_universe, make_fundamentals
+
+STRATEGIES = {
+    "LT": lambda fund: LongTermStrategy(fundamentals_df=fund),
+    "A": lambda fund: StrategyA_VCPBreakout(),
+    "B": lambda fund: StrategyB_AVWAPPullback(),
+    "C": lambda fund: StrategyC_BollingerReversion(),
+}
+
+
+def parse_sizes(text):
+    """"50x1,500x5" -> [(50, 1), (500, 5)]  (ticker 數 x 年數)"""
+    sizes = []
+    for item in text.split(","):
+        n, years = item.lower().split("x")
+        sizes.append((int(n), float(years)))
+    return sizes
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_case(n_tickers, years, strategies, engine, repeat, seed):
+    t0 = time.perf_counter()
+    prices = make_universe(n_tickers, years, seed=seed)
+    gen_s = time.perf_counter() - t0
+    fundamentals = make_fundamentals(prices.keys(), seed=seed)
+    benchmark = prices["SPY"]["Close"]
+    start, end = benchmark.index[0], benchmark.index[-1]
+
+    rows = []
+    for name in strategies:
+        row = {"tickers": n_tickers, "years": years, "strategy": name, "engine": engine, "seed": seed,
+               "generate_s": round(gen_s, 4)}
+        try:
+            run_times = []
+            for _ in range(repeat):
+                backtester = UniversalBacktester(engine=engine)
+                strategy = STRATEGIES[name](fundamentals)
+                t0 = time.perf_counter()
+                equity = backtester.run(strategy, prices, start, end)
+                run_times.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            PerformanceAnalyzer().analyze(equity, benchmark_prices=benchmark)
+            row.update({
+                "run_s": round(min(run_times), 4),
+                "run_s_all": [round(t, 4) for t in run_times],
+                "analyze_s": round(time.perf_counter() - t0, 4),
+                "bars": len(equity),
+                "trades": len(backtester.trade_log),
+                # 用嚟發現行為改變：同一數據同一版本應該完全一樣
+                "final_equity": float(equity["Equity"].iloc[-1]),
+            })
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+        rows.append(row)
+        status = row.get("error") or f"run {row['run_s']:.2f}s | analyze {row['analyze_s']:.2f}s | {row['trades']} trades"
+        print(f"  {name:>2} @ {n_tickers} x {years:g}y: {status}")
+    return rows
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda r: (r["tickers"], r["years"], r["strategy"], r["engine"], r["seed"])
+    base = {key(r): r for r in baseline["results"] if "run_s" in r}
+
+    print(f"\n📊 對比基準: {baseline_path} (rev {baseline['meta'].get('git_revision')})")
+    regressions = 0
+    for r in results:
+        b = base.get(key(r))
+        if b is None or "run_s" not in r:
+            continue
+        ratio = r["run_s"] / b["run_s"] if b["run_s"] else np.nan
+        flags = []
+        if ratio > 1 + tolerance:
+            flags.append("⚠️ 變慢")
+            regressions += 1
+        if not np.isclose(r["final_equity"], b["final_equity"], rtol=1e-9, atol=0):
+            flags.append("❗ 結果唔同")
+        print(f"  {r['strategy']:>2} @ {r['tickers']} x {r['years']:g}y: {b['run_s']:.2f}s -> {r['run_s']:.2f}s "
+              f"(x{ratio:.2f}) {' '.join(flags)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成市場回測基準測試")
+    parser.add_argument("--sizes", default="50x1,500x5,2000x10", help="ticker 數 x 年數，逗號分隔，例如 50x1,5000x20")
+    parser.add_argument("--strategies", default="LT,A,B,C")
+    parser.add_argument("--engine", default="columnar", choices=UniversalBacktester.ENGINES)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=f"benchmarks/bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    parser.add_argument("--compare", default=None, help="之前輸出嘅 JSON，用嚟對比")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="慢過基準幾多當 regression")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⏱️ QUANT SYSTEM: 合成市場基準測試")
+    print("=" * 60)
+
+    strategies = args.strategies.split(",")
+    results = []
+    for n_tickers, years in parse_sizes(args.sizes):
+        print(f"\n🧪 {n_tickers} 隻股票 x {years:g} 年")
+        results.extend(bench_case(n_tickers, years, strategies, args.engine, args.repeat, args.seed))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 已輸出: {args.out}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n❌ {regressions} 個 case 變慢超過 {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
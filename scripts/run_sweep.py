@@ -0,0 +1,37 @@
+from engine.pipeline import QuantPipeline
+from parameter_sweep import ParameterSweep
+from strategies.strategy_a import StrategyA_VCPBreakout
+
+
+def main():
+    print("=" * 60)
+    print("🧪 QUANT SYSTEM: 參數掃描")
+    print("=" * 60)
+
+    pipeline = QuantPipeline()
+    universe_df, tickers = pipeline.build_universe()
+    pipeline.ensure_prices(tickers)
+
+    # 價格只載入一次，之後經 shared memory 畀所有 worker
+    price_data = pipeline.load_prices(tickers)
+    print(f"✅ 成功載入 {len(price_data)} 隻股票數據")
+
+    sweep = ParameterSweep(
+        StrategyA_VCPBreakout,
+        param_grid={
+            "contraction_ratio": [0.6, 0.7, 0.8],
+            "rvol_threshold": [1.2, 1.5, 2.0],
+            "trail_atr": [2.0, 3.0, 4.0]
+        },
+        backtester_kwargs={"initial_capital": 100_000, "engine": "columnar"},
+        start_date="2015-01-01",
+        results_path="sweeps/strategy_a.csv"
+    )
+    table = sweep.run(price_data)
+
+    print("\n📊 Top 10 (by Sharpe)")
+    print(table.sort_values("Sharpe", ascending=False).head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,26 @@ import pandas as pd
 import numpy as np
 from abc import abstractmethod
 from universal_backtester import BaseStrategy, Order
+from .utils import compute_atr
+
+
+def _tail_mean(values, i, n):
+    # 等同 series.iloc[:i + 1].tail(n).mean() (skipna)
+    window = values[max(0, i - n + 1):i + 1]
+    mask = np.isnan(window)
+    count = len(window) - mask.sum()
+    if count == 0:
+        return np.nan
+    return np.where(mask, 0.0, window).sum() / count
+
+
+def _slice_sum(values):
+    return np.where(np.isnan(values), 0.0, values).sum()
+
+
+def _slice_min(values):
+    values = values[~np.isnan(values)]
+    return values.min() if len(values) else np.nan
 
 
 class SwingBase(BaseStrategy):
@@ -9,12 +29,17 @@ class SwingBase(BaseStrategy):
     Swing 策略共用基礎類別
     處理：宇宙過濾、風險計算、持倉管理、通用離場
     """
+    state_attrs = ("positions", "_registered_stops", "_closed_tickers")
+    non_param_attrs = ("feature_cache",)
+
     def __init__(self,
                  name,
                  risk_per_trade=0.005,
                  min_price=5.0,
                  min_avg_dollar_vol=20e6,
-                 max_hold_days=30):
+                 max_hold_days=30,
+                 feature_cache=None,
+                 data_fingerprint=None):
         super().__init__(name)
         self.risk_per_trade = risk_per_trade
         self.min_price = min_price
@@ -24,6 +49,83 @@ class SwingBase(BaseStrategy):
         # 持倉記錄: {ticker: { 'entry_date', 'entry_price', 'stop_loss', 'highest', 'bars', 'partial', 'shares' }}
         self.positions = {}
 
+        # 預計算指標: {ticker: {'index': DatetimeIndex, 指標名: np.ndarray}}
+        self._features = {}
+        # 已登記喺 backtester 嘅常駐 stop: {ticker: stop 價}；本 bar 平過倉嘅 ticker
+        self._registered_stops = {}
+        self._closed_tickers = set()
+        # 跨回測共用嘅指標快取: {(data_fingerprint, feature_key): {ticker: features}}，None 即每次 prepare 重算
+        # data_fingerprint 標識計指標用嘅價格數據 (例如 PriceStore.fingerprint())，數據更新後舊指標唔會再命中；
+        # 冇 fingerprint 就唔用快取，因為冇辦法知道快取係咪同一份數據計出嚟
+        self.feature_cache = feature_cache
+        self.data_fingerprint = data_fingerprint
+
+    # ------------------------------------------------------------
+    # 預計算：全歷史指標一次過計好，逐日只做 O(1) 查表
+    # 所有指標都係 causal (rolling / shift)，第 i 行只用到 i 或之前嘅數據，冇 look-ahead
+    # ------------------------------------------------------------
+    def prepare(self, universe_prices):
+        self._features = {}
+        bucket = None
+        if self.feature_cache is not None and self.data_fingerprint is not None:
+            bucket = self.feature_cache.setdefault(self.cache_key(), {})
+
+        for ticker, df in universe_prices.items():
+            if df is None or df.empty:
+                continue
+            # 快取入面嘅全歷史指標覆蓋到今次區間就直接重用 (指標係 causal，唔會 look-ahead)
+            cached = bucket.get(ticker) if bucket is not None else None
+            if cached is not None and cached["index"][0] <= df.index[0] and cached["index"][-1] >= df.index[-1]:
+                self._features[ticker] = cached
+                continue
+            self._features[ticker] = self._build_features(df)
+            if bucket is not None:
+                bucket[ticker] = self._features[ticker]
+
+    def feature_key(self):
+        """影響 compute_features 結果嘅參數；參數相同嘅策略實例可以共用 feature_cache"""
+        return (type(self).__name__,)
+
+    def cache_key(self):
+        return self.data_fingerprint, self.feature_key()
+
+    def compute_features(self, df):
+        price = df[self._get_price_col(df)]
+        return {
+            "price": price.to_numpy(dtype=float),
+            "dollar_vol": (price * df["Volume"]).to_numpy(dtype=float),
+            "close": df["Close"].to_numpy(dtype=float),
+            "high": df["High"].to_numpy(dtype=float),
+            "low": df["Low"].to_numpy(dtype=float),
+            "volume": df["Volume"].to_numpy(dtype=float),
+            "atr_14": compute_atr(df, 14).to_numpy(dtype=float),
+        }
+
+    def _build_features(self, df):
+        feats = self.compute_features(df)
+        feats["index"] = df.index
+        return feats
+
+    def _feature_row(self, ticker, date, universe_prices):
+        """回傳 (features, 行號)；未 prepare 或數據已更新就即場重算該 ticker"""
+        feats = self._features.get(ticker)
+        if feats is None or date not in feats["index"]:
+            df = universe_prices.get(ticker)
+            if df is None or df.empty or date not in df.index:
+                return None, None
+            feats = self._features[ticker] = self._build_features(df)
+        return feats, feats["index"].get_loc(date)
+
+    def passes_universe_filters_at(self, feats, i):
+        """passes_universe_filters 嘅預計算版本 (i = 當日行號)"""
+        if i + 1 < 20:
+            return False
+        if feats["price"][i] < self.min_price:
+            return False
+        if _tail_mean(feats["dollar_vol"], i, 20) < self.min_avg_dollar_vol:
+            return False
+        return True
+
     # ------------------------------------------------------------
     # 宇宙過濾
     # ------------------------------------------------------------
@@ -102,11 +204,34 @@ class SwingBase(BaseStrategy):
             r_multiple = (current_price - entry) / (entry - stop) if (entry - stop) != 0 else 0
             if r_multiple < 1.0:
                 orders.append(Order(ticker, "MARKET", quantity=-pos.get("shares", 0)))
-                del self.positions[ticker]
+                self._close_position(ticker)
                 return orders
 
         return orders
 
+    # ------------------------------------------------------------
+    # 常駐 stop：只喺新倉、stop 改變或平倉時送事件
+    # ------------------------------------------------------------
+    def _close_position(self, ticker):
+        del self.positions[ticker]
+        self._closed_tickers.add(ticker)
+
+    def _stop_events(self):
+        orders = []
+        # 平倉後同一 bar 再入場都要先 cancel 再 amend，stop 排喺最後，同 positions 次序一致
+        for ticker in list(self._registered_stops):
+            if ticker in self._closed_tickers or self.positions.get(ticker, {}).get("stop_loss") is None:
+                orders.append(Order(ticker, "STOP_CANCEL"))
+                del self._registered_stops[ticker]
+        self._closed_tickers.clear()
+
+        for ticker, pos in self.positions.items():
+            stop = pos.get("stop_loss")
+            if stop is not None and self._registered_stops.get(ticker) != stop:
+                orders.append(Order(ticker, "STOP_AMEND", stop_loss=stop))
+                self._registered_stops[ticker] = stop
+        return orders
+
     # ------------------------------------------------------------
     # 子類必須實現
     # ------------------------------------------------------------
@@ -127,12 +252,7 @@ class SwingBase(BaseStrategy):
         # 1) 更新持倉狀態
         self.update_positions(date, universe_prices)
 
-        # 2) 為所有持倉下 stop order (用 backtester 負責觸發)
-        for ticker, pos in list(self.positions.items()):
-            if pos.get("stop_loss") is not None:
-                orders.append(Order(ticker, "STOP_LIMIT", quantity=0, stop_loss=pos["stop_loss"]))
-
-        # 3) 檢查離場條件
+        # 2) 檢查離場條件
         for ticker, pos in list(self.positions.items()):
             if ticker not in universe_prices:
                 continue
@@ -145,6 +265,9 @@ class SwingBase(BaseStrategy):
             orders.extend(self.check_common_exits(ticker, pos, current_price))
             orders.extend(self.check_specific_exits(ticker, pos, current_price, date, universe_prices))
 
-        # 4) 產生新信號
+        # 3) 產生新信號
         orders.extend(self.generate_signals(date, universe_prices, current_portfolio_value))
+
+        # 4) 同步常駐 stop (由 backtester 逐日觸發，下一個 bar 生效)
+        orders.extend(self._stop_events())
         return orders
@@ -1,5 +1,5 @@
 import pandas as pd
-from .base import SwingBase
+from .base import SwingBase, _tail_mean, _slice_min
 from .utils import compute_atr
 from universal_backtester import Order
 
@@ -28,43 +28,55 @@ class StrategyA_VCPBreakout(SwingBase):
         self.target_r = target_r
         self.trail_atr = trail_atr
 
+    def feature_key(self):
+        return super().feature_key() + (self.atr_short, self.atr_long, self.lookback_high)
+
+    def compute_features(self, df):
+        feats = super().compute_features(df)
+        feats["atr_short"] = compute_atr(df, self.atr_short).to_numpy(dtype=float)
+        feats["atr_long"] = compute_atr(df, self.atr_long).to_numpy(dtype=float)
+        feats["high_max"] = df["High"].rolling(self.lookback_high).max().to_numpy(dtype=float)
+        return feats
+
     def generate_signals(self, date, universe_prices, current_portfolio_value):
         orders = []
         for ticker, df in universe_prices.items():
             if date not in df.index:
                 continue
-            hist = df.loc[:date]
-            if len(hist) < max(self.atr_long, 120, self.lookback_high) + 5:
+            feats, i = self._feature_row(ticker, date, universe_prices)
+            if feats is None:
+                continue
+            if i + 1 < max(self.atr_long, 120, self.lookback_high) + 5:
                 continue
 
-            if not self.passes_universe_filters(ticker, hist):
+            if not self.passes_universe_filters_at(feats, i):
                 continue
 
-            atr_short = compute_atr(hist, self.atr_short).iloc[-1]
-            atr_long = compute_atr(hist, self.atr_long).iloc[-1]
+            atr_short = feats["atr_short"][i]
+            atr_long = feats["atr_long"][i]
             if pd.isna(atr_short) or pd.isna(atr_long) or atr_long == 0:
                 continue
 
             contraction_cond = (atr_short / atr_long) <= self.contraction_ratio
-            atr14 = compute_atr(hist, 14).iloc[-120:]
-            if len(atr14) >= 120:
+            if i + 1 >= 120:
+                atr14 = feats["atr_14"][i - 119:i + 1]
                 pct_rank = (atr14 <= atr_short).sum() / 120.0
                 contraction_cond = contraction_cond or (pct_rank <= 0.2)
 
             if not contraction_cond:
                 continue
 
-            highest_last = hist["High"].rolling(self.lookback_high).max().iloc[-2]
-            close_today = hist["Close"].iloc[-1]
+            highest_last = feats["high_max"][i - 1]
+            close_today = feats["close"][i]
             if pd.isna(highest_last) or close_today <= highest_last + self.breakout_buffer * atr_short:
                 continue
 
-            vol_avg = hist["Volume"].tail(20).mean()
-            if vol_avg == 0 or (hist["Volume"].iloc[-1] / vol_avg) < self.rvol_threshold:
+            vol_avg = _tail_mean(feats["volume"], i, 20)
+            if vol_avg == 0 or (feats["volume"][i] / vol_avg) < self.rvol_threshold:
                 continue
 
-            entry_price = hist["Close"].iloc[-1]
-            stop_loss = min(hist["Low"].tail(self.lookback_high).min(),
+            entry_price = close_today
+            stop_loss = min(_slice_min(feats["low"][max(0, i - self.lookback_high + 1):i + 1]),
                             entry_price - self.stop_loss_atr * atr_short)
 
             shares = self.compute_position_size(entry_price, stop_loss, current_portfolio_value)
@@ -103,12 +115,13 @@ class StrategyA_VCPBreakout(SwingBase):
                 pos["partial"] = True
 
         # Chandelier trail
-        atr = compute_atr(universe_prices[ticker].loc[:date], 14).iloc[-1]
+        feats, i = self._feature_row(ticker, date, universe_prices)
+        atr = feats["atr_14"][i] if feats is not None else float("nan")
         highest = pos.get("highest", entry)
         if not pd.isna(atr):
             trail_stop = highest - self.trail_atr * atr
             if current_price < trail_stop:
                 orders.append(Order(ticker, "MARKET", quantity=-pos["shares"]))
-                del self.positions[ticker]
+                self._close_position(ticker)
 
         return orders
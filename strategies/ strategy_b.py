@@ -1,11 +1,13 @@
 import pandas as pd
 import numpy as np
-from .base import SwingBase
-from .utils import compute_atr, compute_rsi, compute_avwap
+from .base import SwingBase, _slice_sum, _slice_min
+from .utils import compute_rsi
 from universal_backtester import Order
 
 
 class StrategyB_AVWAPPullback(SwingBase):
+    state_attrs = SwingBase.state_attrs + ("anchor_dates",)
+
     def __init__(self,
                  anchor_type="maxvolume",
                  avwap_touch_pct=0.25,
@@ -30,58 +32,75 @@ class StrategyB_AVWAPPullback(SwingBase):
         self.target_r = target_r
         self.anchor_dates = {}
 
-    def _get_anchor_date(self, ticker, hist, date):
-        if self.anchor_type == "fractal":
-            recent_lows = hist["Low"].tail(60)
-            return recent_lows.idxmin()
-        elif self.anchor_type == "maxvolume":
-            vol_slice = hist["Volume"].tail(60)
-            return vol_slice.idxmax()
-        else:
-            return pd.Timestamp(f"{date.year}-01-01")
+    def feature_key(self):
+        return super().feature_key() + (self.trend_ma_short, self.trend_ma_long, self.rsi_period)
+
+    def compute_features(self, df):
+        feats = super().compute_features(df)
+        close = df["Close"]
+        feats["sma_short"] = close.rolling(self.trend_ma_short).mean().to_numpy(dtype=float)
+        feats["sma_long"] = close.rolling(self.trend_ma_long).mean().to_numpy(dtype=float)
+        feats["rsi"] = compute_rsi(close, self.rsi_period).to_numpy(dtype=float)
+        return feats
+
+    def _get_anchor_pos(self, feats, i, date):
+        # 回傳 anchor 嘅行號 (等同舊 _get_anchor_date 喺 hist 上取 idxmin / idxmax)
+        start = max(0, i - 59)
+        if self.anchor_type in ("fractal", "maxvolume"):
+            window = feats["low"][start:i + 1] if self.anchor_type == "fractal" else feats["volume"][start:i + 1]
+            if np.isnan(window).all():
+                return None
+            offset = np.nanargmin(window) if self.anchor_type == "fractal" else np.nanargmax(window)
+            return start + int(offset)
+        return int(feats["index"].searchsorted(pd.Timestamp(f"{date.year}-01-01")))
 
     def generate_signals(self, date, universe_prices, current_portfolio_value):
         orders = []
         for ticker, df in universe_prices.items():
             if date not in df.index:
                 continue
-            hist = df.loc[:date]
-            if len(hist) < 200:
+            feats, i = self._feature_row(ticker, date, universe_prices)
+            if feats is None or i + 1 < 200:
                 continue
-            if not self.passes_universe_filters(ticker, hist):
+            if not self.passes_universe_filters_at(feats, i):
                 continue
 
-            close = hist["Close"]
-            sma_short = close.rolling(self.trend_ma_short).mean().iloc[-1]
-            sma_long = close.rolling(self.trend_ma_long).mean().iloc[-1]
+            close = feats["close"]
+            sma_short = feats["sma_short"][i]
+            sma_long = feats["sma_long"][i]
             if pd.isna(sma_short) or pd.isna(sma_long):
                 continue
-            if not (close.iloc[-1] > sma_long and sma_short > sma_long):
+            if not (close[i] > sma_long and sma_short > sma_long):
                 continue
 
-            anchor = self._get_anchor_date(ticker, hist, date)
-            avwap = compute_avwap(hist, anchor)
+            a = self._get_anchor_pos(feats, i, date)
+            if a is None or a > i:
+                continue
+            vol_sum = _slice_sum(feats["volume"][a:i + 1])
+            if vol_sum == 0:
+                continue
+            avwap = _slice_sum(close[a:i + 1] * feats["volume"][a:i + 1]) / vol_sum
             if np.isnan(avwap):
                 continue
 
-            atr14 = compute_atr(hist, 14).iloc[-1]
+            atr14 = feats["atr_14"][i]
             if pd.isna(atr14):
                 continue
 
-            low_today = hist["Low"].iloc[-1]
+            low_today = feats["low"][i]
             if abs(low_today - avwap) > self.avwap_touch_pct * atr14:
                 continue
 
-            rsi = compute_rsi(close, self.rsi_period).iloc[-1]
+            rsi = feats["rsi"][i]
             if pd.isna(rsi) or rsi > self.rsi_oversold:
                 continue
 
-            if self.confirm_reversal and len(hist) >= 2:
-                if not (hist["Close"].iloc[-1] > hist["High"].iloc[-2]):
+            if self.confirm_reversal and i >= 1:
+                if not (close[i] > feats["high"][i - 1]):
                     continue
 
-            entry_price = hist["Close"].iloc[-1]
-            swing_low = hist.loc[anchor:date, "Low"].min()
+            entry_price = close[i]
+            swing_low = _slice_min(feats["low"][a:i + 1])
             stop_loss = min(swing_low - 0.1 * atr14,
                             entry_price - self.stop_loss_atr * atr14)
 
@@ -99,7 +118,7 @@ class StrategyB_AVWAPPullback(SwingBase):
                 "shares": shares,
                 "direction": 1,
                 "avwap": avwap,
-                "anchor": anchor
+                "anchor": feats["index"][a]
             }
             orders.append(Order(ticker, "MARKET", quantity=shares))
 
@@ -114,16 +133,16 @@ class StrategyB_AVWAPPullback(SwingBase):
             r_multiple = (current_price - entry) / (entry - stop)
             if r_multiple >= self.target_r:
                 orders.append(Order(ticker, "MARKET", quantity=-pos["shares"]))
-                del self.positions[ticker]
+                self._close_position(ticker)
                 return orders
 
         avwap = pos.get("avwap")
         if avwap is not None and ticker in universe_prices:
-            df = universe_prices[ticker].loc[:date]
-            if len(df) >= 2:
-                last_two = df["Close"].iloc[-2:]
+            feats, i = self._feature_row(ticker, date, universe_prices)
+            if feats is not None and i >= 1:
+                last_two = feats["close"][i - 1:i + 1]
                 if (last_two < avwap).all():
                     orders.append(Order(ticker, "MARKET", quantity=-pos["shares"]))
-                    del self.positions[ticker]
+                    self._close_position(ticker)
 
         return orders
@@ -1,6 +1,6 @@
 import pandas as pd
 from .base import SwingBase
-from .utils import compute_adx, compute_atr
+from .utils import compute_adx
 from universal_backtester import Order
 
 
@@ -22,38 +22,48 @@ class StrategyC_BollingerReversion(SwingBase):
         self.adx_disable = adx_disable
         self.stop_loss_atr = stop_loss_atr
 
+    def feature_key(self):
+        return super().feature_key() + (self.adx_period, self.bb_period)
+
+    def compute_features(self, df):
+        feats = super().compute_features(df)
+        close = df["Close"]
+        feats["adx"] = compute_adx(df, self.adx_period).to_numpy(dtype=float)
+        feats["bb_ma"] = close.rolling(self.bb_period).mean().to_numpy(dtype=float)
+        feats["bb_std"] = close.rolling(self.bb_period).std().to_numpy(dtype=float)
+        return feats
+
     def generate_signals(self, date, universe_prices, current_portfolio_value):
         orders = []
         for ticker, df in universe_prices.items():
             if date not in df.index:
                 continue
-            hist = df.loc[:date]
-            if len(hist) < max(self.bb_period, self.adx_period) + 5:
+            feats, i = self._feature_row(ticker, date, universe_prices)
+            if feats is None or i + 1 < max(self.bb_period, self.adx_period) + 5:
                 continue
-            if not self.passes_universe_filters(ticker, hist):
+            if not self.passes_universe_filters_at(feats, i):
                 continue
 
-            adx = compute_adx(hist, self.adx_period).iloc[-1]
+            adx = feats["adx"][i]
             if pd.isna(adx) or adx >= self.adx_disable:
                 continue
             if adx >= self.adx_threshold:
                 continue
 
-            close = hist["Close"]
-            ma = close.rolling(self.bb_period).mean().iloc[-1]
-            std = close.rolling(self.bb_period).std().iloc[-1]
+            ma = feats["bb_ma"][i]
+            std = feats["bb_std"][i]
             if pd.isna(ma) or pd.isna(std) or std == 0:
                 continue
 
             lower_band = ma - self.bb_std * std
-            pct_b = (close.iloc[-1] - lower_band) / (2 * self.bb_std * std)
+            pct_b = (feats["close"][i] - lower_band) / (2 * self.bb_std * std)
 
             if pct_b < 0:
-                atr14 = compute_atr(hist, 14).iloc[-1]
+                atr14 = feats["atr_14"][i]
                 if pd.isna(atr14):
                     continue
 
-                entry_price = hist["Close"].iloc[-1]
+                entry_price = feats["close"][i]
                 stop_loss = entry_price - self.stop_loss_atr * atr14
 
                 shares = self.compute_position_size(entry_price, stop_loss, current_portfolio_value)
@@ -80,5 +90,5 @@ class StrategyC_BollingerReversion(SwingBase):
         bb_ma = pos.get("bb_ma")
         if bb_ma is not None and current_price >= bb_ma:
             orders.append(Order(ticker, "MARKET", quantity=-pos["shares"]))
-            del self.positions[ticker]
+            self._close_position(ticker)
         return orders
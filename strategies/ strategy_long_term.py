@@ -8,6 +8,7 @@ class LongTermStrategy(BaseStrategy):
     """
     Phase 1: 長線動量 + 低波幅策略
     """
+    state_attrs = ("_last_rebalance",)
 
     def __init__(self, top_n=15, max_sector_count=4, rebalance_freq="Q", fundamentals_df=None):
         super().__init__("LongTerm_Mom_Vol")
@@ -35,16 +36,19 @@ class LongTermStrategy(BaseStrategy):
             orders.append(Order(ticker, "TARGET_WEIGHT", target_weight=weight))
         return orders
 
-    def generate_signals(self, current_date, universe_prices, fundamentals_df=None):
-        candidates = []
-        current_dt = pd.to_datetime(current_date)
-
+    def _sector_map(self, fundamentals_df):
         sector_map = {}
         if fundamentals_df is not None and "Ticker" in fundamentals_df.columns:
             sector_map = dict(zip(
                 fundamentals_df["Ticker"],
                 fundamentals_df.get("Sector", pd.Series(["Unknown"] * len(fundamentals_df)))
             ))
+        return sector_map
+
+    def generate_signals(self, current_date, universe_prices, fundamentals_df=None):
+        candidates = []
+        current_dt = pd.to_datetime(current_date)
+        sector_map = self._sector_map(fundamentals_df)
 
         for ticker, df in universe_prices.items():
             if current_dt not in df.index:
@@ -84,7 +88,9 @@ class LongTermStrategy(BaseStrategy):
             except Exception:
                 continue
 
-        df = pd.DataFrame(candidates)
+        return self._select_weights(pd.DataFrame(candidates))
+
+    def _select_weights(self, df):
         if df.empty:
             return {}
 
@@ -112,3 +118,73 @@ class LongTermStrategy(BaseStrategy):
         selected_df["Final_Weight"] = selected_df["Raw_Weight"] / selected_df["Raw_Weight"].sum()
 
         return dict(zip(selected_df["Ticker"], selected_df["Final_Weight"]))
+
+
+    # ------------------------------------------------------------
+    # 向量化快速路徑 (VectorizedWeightBacktester 用)
+    # ------------------------------------------------------------
+    def rebalance_dates(self, trading_days):
+        periods = trading_days.to_period(self.rebalance_freq)
+        is_first = np.r_[True, periods[1:] != periods[:-1]]
+        if len(periods) and periods[0] == self._last_rebalance:
+            is_first[0] = False
+        return trading_days[is_first]
+
+    def decision_dates(self, trading_days):
+        # 只有 rebalance 日先會落單，其餘日子 on_bar 必定回傳 []
+        return self.rebalance_dates(trading_days)
+
+    def target_weights(self, universe_prices, trading_days):
+        """
+        一次過計出所有 rebalance 日嘅目標權重: {date: {ticker: weight}}
+        universe_prices 要先對齊到 trading_days，結果同逐日 generate_signals 一致
+        """
+        tickers = list(universe_prices.keys())
+        sector_map = self._sector_map(self.fundamentals_df)
+        sectors = [sector_map.get(t, "Unknown") for t in tickers]
+
+        close = np.column_stack([universe_prices[t]["Close"].to_numpy(dtype=float) for t in tickers])
+        volume = np.column_stack([universe_prices[t]["Volume"].to_numpy(dtype=float) for t in tickers])
+        returns = np.full_like(close, np.nan)
+        returns[1:] = close[1:] / close[:-1] - 1
+        # 轉置成 (ticker, date)，令每隻股票嘅窗口喺記憶體連續，std 同 pandas 逐隻計完全一致
+        returns_t = np.ascontiguousarray(returns.T)
+
+        weights = {}
+        for date in self.rebalance_dates(trading_days):
+            i = trading_days.get_loc(date)
+            if i + 1 < 252:
+                weights[date] = {}
+                continue
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                p_lag, p_base = close[i - 20], close[i - 251]
+                mom = np.where(p_base > 0, p_lag / p_base - 1, np.nan)
+                vol = self._nanstd(returns_t[:, i - 59:i + 1]) * np.sqrt(252)
+
+            ok = ~(close[i] < self.min_price) & ~(volume[i] == 0)
+            ok &= ~np.isnan(mom) & ~np.isnan(vol) & (vol != 0)
+            idx = np.flatnonzero(ok)
+
+            candidates = pd.DataFrame({
+                "Ticker": [tickers[j] for j in idx],
+                "Momentum": mom[idx],
+                "Volatility": vol[idx],
+                "Sector": [sectors[j] for j in idx]
+            })
+            weights[date] = self._select_weights(candidates)
+
+        return weights
+
+    @staticmethod
+    def _nanstd(window):
+        # 逐行 nanstd (ddof=1)，運算次序同 pandas Series.std 一樣
+        mask = np.isnan(window)
+        count = (~mask).sum(axis=1)
+        values = np.where(mask, 0.0, window)
+        avg = values.sum(axis=1) / count
+        sqr = (avg[:, None] - values) ** 2
+        sqr[mask] = 0
+        var = sqr.sum(axis=1) / (count - 1)
+        var[count <= 1] = np.nan
+        return np.sqrt(var)
@@ -0,0 +1,114 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from layers.download_scheduler import (DownloadScheduler, TokenBucket, RetryQueue, ParquetDirectorySource,
+                                       ThrottledError)
+
+
+class FakeClock:
+    """假時鐘：sleep 只係推前時間，唔會真係等"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ThrottlingSource:
+    """頭幾次請求扮被限流，之後交返畀 ParquetDirectorySource；silent=True 扮 yfinance 靜默回傳空結果"""
+
+    def __init__(self, inner, throttled_calls, silent=False):
+        self.inner = inner
+        self.throttled_calls = throttled_calls
+        self.silent = silent
+        self.calls = 0
+
+    def fetch(self, tickers, start, end=None):
+        self.calls += 1
+        if self.calls <= self.throttled_calls:
+            if self.silent:
+                return {}
+            raise ThrottledError("Too Many Requests")
+        return self.inner.fetch(tickers, start, end)
+
+
+def _write_prices(directory, tickers):
+    dates = pd.bdate_range("2024-01-01", periods=20)
+    for ticker in tickers:
+        close = np.linspace(10, 20, len(dates))
+        pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1_000.0},
+                     index=dates).to_parquet(os.path.join(directory, f"{ticker}.parquet"))
+
+
+def _scheduler(source, clock, queue_path, **kwargs):
+    bucket = TokenBucket(rate=1.0, capacity=2.0, increase=0.0, clock=clock, sleep=clock.sleep)
+    return DownloadScheduler(source, batch_size=2, bucket=bucket, retry_queue=RetryQueue(queue_path),
+                             backoff_base=0.5, sleep=clock.sleep, **kwargs)
+
+
+def test_throttle_halves_rate_and_retries(tmp_path):
+    _write_prices(tmp_path, ["AAA", "BBB"])
+    clock = FakeClock()
+    source = ThrottlingSource(ParquetDirectorySource(str(tmp_path)), throttled_calls=2)
+    scheduler = _scheduler(source, clock, str(tmp_path / "retry.csv"))
+
+    results, failed = scheduler.run(["AAA", "BBB"])
+
+    assert sorted(results) == ["AAA", "BBB"] and failed == []
+    assert source.calls == 3
+    assert scheduler.bucket.rate == 0.25
+    assert len(scheduler.retry_queue) == 0
+
+
+def test_silent_empty_batch_counts_as_throttle(tmp_path):
+    _write_prices(tmp_path, ["AAA", "BBB"])
+    clock = FakeClock()
+    source = ThrottlingSource(ParquetDirectorySource(str(tmp_path)), throttled_calls=1, silent=True)
+    scheduler = _scheduler(source, clock, str(tmp_path / "retry.csv"))
+
+    results, failed = scheduler.run(["AAA", "BBB"])
+
+    assert sorted(results) == ["AAA", "BBB"] and failed == []
+    assert source.calls == 2
+    assert scheduler.bucket.rate == 0.5
+
+
+def test_exhausted_batch_persists_retry_queue(tmp_path):
+    _write_prices(tmp_path, ["AAA", "BBB"])
+    clock = FakeClock()
+    queue_path = str(tmp_path / "retry.csv")
+    source = ThrottlingSource(ParquetDirectorySource(str(tmp_path)), throttled_calls=100)
+    scheduler = _scheduler(source, clock, queue_path, max_attempts=3)
+
+    results, failed = scheduler.run(["AAA", "BBB", "CCC"])
+
+    assert results == {} and sorted(failed) == ["AAA", "BBB", "CCC"]
+    assert source.calls == 6
+    assert scheduler.bucket.rate == scheduler.bucket.min_rate
+
+    saved = RetryQueue(queue_path)
+    assert sorted(saved.entries) == ["AAA", "BBB", "CCC"]
+    assert all(entry["Attempts"] == 1 for entry in saved.entries.values())
+    assert "Too Many Requests" in saved.entries["AAA"]["LastError"]
+
+    # 數據源恢復之後，到期嘅 ticker 會自動重試並由 queue 移除；冇數據嗰隻繼續留低
+    clock.now = 0.0
+    source.throttled_calls = 0
+    retry = _scheduler(source, clock, queue_path)
+    for entry in retry.retry_queue.entries.values():
+        entry["NextAttempt"] = 0
+    results, failed = retry.run([], include_due=True)
+
+    assert sorted(results) == ["AAA", "BBB"] and failed == ["CCC"]
+    assert list(RetryQueue(queue_path).entries) == ["CCC"]
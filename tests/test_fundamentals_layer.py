@@ -0,0 +1,158 @@
+import os
+import sys
+import types
+import importlib
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+NAMES = {
+    "SIMFIN_ID": "SimFinId", "TICKER": "Ticker", "REPORT_DATE": "Report Date", "PUBLISH_DATE": "Publish Date",
+    "CURRENCY": "Currency", "REVENUE": "Revenue", "GROSS_PROFIT": "Gross Profit",
+    "OPERATING_INCOME": "Operating Income (Loss)", "NET_INCOME": "Net Income", "EPS": "Earnings Per Share, Basic",
+    "CASH_EQUIV_ST_INVEST": "Cash, Cash Equivalents & Short Term Investments", "TOTAL_ASSETS": "Total Assets",
+    "ST_DEBT": "Short Term Debt", "LT_DEBT": "Long Term Debt", "TOTAL_LIABILITIES": "Total Liabilities",
+    "TOTAL_EQUITY": "Total Equity", "NET_CASH_OPS": "Net Cash from Operating Activities",
+    "NET_CASH_INV": "Net Cash from Investing Activities", "NET_CASH_FIN": "Net Cash from Financing Activities",
+}
+
+
+class FakeSimfin:
+    """
+    假 simfin 1.0.x：簽名同回傳型別跟真嘅一樣
+    _maybe_download_dataset(refresh_days, **kwargs) -> bool (有冇下載)，_path_dataset(...) -> CSV 路徑
+    """
+
+    def __init__(self, bulk):
+        self.bulk = bulk
+        self.data_dir = None
+        self.downloads = []
+        self.loads = []
+
+    def modules(self, private=True):
+        sf = types.ModuleType("simfin")
+        sf.set_api_key = lambda api_key=None: None
+        sf.set_data_dir = lambda data_dir: setattr(self, "data_dir", data_dir)
+        sf.load = self.load
+        names = types.ModuleType("simfin.names")
+        names.__dict__.update(NAMES)
+        names.__all__ = list(NAMES)
+        download = types.ModuleType("simfin.download")
+        paths = types.ModuleType("simfin.paths")
+        if private:
+            download._maybe_download_dataset = self.maybe_download
+            paths._path_dataset = self.path_dataset
+        return {"simfin": sf, "simfin.names": names, "simfin.download": download, "simfin.paths": paths}
+
+    def path_dataset(self, dataset, variant=None, market=None):
+        return os.path.join(self.data_dir, f"{market}-{dataset}-{variant}.csv")
+
+    def maybe_download(self, refresh_days, **kwargs):
+        path = self.path_dataset(**kwargs)
+        if os.path.exists(path):
+            return False
+        self.downloads.append(kwargs["dataset"])
+        self.bulk[kwargs["dataset"]].to_csv(path, sep=";", index=False)
+        return True
+
+    def load(self, dataset, variant=None, market=None, refresh_days=30, parse_dates=None, index=None):
+        self.loads.append(dataset)
+        self.maybe_download(refresh_days, dataset=dataset, variant=variant, market=market)
+        return pd.read_csv(self.path_dataset(dataset, variant, market), sep=";", parse_dates=parse_dates)
+
+
+def _bulk():
+    income = pd.DataFrame({
+        "SimFinId": [1, 1, 1, 2, 9],
+        "Report Date": ["2020-03-31", "2020-06-30", "2020-03-31", "2020-03-31", "2020-03-31"],
+        "Publish Date": ["2020-05-01", "2020-08-01", "2020-11-15", "2020-05-20", "2020-05-01"],
+        "Currency": "USD",
+        "Revenue": [100.0, 110.0, 105.0, 200.0, 1.0],
+        "Net Income": [10.0, 11.0, 10.5, 20.0, 0.1],
+        "Unused Column": 0,
+    })
+    balance = pd.DataFrame({
+        "SimFinId": [1, 1, 2],
+        "Report Date": ["2020-03-31", "2020-06-30", "2020-03-31"],
+        "Publish Date": ["2020-05-03", "2020-08-01", "2020-05-20"],
+        "Total Assets": [1000.0, 1100.0, 2000.0],
+    })
+    cashflow = pd.DataFrame({
+        "SimFinId": [1, 1],
+        "Report Date": ["2020-03-31", "2020-06-30"],
+        "Publish Date": ["2020-05-01", "2020-08-01"],
+        "Net Cash from Operating Activities": [5.0, 6.0],
+    })
+    return {"income": income, "balance": balance, "cashflow": cashflow}
+
+
+@pytest.fixture
+def loader_factory(tmp_path, monkeypatch):
+    def make(private=True):
+        fake = FakeSimfin(_bulk())
+        for name, module in fake.modules(private).items():
+            monkeypatch.setitem(sys.modules, name, module)
+        monkeypatch.delitem(sys.modules, "layers.fundamentals_layer", raising=False)
+        module = importlib.import_module("layers.fundamentals_layer")
+
+        mapping = tmp_path / "mapping.csv"
+        pd.DataFrame({"Ticker": ["AAA", "BBB"], "SimFinId": [1, 2]}).to_csv(mapping, index=False)
+        raw = tmp_path / "raw"
+        raw.mkdir(exist_ok=True)
+        config = {"paths": {"raw_data": str(raw)},
+                  "data": {"fundamentals": {"api_key": "test", "mapping_file": str(mapping)}}}
+        return module.FundamentalsLoader(config=config), fake
+    return make
+
+
+def test_bulk_file_downloads_then_resolves_path(loader_factory):
+    loader, fake = loader_factory()
+
+    path = loader._bulk_file("income")
+
+    assert path == fake.path_dataset("income", "quarterly", "us")
+    assert os.path.exists(path)
+    assert fake.downloads == ["income"]
+    # 已經有檔就唔再下載 (_maybe_download_dataset 回傳 False)，路徑照樣攞到
+    assert loader._bulk_file("income") == path and fake.downloads == ["income"]
+
+
+def test_download_quarterly_reads_bulk_csv(loader_factory):
+    loader, fake = loader_factory()
+
+    df = loader.download_quarterly(["AAA", "BBB"])
+
+    assert fake.loads == []
+    assert set(df["SimFinId"]) == {1, 2}
+    assert not df.duplicated(subset=["SimFinId", "Report Date"]).any()
+    first = df[(df["SimFinId"] == 1) & (df["Report Date"] == "2020-03-31")].iloc[0]
+    # restatement 留最遲公佈嗰行；合併後公佈日取三份報表最遲嗰個
+    assert first["Revenue"] == 105.0
+    assert first["Publish Date"] == pd.Timestamp("2020-11-15")
+    assert "Unused Column" not in df.columns
+
+
+def test_falls_back_to_public_load_without_private_helpers(loader_factory):
+    loader, fake = loader_factory(private=False)
+
+    assert loader._bulk_file("income") is None
+    df = loader.download_quarterly(["AAA", "BBB"])
+
+    assert fake.loads == ["income", "balance", "cashflow"]
+    assert set(df["SimFinId"]) == {1, 2}
+    assert df.loc[df["SimFinId"] == 1, "Revenue"].tolist() == [105.0, 110.0]
+
+
+def test_as_of_uses_publish_date(loader_factory):
+    loader, _ = loader_factory()
+    loader.download_quarterly(["AAA", "BBB"])
+
+    latest = loader.as_of(["2020-04-15", "2020-05-25", "2020-08-15"]).set_index(["Date", "SimFinId"])
+
+    assert ("2020-04-15", 1) not in latest.index
+    assert latest.loc[(pd.Timestamp("2020-05-25"), 2), "Revenue"] == 200.0
+    # 2020-03-31 嗰季重新公佈 (2020-11-15) 之前未可用；2020-06-30 嗰季 2020-08-01 公佈
+    assert (pd.Timestamp("2020-05-25"), 1) not in latest.index
+    assert latest.loc[(pd.Timestamp("2020-08-15"), 1), "Revenue"] == 110.0
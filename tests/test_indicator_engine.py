@@ -0,0 +1,140 @@
+"""
+TechnicalIndicator (layers/indicator_engine.py 2D 引擎) 對 pandas_ta 逐隻股票計嘅結果：
+- 有 pandas_ta 就即場計 reference 比較：RSI / ATR / ADX / VWAP 要逐位一致，BBands (滾動 std 求和次序唔同) 容許幾個 ulp
+- 冇都會用 tests/data/indicator_reference.csv (pandas_ta 0.4.71b0 生成) 凍結嘅預期值比較；
+  唔同 numpy build 嘅浮點運算可以差 1-2 ulp，所以凍結值全部容許幾個 ulp
+數據包括晚上市、中段停牌 (冇 bar)、除牌、high == low 嘅 bar
+重新生成凍結值：python tests/test_indicator_engine.py (需要 pandas_ta)
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from layers.technical_layer import TechnicalIndicator
+
+REFERENCE = os.path.join(ROOT, "tests", "data", "indicator_reference.csv")
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+EXACT = ["RSI_14", "ATR_14", "ADX_14", "VWAP"]
+BANDS = ["BBL_20", "BBM_20", "BBU_20"]
+
+
+def make_bars(seed=21, n_days=160):
+    """長表 (date, Symbol)：只有有 bar 嘅行"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2021-01-04", periods=n_days, name="date")
+    frames = {}
+    for symbol in ["AAA", "BBB", "CCC", "DDD", "EEE"]:
+        close = np.round(40 * np.exp(np.cumsum(rng.normal(0, 0.02, n_days))), 2)
+        high = np.round(close * (1 + np.abs(rng.normal(0, 0.01, n_days))), 2)
+        low = np.round(close * (1 - np.abs(rng.normal(0, 0.01, n_days))), 2)
+        volume = rng.integers(1_000, 1_000_000, n_days).astype(float)
+        frames[symbol] = pd.DataFrame({"Open": close, "High": high, "Low": low, "Close": close, "Volume": volume},
+                                      index=dates)
+    frames["BBB"] = frames["BBB"].iloc[40:]                                      # 晚上市
+    frames["CCC"] = frames["CCC"].drop(dates[60:76])                             # 中段停牌
+    frames["DDD"].iloc[30, [1, 2]] = frames["DDD"].iloc[30, 3]                   # high == low
+    frames["DDD"].iloc[50:56, :4] = frames["DDD"].iloc[50, 3]                    # 一段冇郁
+    frames["DDD"] = frames["DDD"].iloc[:120]                                     # 除牌
+    frames["EEE"] = frames["EEE"].iloc[25:].drop(dates[90:95])                   # 晚上市 + 停牌
+    frames["EEE"].iloc[0, [1, 2]] = frames["EEE"].iloc[0, 3]                     # 第一個 bar 就 high == low
+    long = pd.concat(frames, names=["Symbol", "date"]).swaplevel().sort_index()
+    return long[FIELDS]
+
+
+def pandas_ta_reference(long):
+    """舊 TechnicalIndicator 嘅做法：RSI / BBands 喺 wide close 逐欄計，ATR / ADX / VWAP 逐隻股票用自己嘅 bar 計"""
+    import pandas_ta as ta
+
+    close = long["Close"].unstack("Symbol")
+    out = {name: {} for name in EXACT + BANDS}
+    for symbol in close.columns:
+        out["RSI_14"][symbol] = ta.rsi(close[symbol], length=14)
+        bands = ta.bbands(close[symbol], length=20, std=2)
+        for k, name in enumerate(BANDS):
+            out[name][symbol] = bands.iloc[:, k]
+    for symbol, df in long.groupby(level="Symbol"):
+        df = df.droplevel("Symbol")
+        out["ATR_14"][symbol] = ta.atr(df["High"], df["Low"], df["Close"], length=14)
+        out["ADX_14"][symbol] = ta.adx(df["High"], df["Low"], df["Close"], length=14)["ADX_14"]
+        out["VWAP"][symbol] = ta.vwap(df["High"], df["Low"], df["Close"], df["Volume"])
+    return {name: pd.DataFrame(series).reindex(index=close.index, columns=close.columns)
+            for name, series in out.items()}
+
+
+def engine_indicators(long):
+    close = long["Close"].unstack("Symbol")
+    ind = TechnicalIndicator(close, long)
+    ind.add_rsi(14)
+    ind.add_atr(14)
+    ind.add_adx(14)
+    ind.add_vwap()
+    ind.add_bbands(20, 2)
+    return {name: ind.indicators[name].reindex(index=close.index, columns=close.columns) for name in EXACT + BANDS}
+
+
+def load_reference():
+    df = pd.read_csv(REFERENCE, parse_dates=["date"])
+    bars = df[df["has_bar"]].set_index(["date", "Symbol"])[FIELDS]
+    expected = {name: df.pivot(index="date", columns="Symbol", values=name) for name in EXACT + BANDS}
+    return bars, expected
+
+
+def assert_close(got, expected, maxulp):
+    a, b = got.to_numpy(), expected.to_numpy()
+    np.testing.assert_array_equal(np.isnan(a), np.isnan(b))
+    finite = ~np.isnan(b)
+    if maxulp == 0:
+        np.testing.assert_array_equal(a[finite], b[finite])
+    else:
+        np.testing.assert_array_max_ulp(a[finite], b[finite], maxulp=maxulp)
+
+
+def assert_matches(got, expected, exact_ulp, band_ulp=4):
+    for name in EXACT + BANDS:
+        try:
+            assert_close(got[name], expected[name], exact_ulp if name in EXACT else band_ulp)
+        except AssertionError as e:
+            raise AssertionError(f"{name}: {e}") from None
+
+
+def test_engine_matches_frozen_pandas_ta_values():
+    bars, expected = load_reference()
+    got = engine_indicators(bars)
+    expected = {name: frame.reindex(index=got[name].index, columns=got[name].columns)
+                for name, frame in expected.items()}
+    assert_matches(got, expected, exact_ulp=4)
+
+
+def test_engine_matches_pandas_ta_per_symbol():
+    pytest.importorskip("pandas_ta")
+    long = make_bars(seed=5)
+    assert_matches(engine_indicators(long), pandas_ta_reference(long), exact_ulp=0)
+
+
+def test_frozen_reference_covers_edge_cases():
+    bars, expected = load_reference()
+    counts = bars.groupby(level="Symbol").size()
+    assert counts["BBB"] < counts["AAA"] and counts["DDD"] < counts["AAA"]
+    # 停牌嗰段 ATR 冇值，復牌之後接住計
+    atr = expected["ATR_14"]["CCC"]
+    assert atr.iloc[60:76].isna().all() and atr.iloc[76:].notna().all()
+
+
+if __name__ == "__main__":
+    long = make_bars()
+    reference = pandas_ta_reference(long)
+    close = long["Close"].unstack("Symbol")
+    grid = pd.MultiIndex.from_product([close.index, close.columns], names=["date", "Symbol"])
+    out = long.reindex(grid)
+    out["has_bar"] = grid.isin(long.index)
+    for name, frame in reference.items():
+        out[name] = frame.stack(future_stack=True).reindex(grid)
+    os.makedirs(os.path.dirname(REFERENCE), exist_ok=True)
+    out.reset_index().to_csv(REFERENCE, index=False, float_format="%.17g")
+    print(f"wrote {REFERENCE}: {len(out)} rows")
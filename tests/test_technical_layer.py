@@ -0,0 +1,117 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from layers.technical_layer import TechnicalIndicator, load_indicator
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+EXACT = ["RSI_14", "ATR_14", "ADX_14", "VWAP"]
+BANDS = ["BBL_20", "BBM_20", "BBU_20"]
+DATES = pd.bdate_range("2021-01-04", "2023-12-29", name="date")
+
+
+def make_frames(seed=3):
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for j in range(6):
+        close = np.round(30 * np.exp(np.cumsum(rng.normal(0, 0.02, len(DATES)))), 2)
+        high = np.round(close * (1 + np.abs(rng.normal(0, 0.01, len(DATES)))) + 0.01, 2)
+        low = np.round(close * (1 - np.abs(rng.normal(0, 0.01, len(DATES)))) - 0.01, 2)
+        volume = rng.integers(1_000, 1_000_000, len(DATES)).astype(float)
+        frames[f"S{j}"] = pd.DataFrame({"Open": close, "High": high, "Low": low, "Close": close, "Volume": volume},
+                                       index=DATES)
+    frames["S1"] = frames["S1"].iloc[100:]
+    frames["S2"] = frames["S2"].drop(DATES[300:320])
+    return frames
+
+
+def to_long(frames):
+    long = pd.concat(frames, names=["Symbol", "date"]).swaplevel().sort_index()
+    return long[FIELDS]
+
+
+def compute(frames, out_dir, resume):
+    long = to_long(frames)
+    ind = TechnicalIndicator(long["Close"].unstack("Symbol"), long)
+    if resume:
+        assert ind.resume(out_dir)
+    ind.add_rsi(14)
+    ind.add_atr(14)
+    ind.add_adx(14)
+    ind.add_vwap()
+    ind.add_bbands(20, 2)
+    ind.save_indicators(out_dir)
+    return ind
+
+
+def run_incremental(tmp_path, before, after):
+    """before 全量計再存，之後 after resume 增量計；同 after 直接全量計比較"""
+    compute(before, tmp_path / "inc", resume=False)
+    inc = compute(after, tmp_path / "inc", resume=True)
+    full = compute(after, tmp_path / "full", resume=False)
+    for name in EXACT + BANDS:
+        a = load_indicator(tmp_path / "full", name)
+        b = load_indicator(tmp_path / "inc", name).reindex(index=a.index, columns=a.columns)
+        if name in EXACT:
+            pd.testing.assert_frame_equal(b, a, check_freq=False, obj=name)
+        else:
+            pd.testing.assert_frame_equal(b, a, check_freq=False, rtol=1e-9, obj=name)
+    return inc, full
+
+
+def cut(frames, end):
+    return {s: df.loc[:end] for s, df in frames.items() if len(df.loc[:end])}
+
+
+def test_resume_with_appended_bars_only_rewrites_new_year(tmp_path):
+    frames = make_frames()
+    inc, _ = run_incremental(tmp_path, cut(frames, DATES[-10]), frames)
+
+    for name in EXACT + BANDS:
+        assert inc._dirty[name] == {2023}
+
+
+def test_mid_history_edit_recomputes_that_symbol(tmp_path):
+    frames = make_frames()
+    after = dict(frames)
+    edited = frames["S3"].copy()
+    edited.iloc[200, :4] *= 1.05
+    after["S3"] = edited
+
+    inc, _ = run_incremental(tmp_path, cut(frames, DATES[-10]), after)
+
+    # 中段改價只能靠 checksum 發現：S3 要全段重計，所以舊年份都要重寫
+    assert inc._dirty["ATR_14"] == {2021, 2022, 2023}
+    assert inc._dirty["RSI_14"] == {2021, 2022, 2023}
+
+
+def test_newly_listed_symbol(tmp_path):
+    frames = make_frames()
+    before = cut(frames, DATES[-10])
+    before.pop("S4")
+    after = dict(frames)
+    after["S4"] = frames["S4"].iloc[-30:]
+
+    inc, _ = run_incremental(tmp_path, before, after)
+
+    assert "S4" in inc.state["ATR_14"]["columns"]
+    assert load_indicator(tmp_path / "inc", "ATR_14")["S4"].notna().sum() == 30 - 13
+
+
+@pytest.mark.parametrize("name", ["ATR_14", "ADX_14"])
+def test_first_zero_range_bar_in_new_bars(tmp_path, name):
+    frames = make_frames()
+    after = dict(frames)
+    flat = frames["S5"].copy()
+    flat.iloc[-3, [1, 2]] = flat.iloc[-3, 3]
+    after["S5"] = flat
+
+    inc, _ = run_incremental(tmp_path, cut(frames, DATES[-10]), after)
+
+    # pandas_ta 遇到 high == low 會成隻股票加 epsilon，要全段重計
+    assert inc._dirty[name] == {2021, 2022, 2023}
@@ -0,0 +1,51 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class SharedArray:
+    """
+    用 multiprocessing.shared_memory 喺進程之間共享 NumPy 陣列 (零複製)
+    主進程 create()，worker 用 spec attach()，用完主進程負責 unlink()
+    """
+
+    def __init__(self, shm, shape, dtype):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, array):
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared = cls(shm, array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @classmethod
+    def empty(cls, shape, dtype=np.float64, fill=None):
+        """開一塊未初始化嘅共享陣列 (例如畀 worker 直接寫結果)，fill 唔係 None 就先填滿"""
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        shared = cls(shm, shape, dtype)
+        if fill is not None:
+            shared.array.fill(fill)
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shared_memory.SharedMemory(name=name), shape, dtype)
+
+    @property
+    def spec(self):
+        return self.shm.name, self.shape, self.dtype.str
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
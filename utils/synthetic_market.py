@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+SECTORS = ("Technology", "Healthcare", "Financials", "Consumer Cyclical", "Consumer Defensive", "Industrials",
+           "Energy", "Utilities", "Real Estate", "Basic Materials", "Communication Services")
+
+
+def make_universe(n_tickers=50, years=5, seed=0, start="2015-01-02", calendar_ticker="SPY", late_listing_pct=0.15):
+    """
+    可重現嘅合成 OHLCV 宇宙：{ticker: DataFrame(Open, High, Low, Close, Volume)}，格式同 PriceDownloader 輸出一致
+    每隻股票有自己嘅 drift / 波幅 / 市場 beta，加少量跳空；late_listing_pct 比例嘅股票會遲上市
+    同一組 (n_tickers, years, seed) 永遠產生相同數據
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=int(round(years * 252)))
+    n_days = len(dates)
+
+    market = rng.normal(0.0003, 0.01, n_days)
+    beta = rng.uniform(0.5, 1.5, n_tickers)
+    drift = rng.normal(0.0002, 0.0004, n_tickers)
+    vol = rng.uniform(0.01, 0.03, n_tickers)
+    beta[0], drift[0], vol[0] = 1.0, 0.0, 0.002
+
+    returns = market[:, None] * beta + drift + rng.standard_normal((n_days, n_tickers)) * vol
+    gaps = rng.random((n_days, n_tickers)) < 0.002
+    returns[gaps] += rng.normal(0, 0.08, gaps.sum())
+    close = rng.uniform(20, 200, n_tickers) * np.exp(np.cumsum(returns, axis=0))
+
+    spread = np.abs(rng.standard_normal((n_days, n_tickers))) * vol * 0.6
+    high = close * (1 + spread)
+    low = close * (1 - np.abs(rng.standard_normal((n_days, n_tickers))) * vol * 0.6)
+    open_ = low + (high - low) * rng.random((n_days, n_tickers))
+    # 成交額大約 2e7 - 5e8，大部分可以過 Swing 策略嘅流動性過濾
+    dollar_vol = np.exp(rng.normal(np.log(8e7), 1.0, n_tickers))
+    volume = np.round(dollar_vol / close * rng.lognormal(0, 0.35, (n_days, n_tickers)))
+
+    first_row = np.zeros(n_tickers, dtype=int)
+    late = rng.random(n_tickers) < late_listing_pct
+    late[0] = False
+    first_row[late] = rng.integers(1, max(n_days // 2, 2), late.sum())
+
+    tickers = [calendar_ticker] + [f"SYN{j:04d}" for j in range(1, n_tickers)]
+    prices = {}
+    for j, ticker in enumerate(tickers):
+        rows = slice(first_row[j], None)
+        prices[ticker] = pd.DataFrame({
+            "Open": open_[rows, j],
+            "High": high[rows, j],
+            "Low": low[rows, j],
+            "Close": close[rows, j],
+            "Volume": volume[rows, j]
+        }, index=dates[rows])
+    return prices
+
+
+def make_fundamentals(tickers, seed=0):
+    """LongTermStrategy 用嘅 Ticker / Sector 表"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Ticker": list(tickers),
+        "Sector": rng.choice(SECTORS, len(tickers))
+    })